@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+
+__author__ = "Sebastian Kihle & Andreas Hoeimyr"
+__email__ = "sebaskih@nmbu.no & andrehoi@nmbu.no"
+
+"""
+Fixtures for the benchmarks of the simulation. The benchmarks are run at
+the scales given with --bench-scales, see SCALES.
+"""
+
+import pytest
+
+from biosim.island_class import OCEAN_CODE, parse_island_map
+from biosim.simulation import BioSim
+from biosim.workload import generate_island, generate_population
+
+# Island size and number of herbivores per cell that is not ocean of each
+# scale. There is one carnivore per 10 herbivores and one vulture per 20
+# herbivores. The large scale has about 10^6 animals.
+SCALES = {
+    'small': {'size': 4, 'density': 10},
+    'medium': {'size': 22, 'density': 20},
+    'large': {'size': 102, 'density': 90},
+}
+
+
+def pytest_addoption(parser):
+    parser.addoption('--bench-scales', default='small,medium',
+                     help='Comma separated scales to benchmark, from '
+                          '{}'.format(', '.join(SCALES)))
+
+
+def pytest_generate_tests(metafunc):
+    if 'scale' in metafunc.fixturenames:
+        scales = metafunc.config.getoption('--bench-scales').split(',')
+        for scale in scales:
+            if scale not in SCALES:
+                raise ValueError('Unknown scale {}'.format(scale))
+        metafunc.parametrize('scale', scales)
+
+
+@pytest.fixture(scope='session')
+def workloads():
+    """ Caches the island and population of each scale. """
+    cache = {}
+
+    def workload(scale):
+        if scale not in cache:
+            size = SCALES[scale]['size']
+            density = SCALES[scale]['density']
+            island = generate_island(size, size, seed=1)
+            cells = int((parse_island_map(island) != OCEAN_CODE).sum()) * \
+                density
+            counts = {'Herbivore': cells, 'Carnivore': cells // 10,
+                      'Vulture': cells // 20}
+            cache[scale] = (island,
+                            generate_population(island, counts, seed=2))
+        return cache[scale]
+    return workload
+
+
+@pytest.fixture
+def make_sim(workloads, scale):
+    """ Returns a function creating a new simulation of the scale. """
+    def make():
+        island, population = workloads(scale)
+        return BioSim(island_map=island, ini_pop=population, seed=1)
+    return make
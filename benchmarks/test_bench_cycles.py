@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+
+__author__ = "Sebastian Kihle & Andreas Hoeimyr"
+__email__ = "sebaskih@nmbu.no & andrehoi@nmbu.no"
+
+"""
+Benchmarks of each cycle of a simulated year, of creating the map, of
+counting the animals and of forking a simulation.
+
+The cycles change the animals, so each round is run on a new simulation
+created by the setup of the round, which is not timed.
+"""
+
+import pytest
+
+from biosim.island_class import Map
+from biosim.simulation import BioSim
+from biosim.state import SPECIES_ATTRIBUTES
+from biosim.workload import population_records
+
+# Number of years simulated before a simulation is forked.
+BURN_IN_YEARS = 5
+
+CYCLES = ['feeding_cycle', 'breeding_cycle', 'migration_cycle',
+          'ageing_cycle', 'weight_loss_cycle', 'death_cycle']
+
+
+@pytest.mark.parametrize('cycle', CYCLES)
+def test_cycle(benchmark, make_sim, cycle):
+    """ Benchmarks one cycle on a new simulation. """
+    benchmark.group = cycle
+    benchmark.pedantic(lambda sim: getattr(sim, cycle)(),
+                       setup=lambda: ((make_sim(),), {}), rounds=10)
+
+
+def test_year(benchmark, make_sim):
+    """ Benchmarks a whole simulated year without visualization. """
+    benchmark.group = 'year'
+    benchmark.pedantic(lambda sim: sim._pipeline.run(),
+                       setup=lambda: ((make_sim(),), {}), rounds=10)
+
+
+def test_map_construction(benchmark, workloads, scale):
+    """ Benchmarks creating the map and all of its cells. """
+    island, _ = workloads(scale)
+    benchmark.group = 'map'
+    benchmark(lambda: Map(island).array_map)
+
+
+def test_animal_distribution(benchmark, make_sim):
+    """ Benchmarks counting the animals in each cell. """
+    sim = make_sim()
+    benchmark.group = 'animal_distribution'
+    benchmark(lambda: sim.animal_distribution)
+
+
+@pytest.mark.parametrize('columns', [True, False],
+                         ids=['columns', 'dictionaries'])
+def test_add_population(benchmark, workloads, scale, columns):
+    """
+    Benchmarks adding the population to a new simulation, given as columns
+    and as a list of dictionaries.
+    """
+    island, population = workloads(scale)
+    if not columns:
+        population = population_records(population)
+    benchmark.group = 'add_population'
+    benchmark.pedantic(lambda sim: sim.add_population(population),
+                       setup=lambda: ((BioSim(island, [], seed=1),), {}),
+                       rounds=5)
+
+
+@pytest.mark.parametrize('attributes', [False, True],
+                         ids=['counts', 'attributes'])
+def test_state(benchmark, make_sim, attributes):
+    """ Benchmarks getting the state of the island as arrays. """
+    sim = make_sim()
+    benchmark.group = 'state'
+    benchmark(lambda: sim.state(attributes))
+
+
+def test_sort_by_fitness(benchmark, make_sim):
+    """
+    Benchmarks sorting the animals of each cell by fitness, as done before
+    feeding and migration.
+    """
+    sim = make_sim()
+    benchmark.group = 'sort_by_fitness'
+    benchmark(sim._sort_by_fitness, SPECIES_ATTRIBUTES, True)
+
+
+@pytest.mark.parametrize('method', ['fork', 'burn_in'])
+def test_branch(benchmark, make_sim, method):
+    """
+    Benchmarks creating a branch of a simulation after a burn-in of a few
+    years, with fork and by simulating the burn-in again.
+    """
+    def burn_in():
+        sim = make_sim()
+        for _ in range(BURN_IN_YEARS):
+            sim._run_year()
+            sim._end_year()
+        return sim
+
+    benchmark.group = 'branch'
+    if method == 'fork':
+        benchmark(burn_in().fork)
+    else:
+        benchmark.pedantic(burn_in, rounds=3)
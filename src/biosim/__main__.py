@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+
+__author__ = "Sebastian Kihle & Andreas Hoeimyr"
+__email__ = "sebaskih@nmbu.no & andrehoi@nmbu.no"
+
+"""
+Command line interface of the biosim package.
+
+Renders the frames of a simulation recorded with a HeatmapRecorder:
+
+    biosim render cube.dat figures/frame --processes 8
+"""
+
+import argparse
+
+from .render import render_history
+from .statistics import SPECIES
+
+
+def main(args=None):
+    """
+    Runs the biosim command.
+
+    :param args: List of command line arguments, sys.argv is used if None.
+    """
+    parser = argparse.ArgumentParser(prog='biosim')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    render = commands.add_parser(
+        'render', help='Render frames and movie from recorded heatmaps.')
+    render.add_argument('filename',
+                        help='File written by a HeatmapRecorder.')
+    render.add_argument('img_base',
+                        help='Path and beginning of file name for figures.')
+    render.add_argument('--img-years', type=int, default=1,
+                        help='Years between frames.')
+    render.add_argument('--processes', type=int, default=None,
+                        help='Number of worker processes.')
+    render.add_argument('--ymax', type=float, default=None,
+                        help='Y-axis limit for the population graph.')
+    render.add_argument('--cmax', type=float, nargs=3, default=None,
+                        metavar=('HERB', 'CARN', 'VULT'),
+                        help='Color-code limits for the heatmaps.')
+    render.add_argument('--map', default=None,
+                        help='File with the island map, if it was not '
+                             'recorded.')
+    render.add_argument('--no-movie', action='store_true',
+                        help='Only save the frames.')
+
+    options = parser.parse_args(args)
+
+    if options.command == 'render':
+        cmax_animals = None
+        if options.cmax is not None:
+            cmax_animals = dict(zip(SPECIES, options.cmax))
+
+        island_map = None
+        if options.map is not None:
+            with open(options.map) as file:
+                island_map = file.read().strip()
+
+        num_frames = render_history(options.filename, options.img_base,
+                                    img_years=options.img_years,
+                                    processes=options.processes,
+                                    ymax_animals=options.ymax,
+                                    cmax_animals=cmax_animals,
+                                    island_map=island_map,
+                                    movie=not options.no_movie)
+        print('Rendered {} frames'.format(num_frames))
+
+
+if __name__ == '__main__':
+    main()
@@ -8,8 +8,12 @@ File with the animal classes, such as Herbivore and Carnivore.
 """
 
 from math import exp
+import gc
+import numpy as np
 import random
 
+from .layout import segment_offsets
+
 
 class Animal:
     """
@@ -47,6 +51,11 @@ class Animal:
         'DeltaPhiMax': 0
     }
 
+    # Age factor of the fitness for the ages 0, 1, 2, ..., calculated with
+    # the current a_half and phi_age of the species. Created when first
+    # used, and removed by new_parameters when a_half or phi_age changes.
+    _age_table = None
+
     @classmethod
     def new_parameters(cls, parameters):
         """
@@ -103,6 +112,10 @@ class Animal:
                     raise ValueError('{} cannot be negative'.format(iterator))
                 cls.param_dict[iterator] = parameters[iterator]
 
+                # The age factors must be calculated with the new values.
+                if iterator in ('a_half', 'phi_age'):
+                    cls._age_table = None
+
             else:
                 raise ValueError("This parameter is not defined for this "
                                  "animal")
@@ -128,13 +141,18 @@ class Animal:
         self.legal_biomes = ['Mountain', 'Ocean', 'Desert', 'Savannah',
                              'Jungle']
 
-    def ageing(self):
+    def ageing(self, update_fitness=True):
         """
         Ages the animal by one year and calls the calculate_fitness method
         to recalculate the fitness of the animal.
+
+        :param update_fitness: If False the fitness is not recalculated,
+                               e.g. when the fitness of many animals is
+                               updated at once with update_fitness.
         """
         self.age += 1
-        self.calculate_fitness()
+        if update_fitness:
+            self.calculate_fitness()
 
     @staticmethod
     def _sigmodial_plus(x, x_half, phi):
@@ -165,17 +183,138 @@ class Animal:
 
         where ``x`` and ``phi`` are input variables.
 
+        The age factor q^{+} is looked up in a table for integer ages, see
+        age_factors, so only the weight factor uses exp.
+
         """
         if self.weight == 0:
             self.phi = 0
         else:
-            self.phi = self._sigmodial_plus(self.age,
-                                            self.param_dict['a_half'],
-                                            self.param_dict['phi_age']) * \
+            table = self._age_table
+            if table is not None and type(self.age) is int and \
+                    0 <= self.age < len(table):
+                age_factor = table[self.age]
+            else:
+                age_factor = self.age_factors([self.age])[0]
+
+            self.phi = age_factor * \
                        self._sigmodial_minus(self.weight,
                                              self.param_dict['w_half'],
                                              self.param_dict['phi_weight'])
 
+    @classmethod
+    def age_factors(cls, ages):
+        r"""
+        Finds the age factor q^{+}(a, a_{1/2}, \phi_{age}) of the fitness
+        for a sequence of ages. The factors of integer ages are looked up in
+        a table that is calculated once for each set of age parameters, and
+        grows when an older animal is found. Other ages are calculated
+        directly.
+
+        :param ages: Sequence of ages.
+        :return: List with the age factor of each age.
+        """
+        table = cls._age_table
+        if table is None:
+            table = cls._age_table = []
+
+        factors = []
+        for age in ages:
+            if type(age) is not int or age < 0:
+                factors.append(cls._sigmodial_plus(age,
+                                                   cls.param_dict['a_half'],
+                                                   cls.param_dict['phi_age']))
+                continue
+
+            if age >= len(table):
+                table.extend(cls._sigmodial_plus(new_age,
+                                                 cls.param_dict['a_half'],
+                                                 cls.param_dict['phi_age'])
+                             for new_age in range(len(table),
+                                                  max(2 * len(table),
+                                                      age + 1, 64)))
+            factors.append(table[age])
+        return factors
+
+    @classmethod
+    def update_fitness(cls, animals):
+        """
+        Calculates the fitness of many animals of the species at once, with
+        the age factors from the age table and the weight factors
+        calculated with NumPy. Gives the same fitness as calling
+        calculate_fitness for each animal.
+
+        :param animals: List of animals of the species.
+        """
+        if len(animals) == 0:
+            return
+
+        weights = np.fromiter((animal.weight for animal in animals),
+                              dtype=float, count=len(animals))
+        fitness = np.array(cls.age_factors([animal.age for animal in
+                                            animals])) * \
+            (1 / (1 + np.exp(-cls.param_dict['phi_weight'] *
+                             (weights - cls.param_dict['w_half']))))
+        fitness[weights == 0] = 0
+
+        for animal, phi in zip(animals, fitness.tolist()):
+            animal.phi = phi
+
+    @classmethod
+    def from_arrays(cls, ages, weights):
+        """
+        Creates many animals of the species at once. Gives the same animals
+        as creating each animal with its age and weight, but the animals are
+        copied from one new animal and their fitness is calculated at once
+        with update_fitness. The animals share the list of legal biomes.
+        The garbage collector is paused while the animals are created.
+
+        The ages and weights are not checked, they must not be negative.
+
+        :param ages: NumPy array with the age of each animal.
+        :param weights: NumPy array with the weight of each animal.
+        :return: List of the new animals.
+        """
+        prototype = cls(0, 1).__dict__
+        animals = []
+
+        # Creating millions of objects makes the garbage collector run
+        # many times, and the new animals have no reference cycles.
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            for age, weight in zip(np.asarray(ages).tolist(),
+                                   np.asarray(weights).tolist()):
+                animal = cls.__new__(cls)
+                animal.__dict__.update(prototype)
+                animal.age = age
+                animal.weight = weight
+                animals.append(animal)
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+        cls.update_fitness(animals)
+        return animals
+
+    @staticmethod
+    def copy_animals(animals):
+        """
+        Copies a list of animals, e.g. the animals of a cell when a
+        simulation is forked. Each copy is an animal of the same species
+        with the same age, weight and fitness, and shares the list of legal
+        biomes with the original.
+
+        :param animals: List of animals.
+        :return: List with a copy of each animal.
+        """
+        copies = []
+        for animal in animals:
+            copy = animal.__class__.__new__(animal.__class__)
+            copy.__dict__.update(animal.__dict__)
+            copies.append(copy)
+        return copies
+
     def breeding(self, n_animals_in_cell):
         """
         Calculates the probability of animal having an offspring if multiple
@@ -187,7 +326,8 @@ class Animal:
         The mother animal loses weight relative to the weight of the
         offspring times a constant xi. The mothers fitness is then
         recalculated with its new weight.
-        However, if a animal is not born the method returns None.
+        However, if a animal is not born, or the drawn weight is not
+        positive, the method returns None.
 
         :return: None, or a class instance of same species.
         """
@@ -204,6 +344,10 @@ class Animal:
                 birth_weight = random.gauss(self.param_dict['w_birth'],
                                             self.param_dict['sigma_birth'])
 
+                # A drawn weight of zero or less gives no offspring.
+                if birth_weight <= 0:
+                    return
+
                 self.weight -= birth_weight * self.param_dict['xi']
 
                 if isinstance(self, Herbivore):
@@ -264,14 +408,18 @@ class Animal:
                 return None
             return right_cell
 
-    def lose_weight(self):
+    def lose_weight(self, update_fitness=True):
         """
         Subtracts the yearly weight loss of an animal based on weight loss
         constant eta and recalculates the fitness of the animal.
+
+        :param update_fitness: If False the fitness is not recalculated,
+                               see ageing.
         """
 
         self.weight -= self.param_dict['eta'] * self.weight
-        self.calculate_fitness()
+        if update_fitness:
+            self.calculate_fitness()
 
     def potential_death(self):
         r"""
@@ -566,6 +714,90 @@ class Carnivore(Animal):
                                       * self.param_dict['F']
                         return left_overs
 
+    @classmethod
+    def hunt_cell(cls, carnivores, herbivores, rng):
+        """
+        Lets all carnivores in a cell hunt the herbivores in the cell, with
+        the same rules as the hunt method, but with the kill probabilities
+        and random numbers of each carnivore handled as NumPy arrays.
+
+        The herbivores are sorted by ascending fitness, so the herbivores a
+        carnivore can kill, those with lower fitness than the carnivore,
+        are a band at the start of the list. For each carnivore one random
+        number is drawn for each living herbivore in the band, and the
+        first herbivore with a random number below its kill probability is
+        killed. When the carnivore is not full, the band is updated with
+        the new fitness of the carnivore and the hunt continues after the
+        killed herbivore. As in the hunt method each herbivore is tried at
+        most once by each carnivore, so the outcome has the same
+        distribution as calling hunt for each carnivore. The random numbers
+        are drawn from rng, so the exact outcome differs from hunt.
+
+        :param carnivores: Carnivores in the cell, sorted by descending
+                           fitness.
+        :param herbivores: Herbivores in the cell, sorted by ascending
+                           fitness.
+        :param rng: numpy.random.Generator used for the random numbers.
+        :return: The herbivores that survived, and the left overs of the
+                 killed herbivores.
+        """
+        if len(carnivores) == 0 or len(herbivores) == 0:
+            return herbivores, 0
+
+        appetite = cls.param_dict['F']
+        beta = cls.param_dict['beta']
+        delta_phi_max = cls.param_dict['DeltaPhiMax']
+
+        herb_phi = np.array([herbivore.phi for herbivore in herbivores])
+        herb_weight = np.array([herbivore.weight for herbivore in herbivores])
+        alive = np.ones(len(herbivores), dtype=bool)
+        left_overs = 0
+
+        for carnivore in carnivores:
+            start_weight = carnivore.weight
+            weight_of_killed_animals = 0
+            position = 0
+
+            while True:
+                # Herbivores with lower fitness than the carnivore.
+                band_end = np.searchsorted(herb_phi, carnivore.phi, 'left')
+                candidates = position + np.flatnonzero(
+                    alive[position:band_end])
+                if len(candidates) == 0:
+                    break
+
+                kill_probability = np.minimum(
+                    (carnivore.phi - herb_phi[candidates]) / delta_phi_max, 1)
+                kills = np.flatnonzero(
+                    rng.random(len(candidates)) <= kill_probability)
+                if len(kills) == 0:
+                    break
+
+                killed = candidates[kills[0]]
+                alive[killed] = False
+                position = killed + 1
+
+                # Eats until full
+                if herb_weight[killed] >= appetite:
+                    carnivore.weight += beta * appetite
+                    carnivore.calculate_fitness()
+                    break
+
+                # Eats whole herbivore, and checks if its full.
+                carnivore.weight += beta * herb_weight[killed]
+                carnivore.calculate_fitness()
+                weight_of_killed_animals += herb_weight[killed]
+
+                if weight_of_killed_animals - appetite >= 0:
+                    carnivore.weight = start_weight + beta * appetite
+                    left_overs += weight_of_killed_animals - appetite
+                    break
+
+        for herbivore, survived in zip(herbivores, alive):
+            herbivore.alive = bool(survived)
+        return [herbivore for herbivore, survived in zip(herbivores, alive)
+                if survived], left_overs
+
     def _propensity_carn(self, cell):
         """
         Calculates the propensity an animal has to move to a cell.
@@ -689,6 +921,42 @@ class Vulture(Animal):
             self.calculate_fitness()
             return 0
 
+    @classmethod
+    def scavenge_cells(cls, vultures_per_cell, left_overs):
+        """
+        Lets the vultures in several cells eat the left overs in their
+        cells, with the same rules as the scavenge method. Each vulture
+        eats F, or what is left when less than F is left, so vulture
+        number i in a cell eats
+
+            min(max(left_overs - i * F, 0), F)
+
+        which is found for all vultures at once with NumPy.
+
+        :param vultures_per_cell: List with the vultures of each cell,
+                                  sorted by descending fitness.
+        :param left_overs: NumPy array with the left overs in each cell.
+        :return: NumPy array with the left overs in each cell after the
+                 vultures have eaten.
+        """
+        appetite = cls.param_dict['F']
+        lengths = [len(vultures) for vultures in vultures_per_cell]
+        offsets = segment_offsets(lengths)
+
+        # Position of each vulture in its cell.
+        position = np.arange(offsets[-1]) - np.repeat(offsets[:-1], lengths)
+        eaten = np.clip(np.repeat(left_overs, lengths) - position * appetite,
+                        0, appetite)
+
+        number = 0
+        for vultures in vultures_per_cell:
+            for vulture in vultures:
+                vulture.weight += cls.param_dict['beta'] * eaten[number]
+                vulture.calculate_fitness()
+                number += 1
+
+        return np.maximum(left_overs - np.array(lengths) * appetite, 0)
+
     def _propensity_vult(self, cell):
         """
         Calculates the propensity an animal has to move to a cell.
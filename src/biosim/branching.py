@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+
+__author__ = "Sebastian Kihle & Andreas Hoeimyr"
+__email__ = "sebaskih@nmbu.no & andrehoi@nmbu.no"
+
+"""
+File with the runner that simulates several scenarios branched off one
+simulation, each in its own process.
+"""
+
+import multiprocessing
+
+# The simulation and scenarios given to run_branches, inherited by the
+# worker processes when they are forked.
+_parent = {}
+
+
+def _run_branch(task):
+    """
+    Runs one scenario in a worker process. The worker is a fork of the
+    process that called run_branches, so the simulation is already its own
+    copy.
+
+    :param task: Tuple with the index of the scenario and the seed.
+    :return: The result of the scenario.
+    """
+    index, seed = task
+    sim = _parent['sim']
+    sim.reseed(seed)
+    return _parent['scenarios'][index](sim)
+
+
+def run_branches(sim, scenarios, seeds=None, processes=None):
+    """
+    Runs scenarios on branches of a simulation, e.g. different second
+    phases after the same burn-in. Each scenario is a function that is
+    given its own branch of the simulation and returns a result, e.g.::
+
+        def with_carnivores(branch):
+            branch.add_population(carnivores)
+            return branch.simulate(100, vis_years=1000)
+
+        results = run_branches(sim, [with_carnivores, without_carnivores])
+
+    Where processes can be forked, each scenario runs in a new fork of the
+    calling process. The branches then share the memory of the simulation
+    until they change it, so branching costs almost nothing, and scenarios
+    may also change the animal and biome parameters. Otherwise, or if
+    processes is 1, the scenarios run one by one on copies made with
+    BioSim.fork, and share the parameters.
+
+    The results must be picklable when processes are used. The simulation
+    given is not changed.
+
+    :param sim: BioSim instance.
+    :param scenarios: List of functions taking a BioSim instance.
+    :param seeds: Seed of each branch. Seeds are found with
+                  BioSim.branch_seed if None.
+    :param processes: Number of worker processes, number of cores if None.
+    :return: List with the result of each scenario.
+    """
+    scenarios = list(scenarios)
+    if seeds is None:
+        seeds = [sim.branch_seed() for _ in scenarios]
+    if len(seeds) != len(scenarios):
+        raise ValueError('One seed must be given for each scenario')
+    if len(scenarios) == 0:
+        return []
+
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    if processes == 1 or \
+            'fork' not in multiprocessing.get_all_start_methods():
+        return [scenario(sim.fork(seed))
+                for scenario, seed in zip(scenarios, seeds)]
+
+    # Each worker runs one scenario, so every scenario gets a fresh fork of
+    # the simulation.
+    _parent['sim'] = sim
+    _parent['scenarios'] = scenarios
+    try:
+        context = multiprocessing.get_context('fork')
+        with context.Pool(min(processes, len(scenarios)),
+                          maxtasksperchild=1) as pool:
+            return pool.map(_run_branch, list(enumerate(seeds)),
+                            chunksize=1)
+    finally:
+        _parent.clear()
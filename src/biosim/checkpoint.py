@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+
+__author__ = "Sebastian Kihle & Andreas Hoeimyr"
+__email__ = "sebaskih@nmbu.no & andrehoi@nmbu.no"
+
+"""
+File with the checkpoints that store the full state of a simulation, so
+that a long simulation can be stopped and resumed later.
+"""
+
+import os
+import pickle
+import random
+import signal
+import threading
+from contextlib import contextmanager
+
+from .animals import Herbivore, Carnivore, Vulture
+from .geography import Biome
+from .island_class import BIOME_CLASSES
+
+CHECKPOINT_VERSION = 1
+
+# Classes with parameters shared by all instances, which are part of the
+# state of a simulation.
+PARAMETER_CLASSES = (Herbivore, Carnivore, Vulture, Biome) + BIOME_CLASSES
+
+
+def save_checkpoint(sim, filename):
+    """
+    Writes the full state of a simulation to a file. The checkpoint holds
+    the simulation with its map and animals, the state of the random number
+    generators, and the parameters of the animal and biome classes.
+
+    The checkpoint is first written to a temporary file that then replaces
+    the file, so an old checkpoint is never left half overwritten.
+
+    :param sim: BioSim instance.
+    :param filename: Path of the checkpoint file.
+    """
+    checkpoint = {
+        'version': CHECKPOINT_VERSION,
+        'sim': sim,
+        'random_state': random.getstate(),
+        'parameters': {cls.__name__: dict(cls.param_dict)
+                       for cls in PARAMETER_CLASSES},
+    }
+    temporary = os.fspath(filename) + '.tmp'
+    with open(temporary, 'wb') as file:
+        pickle.dump(checkpoint, file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary, filename)
+
+
+def load_checkpoint(filename):
+    """
+    Reads a checkpoint written by save_checkpoint. The state of the random
+    number generator in the random module and the parameters of the animal
+    and biome classes are restored, so the simulation continues exactly as
+    if it had not been stopped.
+
+    :param filename: Path of the checkpoint file.
+    :return: BioSim instance.
+    """
+    with open(filename, 'rb') as file:
+        checkpoint = pickle.load(file)
+    if not isinstance(checkpoint, dict) or \
+            checkpoint.get('version') != CHECKPOINT_VERSION:
+        raise ValueError('{} is not a checkpoint of version {}'.format(
+            filename, CHECKPOINT_VERSION))
+
+    random.setstate(checkpoint['random_state'])
+    for cls in PARAMETER_CLASSES:
+        cls.param_dict.update(checkpoint['parameters'][cls.__name__])
+        if hasattr(cls, '_age_table'):
+            cls._age_table = None
+    return checkpoint['sim']
+
+
+@contextmanager
+def catch_signals(enabled=True, signals=(signal.SIGTERM, signal.SIGINT)):
+    """
+    Catches signals while the block runs, instead of letting them stop the
+    program. The signals received are gathered in the list given by the
+    context manager, so a long loop can check it and stop when it is safe
+    to do so. The old handlers are put back when the block ends.
+
+    Signal handlers can only be set in the main thread. Elsewhere, or if
+    enabled is False, no signals are caught and the list stays empty.
+
+    :param enabled: Catches the signals if True.
+    :param signals: The signals caught.
+    :return: Context manager giving the list of signals received.
+    """
+    received = []
+    if not enabled or \
+            threading.current_thread() is not threading.main_thread():
+        yield received
+        return
+
+    def handler(signum, frame):
+        received.append(signum)
+
+    old_handlers = {signum: signal.signal(signum, handler)
+                    for signum in signals}
+    try:
+        yield received
+    finally:
+        for signum, old_handler in old_handlers.items():
+            signal.signal(signum, old_handler)
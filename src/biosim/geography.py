@@ -53,13 +53,56 @@ class Biome:
                 raise ValueError("This parameter is not defined for this "
                                  "biome")
 
+    @classmethod
+    def initial_food(cls):
+        """
+        The amount of available food in a new cell of the biome. Biomes
+        without food for herbivores start with none.
+
+        :return: Amount of food.
+        """
+        return 0
+
     def __init__(self):
+        # Set by the map when the cell is created, see store_left_overs_in.
+        self._store = None
+        self._slot = None
+
         self.available_food = 0
         self.present_carnivores = []
         self.present_herbivores = []
         self.present_vultures = []
         self.left_overs = 0
 
+    def store_left_overs_in(self, store, slot):
+        """
+        Keeps the left overs of the cell in the left_overs array of a map
+        instead of in the cell, so the left overs of all cells can be
+        handled as one array.
+
+        :param store: Object with a left_overs array, e.g. a Map.
+        :param slot: Index of the cell in the left_overs array.
+        """
+        store.left_overs[slot] = self.left_overs
+        self._store = store
+        self._slot = slot
+
+    @property
+    def left_overs(self):
+        """
+        Left overs from carnivore kills in the cell, eaten by vultures.
+        """
+        if self._store is None:
+            return self._left_overs
+        return self._store.left_overs[self._slot]
+
+    @left_overs.setter
+    def left_overs(self, value):
+        if self._store is None:
+            self._left_overs = value
+        else:
+            self._store.left_overs[self._slot] = value
+
     def regrow(self):
         """
         The regrow method updates the amount of available food,
@@ -90,6 +133,11 @@ class Jungle(Biome):
     """
     param_dict = {'f_max': 800}
 
+    @classmethod
+    def initial_food(cls):
+        """ A new cell starts with f_max food. """
+        return cls.param_dict['f_max']
+
     def __init__(self):
         super().__init__()
         self.available_food = self.param_dict['f_max']
@@ -114,6 +162,11 @@ class Savannah(Biome):
 
     param_dict = {'f_max': 300, 'alpha': 0.3}
 
+    @classmethod
+    def initial_food(cls):
+        """ A new cell starts with f_max food. """
+        return cls.param_dict['f_max']
+
     def __init__(self):
         super().__init__()
         self.available_food = self.param_dict['f_max']
@@ -0,0 +1,883 @@
+# -*- coding: utf-8 -*-
+
+__author__ = "Sebastian Kihle & Andreas Hoeimyr"
+__email__ = "sebaskih@nmbu.no & andrehoi@nmbu.no"
+
+"""
+File with the graphical interface of the simulation.
+"""
+
+import matplotlib.pyplot as plt
+import multiprocessing
+import numpy as np
+import queue
+import subprocess
+import tempfile
+import time
+import traceback
+import warnings
+
+from .island_class import BIOME_LETTERS, Map, parse_island_map
+from .statistics import SPECIES
+
+_FFMPEG_BINARY = 'ffmpeg'
+_MOVIE_FMT = 'mp4'
+
+
+class MovieWriter:
+    """
+    The MovieWriter class streams the frames of a figure directly into an
+    ffmpeg process through a pipe, so no image files are written.
+
+    Each frame is rendered to the RGBA buffer of the figure canvas and
+    written to the standard input of ffmpeg. The pipe only holds a few
+    frames, so writing blocks while ffmpeg encodes and the memory used is
+    bounded. ffmpeg is started when the first frame is written, since the
+    size of the frames is not known before.
+
+    .. :note:
+        Requires ffmpeg
+
+    :param filename: Name of the movie file, including path.
+    :param fps: Number of frames per second in the movie.
+    """
+
+    def __init__(self, filename, fps=25):
+        self.filename = filename
+        self.fps = fps
+        self.num_frames = 0
+        self._size = None
+        self._process = None
+        self._errors = None
+
+    def _start(self, width, height):
+        """
+        Starts the ffmpeg process.
+
+        :param width: Width of the frames in pixels.
+        :param height: Height of the frames in pixels.
+        """
+        # Parameters chosen according to
+        # http://trac.ffmpeg.org/wiki/Encode/H.264,
+        # section "Compatibility". The frames are padded to an even size
+        # as required by yuv420p. The messages of ffmpeg are kept in a
+        # temporary file, which unlike a pipe cannot fill up and block it.
+        self._errors = tempfile.TemporaryFile()
+        self._process = subprocess.Popen([_FFMPEG_BINARY,
+                                          '-f', 'rawvideo',
+                                          '-pix_fmt', 'rgba',
+                                          '-s', '{}x{}'.format(width, height),
+                                          '-framerate', str(self.fps),
+                                          '-i', '-',
+                                          '-y',
+                                          '-vf', 'pad=ceil(iw/2)*2:'
+                                                 'ceil(ih/2)*2',
+                                          '-profile:v', 'baseline',
+                                          '-level', '3.0',
+                                          '-pix_fmt', 'yuv420p',
+                                          self.filename],
+                                         stdin=subprocess.PIPE,
+                                         stdout=subprocess.DEVNULL,
+                                         stderr=self._errors)
+        self._size = (width, height)
+
+    def write(self, fig):
+        """
+        Renders the figure and writes the frame to ffmpeg.
+
+        Raises FileNotFoundError if ffmpeg is not installed, and
+        RuntimeError with the messages of ffmpeg if it stopped early.
+
+        :param fig: The matplotlib figure to write.
+        """
+        fig.canvas.draw()
+        frame = fig.canvas.buffer_rgba()
+        height, width = np.shape(frame)[:2]
+
+        if self._process is None:
+            self._start(width, height)
+        elif (width, height) != self._size:
+            raise ValueError('The size of the figure changed during the '
+                             'movie')
+
+        try:
+            self._process.stdin.write(frame)
+        except OSError as err:
+            # ffmpeg stopped, e.g. because of a bad codec or a full disk.
+            self.close()
+            raise RuntimeError('ERROR: ffmpeg stopped before the movie was '
+                               'finished') from err
+        self.num_frames += 1
+
+    def close(self):
+        """
+        Waits for ffmpeg to finish the movie.
+
+        Raises RuntimeError with the exit status and the messages of ffmpeg
+        if it failed.
+        """
+        if self._process is None:
+            return
+        try:
+            self._process.stdin.close()
+        except OSError:
+            # ffmpeg has already stopped, its exit status tells why.
+            pass
+        return_code = self._process.wait()
+        self._process = None
+
+        self._errors.seek(0)
+        errors = self._errors.read().decode(errors='replace').strip()
+        self._errors.close()
+        self._errors = None
+        if return_code != 0:
+            raise RuntimeError('ERROR: ffmpeg failed with exit status '
+                               '{}: {}'.format(return_code, errors))
+
+
+class Graphics:
+    """
+    The Graphics class draws the graphical interface of the simulation. The
+    interface has a colored map of the island, three heatmaps, one for each
+    of the three respective animals, and a line graph with the population
+    of each species.
+
+    The figure is created the first time setup is called, so a Graphics
+    instance can be created without opening a window.
+
+    :param island_map: Multi-line string specifying island geography, or a
+                       Map instance.
+    :param ymax_animals: Number specifying y-axis limit for graph.
+    :param cmax_animals: Dictionary specifying color-code limits.
+    :param img_base: String with beginning of file name for figures.
+    :param img_fmt: String with file type for figures, e.g. 'png'
+    """
+
+    def __init__(self, island_map, ymax_animals=None, cmax_animals=None,
+                 img_base=None, img_fmt='png'):
+        self.island_map = island_map
+
+        # The following will be initialized by setup.
+        self._fig = None
+        self._heatmap_herb_ax = None
+        self._heatmap_herb_graphics = None
+        self._line_graph_ax = None
+        self.herbivore_line_graph = None
+        self.legend_is_set_up = False
+
+        # Used for blitting, see update.
+        self._backgrounds = None
+        self._lines_changed = False
+
+        self._img_base = img_base
+        self._img_fmt = img_fmt
+        self._img_counter = 0
+        self._movie = None
+
+        if ymax_animals is None:
+            self.graph_ymax = 8000
+        else:
+            self.graph_ymax = ymax_animals
+
+        if cmax_animals is None:
+            self.color_bar_max_herb = 150
+            self.color_bar_max_carn = 100
+            self.color_bar_max_vult = 20
+        else:
+            self.color_bar_max_herb = cmax_animals['Herbivore']
+            self.color_bar_max_carn = cmax_animals['Carnivore']
+            self.color_bar_max_vult = cmax_animals['Vulture']
+
+    def _create_colour_island(self, map):
+        """
+        Creates a colored map of the island.
+
+        :param map: The string map, or a Map instance.
+        """
+        self.rgb_value = {'O': (0.0, 0.0, 1.0),  # blue
+                          'M': (0.5, 0.5, 0.5),  # grey
+                          'J': (0.0, 0.6, 0.0),  # dark green
+                          'S': (0.5, 1.0, 0.5),  # light green
+                          'D': (1.0, 1.0, 0.5)}  # light yellow
+
+        if isinstance(map, Map):
+            code_map = map.code_map
+        else:
+            code_map = parse_island_map(map)
+        colours = np.array([self.rgb_value[letter]
+                            for letter in BIOME_LETTERS])
+        map_rgb = colours[code_map]
+
+        self._landscape_map_ax.imshow(map_rgb)
+        self._landscape_map_ax.grid(True)
+        self._landscape_map_ax.set_xticks(range(len(map_rgb[0])))
+        self._landscape_map_ax.set_xticklabels(range(len(map_rgb[0])))
+        self._landscape_map_ax.set_yticks(range(len(map_rgb)))
+        self._landscape_map_ax.set_yticklabels(range(len(map_rgb)))
+
+    def setup(self, final_year):
+        """
+        Creates a interface with 4 subplots. A map of the island with
+        colors, two heatmaps, one line graph and a colored map of the island.
+        Each heatmap depicts the distribution of an animal, one for
+        herbivores and one for carnivores. The line graph shows the total
+        number of each animal species on the island each year. The colored map
+        shows the position of the biomes on the map.
+
+        :param final_year: Last year of the simulation.
+        """
+
+        # create new figure window
+        if self._fig is None:
+            self._fig = plt.figure()
+            self._fig.subplots_adjust(hspace=0.75)
+            self._fig.suptitle('Model of the Ecosystem of Rossoya')
+
+        # Add left subplot for images created with imshow().
+        # We cannot create the actual ImageAxis object before we know
+        # the size of the image, so we delay its creation.
+        if self._heatmap_herb_ax is None:
+            self._heatmap_herb_ax = self._fig.add_subplot(3, 2, 1)
+            self._heatmap_herb_graphics = None
+
+            self._heatmap_carn_ax = self._fig.add_subplot(3, 2, 3)
+            self._heatmap_carn_graphics = None
+
+            self._heatmap_vult_ax = self._fig.add_subplot(3, 2, 5)
+            self._heatmap_vult_graphics = None
+
+            self._landscape_map_ax = self._fig.add_subplot(3, 2, 2)
+
+            self._create_colour_island(self.island_map)
+
+            # Create the legend for the graphics
+            if not self.legend_is_set_up:
+                axlg = self._fig.add_axes([0.915, 0.725, 0.08, 0.15])
+                axlg.axis('off')
+                for ix, name in enumerate(('Ocn', 'Mtn', 'Jgl',
+                                           'Svn', 'Dst')):
+                    axlg.add_patch(plt.Rectangle((0., ix * 0.2), 0.3, 0.1,
+                                                 edgecolor='none',
+                                                 facecolor=self.rgb_value[name[
+                                                     0]]))
+                    axlg.text(0.35, ix * 0.2, name, transform=axlg.transAxes)
+
+                self._landscape_map_ax.title.set_text('Island map')
+                self._heatmap_herb_ax.title.set_text('Herbivore heatmap')
+                self._heatmap_carn_ax.title.set_text('Carnivore heatmap')
+                self._heatmap_vult_ax.title.set_text('Vulture heatmap')
+                self._landscape_map_ax.get_xaxis().set_visible(False)
+                self._landscape_map_ax.get_yaxis().set_visible(False)
+                self._heatmap_herb_ax.get_xaxis().set_visible(False)
+                self._heatmap_herb_ax.get_yaxis().set_visible(False)
+                self._heatmap_carn_ax.get_xaxis().set_visible(False)
+                self._heatmap_carn_ax.get_yaxis().set_visible(False)
+                self._heatmap_vult_ax.get_xaxis().set_visible(False)
+                self._heatmap_vult_ax.get_yaxis().set_visible(False)
+
+        # Add right subplot for line graph of population.
+        if self._line_graph_ax is None:
+            self._line_graph_ax = plt.subplot2grid((3, 2), (1, 1),
+                                                   rowspan=2, colspan=1,
+                                                   fig=self._fig)
+            self._line_graph_ax.set_ylim(0, self.graph_ymax)
+            self._line_graph_ax.yaxis.tick_right()
+            self._line_graph_ax.title.set_text('Population of species over '
+                                               'time')
+
+        # Needs updating on subsequent calls to simulate()
+        self._line_graph_ax.set_xlim(0, final_year)
+
+        if self.herbivore_line_graph is None:
+            herbivores_per_year = self._line_graph_ax.plot(
+
+                np.arange(0, final_year),
+                np.full(final_year, np.nan), 'g',
+                label='Herbivore count'
+
+            )
+
+            carnivores_per_year = self._line_graph_ax.plot(
+
+                np.arange(0, final_year),
+                np.full(final_year, np.nan), 'r',
+                label='Carnivore count'
+
+            )
+
+            vultures_per_year = self._line_graph_ax.plot(
+
+                np.arange(0, final_year),
+                np.full(final_year, np.nan), 'y',
+                label='Vulture count'
+
+            )
+
+            if not self.legend_is_set_up:
+                self._line_graph_ax.legend(loc='upper left', mode='expand')
+                self.legend_is_set_up = True
+
+            self.herbivore_line_graph = herbivores_per_year[0]
+            self.carnivore_line_graph = carnivores_per_year[0]
+            self.vulture_line_graph = vultures_per_year[0]
+
+            # Short animated lines with the newest part of each line graph,
+            # drawn on top of the cached background when blitting.
+            self._new_line_segments = [
+                self._line_graph_ax.plot([], [], colour, animated=True)[0]
+                for colour in ('g', 'r', 'y')]
+
+            self._fig.canvas.mpl_connect('draw_event', self._on_draw)
+        else:
+            self._grow_line_graphs(final_year)
+
+        # The whole figure must be drawn again after the setup.
+        self._backgrounds = None
+
+    def _grow_line_graphs(self, final_year):
+        """
+        Makes room for final_year years in the line graphs. The capacity of
+        the lines is doubled when it is too small, so the data of the lines
+        is only copied a few times during a long simulation.
+
+        :param final_year: Last year of the simulation.
+        """
+        capacity = len(self.herbivore_line_graph.get_xdata())
+        if final_year <= capacity:
+            return
+
+        new_capacity = max(final_year, 2 * capacity)
+        years = np.arange(0, new_capacity)
+        for line in self._line_graphs:
+            counts = np.full(new_capacity, np.nan)
+            counts[:capacity] = line.get_ydata()
+            line.set_data(years, counts)
+
+    @property
+    def _line_graphs(self):
+        """ The lines of the population graph. """
+        return (self.herbivore_line_graph, self.carnivore_line_graph,
+                self.vulture_line_graph)
+
+    @property
+    def _blit_axes(self):
+        """ The axes that are updated every year. """
+        return (self._heatmap_herb_ax, self._heatmap_carn_ax,
+                self._heatmap_vult_ax, self._line_graph_ax)
+
+    def _on_draw(self, event):
+        """
+        Stores the background of the axes that are updated every year
+        after the whole figure has been drawn.
+
+        :param event: The draw event of the figure canvas.
+        """
+        if event.canvas is not self._fig.canvas:
+            return
+
+        if self._lines_changed:
+            # The lines in the drawn figure are out of date, so the figure
+            # is drawn again before the background is stored.
+            self._refresh_line_graphs()
+            self._fig.canvas.draw_idle()
+            return
+
+        self._backgrounds = {ax: self._fig.canvas.copy_from_bbox(ax.bbox)
+                             for ax in self._blit_axes}
+
+    def _refresh_line_graphs(self):
+        """
+        Makes the lines of the population graph use the counts written to
+        them since they were last drawn.
+        """
+        if self._lines_changed:
+            for line in self._line_graphs:
+                line.recache_always()
+            self._lines_changed = False
+
+    def _update_system_map_herbivore(self, animal_array):
+        """
+        Updates the heatmap for herbivore distribution.
+
+        :param animal_array: array of the distribution of animals
+        """
+
+        if self._heatmap_herb_graphics is not None:
+            self._heatmap_herb_graphics.set_data(animal_array)
+        else:
+            self._heatmap_herb_graphics = \
+                self._heatmap_herb_ax.imshow(animal_array,
+                                             interpolation='nearest',
+                                             vmin=0,
+                                             vmax=self.color_bar_max_herb)
+            plt.colorbar(self._heatmap_herb_graphics, ax=self._heatmap_herb_ax,
+                         orientation='horizontal')
+
+    def _update_system_map_carnivore(self, animal_array):
+        """
+        Updates the heatmap for carnivore distribution.
+
+        :param animal_array: array of the distribution of animals
+        """
+
+        if self._heatmap_carn_graphics is not None:
+            self._heatmap_carn_graphics.set_data(animal_array)
+        else:
+            self._heatmap_carn_graphics = \
+                self._heatmap_carn_ax.imshow(animal_array,
+                                             interpolation='nearest',
+                                             vmin=0,
+                                             vmax=self.color_bar_max_carn,
+                                             cmap='magma')
+            plt.colorbar(self._heatmap_carn_graphics, ax=self._heatmap_carn_ax,
+                         orientation='horizontal')
+
+    def _update_system_map_vulture(self, animal_array):
+        """
+        Updates the heatmap for carnivore distribution.
+
+        :param animal_array: array of the distribution of animals
+        """
+
+        if self._heatmap_vult_graphics is not None:
+            self._heatmap_vult_graphics.set_data(animal_array)
+        else:
+            self._heatmap_vult_graphics = \
+                self._heatmap_vult_ax.imshow(animal_array,
+                                             interpolation='nearest',
+                                             vmin=0,
+                                             vmax=self.color_bar_max_vult,
+                                             cmap='cividis')
+            plt.colorbar(self._heatmap_vult_graphics, ax=self._heatmap_vult_ax,
+                         orientation='horizontal')
+
+    def _update_num_animals_graph(self, year, num_herbivores, num_carnivores,
+                                  num_vultures):
+        """
+        Updates the lines on the line graph.
+
+        The counts are written directly into the data of the lines, so
+        nothing is copied. The newest part of each line is also put in a
+        short line that is drawn when blitting.
+
+        :param year: The year to update.
+        :param num_herbivores: Number of herbivores on island.
+        :param num_carnivores: Number of carnivores on island.
+        :param num_vultures: Number of vultures on island.
+        """
+        numbers = (num_herbivores, num_carnivores, num_vultures)
+        for line, segment, number in zip(self._line_graphs,
+                                         self._new_line_segments, numbers):
+            ydata = line.get_ydata()
+            ydata[year] = number
+            if year > 0:
+                segment.set_data((year - 1, year), (ydata[year - 1], number))
+
+        self._lines_changed = True
+
+    def set_line_history(self, history, first_year=0):
+        """
+        Writes the number of animals of earlier years into the line graphs.
+        Used when the frames are not drawn in order, see
+        ``biosim.render``.
+
+        :param history: Array with the number of animals of each species,
+                        with one row per year.
+        :param first_year: The year of the first row in history.
+        """
+        last_year = first_year + len(history)
+        for index, line in enumerate(self._line_graphs):
+            line.get_ydata()[first_year:last_year] = history[:, index]
+        self._lines_changed = True
+
+    def _redraw(self):
+        """ Draws the whole figure. """
+        self._refresh_line_graphs()
+        self._fig.canvas.draw_idle()
+        plt.pause(1e-6)
+
+    def _blit(self):
+        """
+        Draws only the heatmaps and the newest part of the line graphs on
+        top of the stored backgrounds, and copies the changed areas to the
+        screen. The background of the line graph is stored again afterwards,
+        so the lines grow without being drawn again.
+        """
+        canvas = self._fig.canvas
+
+        for ax, image in ((self._heatmap_herb_ax, self._heatmap_herb_graphics),
+                          (self._heatmap_carn_ax, self._heatmap_carn_graphics),
+                          (self._heatmap_vult_ax,
+                           self._heatmap_vult_graphics)):
+            canvas.restore_region(self._backgrounds[ax])
+            ax.draw_artist(image)
+            canvas.blit(ax.bbox)
+
+        canvas.restore_region(self._backgrounds[self._line_graph_ax])
+        for segment in self._new_line_segments:
+            self._line_graph_ax.draw_artist(segment)
+        canvas.blit(self._line_graph_ax.bbox)
+        self._backgrounds[self._line_graph_ax] = canvas.copy_from_bbox(
+            self._line_graph_ax.bbox)
+
+        canvas.flush_events()
+
+    def update(self, year, counts, totals):
+        """
+        Updates all the subplots on the graphical interface with the new
+        graphics from _update_num_animals_graph,
+        _update_system_map_carnivore and _update_system_map_herbivore methods.
+
+        The whole figure is only drawn the first time and after setup. Later
+        updates use blitting, so the time used does not depend on the size
+        of the figure or the number of years simulated.
+
+        :param year: The year the counts belong to.
+        :param counts: Dictionary mapping species to count grids.
+        :param totals: Dictionary mapping species to number of animals.
+        """
+
+        self._update_system_map_herbivore(counts['Herbivore'])
+
+        self._update_system_map_carnivore(counts['Carnivore'])
+
+        self._update_system_map_vulture(counts['Vulture'])
+
+        self._update_num_animals_graph(
+
+            year,
+            totals['Herbivore'],
+            totals['Carnivore'],
+            totals['Vulture']
+
+        )
+
+        if self._backgrounds is None or not self._fig.canvas.supports_blit:
+            self._redraw()
+        else:
+            self._blit()
+
+    def _write_movie_frame(self):
+        """
+        Writes the figure to the movie stream. Falls back to saving image
+        files if ffmpeg is not installed.
+
+        :return: True if the frame was written to the movie, else False.
+        """
+        if self._movie is None:
+            self._movie = MovieWriter('{}.{}'.format(self._img_base,
+                                                     _MOVIE_FMT))
+        try:
+            self._movie.write(self._fig)
+        except FileNotFoundError:
+            warnings.warn('ffmpeg was not found, saving png files instead')
+            self._movie = None
+            self._img_fmt = 'png'
+            return False
+        return True
+
+    def save(self, img_no=None):
+        """
+        Saves graphics to file if file name given.
+
+        If the image format is the movie format, 'mp4', the frame is
+        streamed directly to the movie instead, see ``MovieWriter``.
+
+        :param img_no: Number of the image file. The images are numbered
+                       consecutively if None.
+        """
+
+        if self._img_base is None:
+            return
+
+        if img_no is not None:
+            self._img_counter = img_no
+
+        self._refresh_line_graphs()
+
+        if self._img_fmt == _MOVIE_FMT and self._write_movie_frame():
+            self._img_counter += 1
+            return
+
+        self._fig.savefig('{base}_{num:05d}.{type}'.format(
+            base=self._img_base, num=self._img_counter, type=self._img_fmt))
+        self._img_counter += 1
+
+    def make_movie(self):
+        """
+        Creates MPEG4 movie from visualization images saved.
+        Saves the movie in a requested folder:
+        E. g. "/Users/User/Documents/inf200_january/biosim/movie"
+
+        where ``movie`` will be the name of the file in folder biosim.
+
+        .. :note:
+            Requires ffmpeg
+
+        The movie is stored as img_base + movie_fmt
+
+        If the frames were streamed to the movie during the simulation,
+        the stream is closed instead.
+        """
+        movie_fmt = _MOVIE_FMT
+
+        if self._img_base is None:
+            raise RuntimeError("No filename defined.")
+
+        if self._movie is not None:
+            self._movie.close()
+            self._movie = None
+            return
+
+        if movie_fmt == 'mp4':
+            try:
+                # Parameters chosen according to
+                # http://trac.ffmpeg.org/wiki/Encode/H.264,
+                # section "Compatibility"
+                subprocess.check_call([_FFMPEG_BINARY,
+                                       '-i', '{}_%05d.png'.format
+                                       (self._img_base),
+                                       '-y',
+                                       '-profile:v', 'baseline',
+                                       '-level', '3.0',
+                                       '-pix_fmt', 'yuv420p',
+                                       '{}.{}'.format(self._img_base,
+                                                      movie_fmt)])
+            except subprocess.CalledProcessError as err:
+                raise RuntimeError('ERROR: ffmpeg failed with: {}'.format(err))
+
+        else:
+            raise ValueError('Unknown movie format: ' + movie_fmt)
+
+
+def _render_loop(frames, errors, graphics_args):
+    """
+    Draws the frames put in the queue until None is received. Runs in the
+    process started by BackgroundRenderer. If drawing fails, the traceback
+    is put in the error queue before the process stops.
+
+    :param frames: Queue with the messages from the simulation.
+    :param errors: Queue the error of the process is put in.
+    :param graphics_args: Arguments used to create the Graphics instance.
+    """
+    try:
+        graphics = Graphics(*graphics_args)
+
+        while True:
+            message = frames.get()
+            if message is None:
+                # Finishes the movie if the frames were streamed to ffmpeg.
+                if graphics._movie is not None:
+                    graphics.make_movie()
+                return
+
+            if message[0] == 'setup':
+                graphics.setup(message[1])
+
+            elif message[0] == 'frame':
+                _, year, stacked_counts, save = message
+                counts = {species: stacked_counts[index]
+                          for index, species in enumerate(SPECIES)}
+                totals = {species: int(stacked_counts[index].sum())
+                          for index, species in enumerate(SPECIES)}
+                graphics.update(year, counts, totals)
+                if save:
+                    graphics.save()
+    except Exception:
+        errors.put(traceback.format_exc())
+        raise
+
+
+class BackgroundRenderer:
+    """
+    The BackgroundRenderer draws the graphical interface in a separate
+    process, so the simulation does not wait for the figure to be drawn.
+    It is given to ``BioSim.simulate`` with the renderer keyword.
+
+    The simulation only puts the animal counts of each year in a bounded
+    queue, and the rendering process owns the figure and draws the frames
+    at its own pace. If the queue is full the policy decides what happens:
+
+        'drop': The frame is dropped and the simulation continues.
+
+        'block': The simulation waits until there is room in the queue.
+
+    Frames that are to be saved to file are never dropped.
+
+    Call close when done to draw the remaining frames and stop the process.
+
+    While waiting for the rendering process, the renderer checks that the
+    process is still alive. If the process has stopped, or has not
+    responded within timeout seconds, it is stopped and a RuntimeError with
+    the error of the process is raised, instead of waiting forever.
+
+    :param max_frames: Maximum number of frames waiting in the queue.
+    :param policy: What to do when the queue is full, 'drop' or 'block'.
+    :param timeout: Seconds to wait for the rendering process each time,
+                    waits as long as the process is alive if None.
+    """
+
+    policies = ('drop', 'block')
+
+    # Seconds between the checks that the rendering process is alive.
+    poll_interval = 0.1
+
+    def __init__(self, max_frames=4, policy='drop', timeout=None):
+        if policy not in self.policies:
+            raise ValueError('Unknown policy: {}'.format(policy))
+        if max_frames < 1:
+            raise ValueError('max_frames must be at least 1')
+        if timeout is not None and timeout <= 0:
+            raise ValueError('timeout must be positive')
+
+        self.max_frames = max_frames
+        self.policy = policy
+        self.timeout = timeout
+        self.dropped_frames = 0
+
+        self._frames = None
+        self._errors = None
+        self._process = None
+
+    @property
+    def is_running(self):
+        """ True if the rendering process has been started. """
+        return self._process is not None
+
+    def start(self, island_map, ymax_animals=None, cmax_animals=None,
+              img_base=None, img_fmt='png'):
+        """
+        Starts the rendering process. The arguments are used to create the
+        Graphics instance in the rendering process.
+        """
+        if self.is_running:
+            raise RuntimeError('The renderer is already running')
+
+        # A fresh interpreter is used so the rendering process does not
+        # inherit the figures and state of the simulation process.
+        context = multiprocessing.get_context('spawn')
+        self._frames = context.Queue(self.max_frames)
+        self._errors = context.Queue()
+        self._process = context.Process(
+            target=_render_loop,
+            args=(self._frames, self._errors,
+                  (island_map, ymax_animals, cmax_animals, img_base,
+                   img_fmt)),
+            daemon=True)
+        self._process.start()
+
+    def setup(self, final_year):
+        """
+        Sets up the figure in the rendering process.
+
+        :param final_year: Last year of the simulation.
+        """
+        self._put(('setup', final_year))
+
+    def push(self, year, counts, save=False):
+        """
+        Puts the animal counts of a year in the queue.
+
+        :param year: The year the counts belong to.
+        :param counts: Dictionary mapping species to count grids.
+        :param save: The frame is saved to file if True.
+        :return: False if the frame was dropped, else True.
+        """
+        stacked_counts = np.array([counts[species] for species in SPECIES],
+                                  dtype=np.uint32)
+        message = ('frame', year, stacked_counts, save)
+
+        if save or self.policy == 'block':
+            self._put(message)
+            return True
+
+        # A dropped frame may mean that the process has stopped drawing.
+        if not self._process.is_alive():
+            self._raise_error()
+        try:
+            self._frames.put_nowait(message)
+        except queue.Full:
+            self.dropped_frames += 1
+            return False
+        return True
+
+    def close(self):
+        """
+        Waits for the rendering process to draw the remaining frames and
+        stops it.
+        """
+        if not self.is_running:
+            return
+        self._put(None)
+        self._wait(self._joined)
+        if self._process.exitcode != 0:
+            self._raise_error()
+        self._stop()
+
+    def _put(self, message):
+        """
+        Puts a message in the queue, waiting while the queue is full.
+
+        :param message: The message.
+        """
+        def put(timeout):
+            try:
+                self._frames.put(message, timeout=timeout)
+            except queue.Full:
+                return False
+            return True
+
+        self._wait(put)
+
+    def _joined(self, timeout):
+        """
+        Waits for the rendering process to end.
+
+        :param timeout: Seconds to wait.
+        :return: True if the process has ended.
+        """
+        self._process.join(timeout)
+        return not self._process.is_alive()
+
+    def _wait(self, done):
+        """
+        Waits for the rendering process, checking that it is alive.
+
+        :param done: Function that waits at most the given number of
+                     seconds, and returns True when the wait is over.
+        """
+        deadline = None
+        if self.timeout is not None:
+            deadline = time.monotonic() + self.timeout
+
+        while not done(self.poll_interval):
+            if not self._process.is_alive():
+                self._raise_error()
+            if deadline is not None and time.monotonic() > deadline:
+                self._stop()
+                raise RuntimeError('The rendering process did not respond '
+                                   'within {} seconds'.format(self.timeout))
+
+    def _raise_error(self):
+        """
+        Stops the renderer and raises the error of the rendering process,
+        after the process has stopped.
+        """
+        try:
+            error = self._errors.get(timeout=1)
+        except queue.Empty:
+            error = 'The process ended with exit code {}'.format(
+                self._process.exitcode)
+        self._stop()
+        raise RuntimeError('The rendering process failed:\n' + error)
+
+    def _stop(self):
+        """ Stops the rendering process if it is alive and forgets it. """
+        if self._process.is_alive():
+            self._process.terminate()
+        self._process.join()
+        # Messages left in the queue are not waited for.
+        self._frames.cancel_join_thread()
+        self._process = None
+        self._frames = None
+        self._errors = None
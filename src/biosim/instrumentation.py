@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+
+__author__ = "Sebastian Kihle & Andreas Hoeimyr"
+__email__ = "sebaskih@nmbu.no & andrehoi@nmbu.no"
+
+"""
+File with the instrumentation that measures where a simulation spends its
+time.
+"""
+
+from contextlib import contextmanager
+import json
+import sys
+import time
+
+
+def census(island):
+    """
+    Counts the cells in use and the animals on the island.
+
+    :param island: Map instance.
+    :return: Number of cells in use and number of animals.
+    """
+    cells = 0
+    animals = 0
+    for _, cell in island.cells():
+        cells += 1
+        animals += len(cell.present_herbivores) + \
+            len(cell.present_carnivores) + len(cell.present_vultures)
+    return cells, animals
+
+
+class Instrumentation:
+    """
+    The Instrumentation class records how long each stage of each
+    simulated year takes. It is given to ``BioSim.simulate``, which then
+    measures each pass of the year pipeline, the counting of the animals,
+    the visualization, the statistics sinks and the decay of the left
+    overs. Nothing is measured when no Instrumentation is given.
+
+    For each stage and year a record is stored with
+
+        year: The simulated year.
+        stage: Name of the stage. Stages run in one pass through the map
+               are measured together, e.g. 'ageing+weight_loss+death'.
+        seconds: Wall clock time used by the stage.
+        cells: Number of cells in use when the stage started.
+        animals: Number of animals when the stage started.
+        animals_per_second: animals divided by seconds.
+        allocated_blocks: Change in the number of memory blocks allocated
+                          by Python during the stage.
+        error: Name of the exception that stopped the stage, or None.
+
+    Counting the cells and animals takes one pass through the map per
+    stage. Set census to False to only measure time and allocations.
+
+    :param census: Counts the cells and animals before each stage if True.
+    """
+
+    def __init__(self, census=True):
+        self.census = census
+        self.records = []
+
+    @contextmanager
+    def measure(self, year, stage, island=None):
+        """
+        Measures the code run inside the with statement as one stage. The
+        stage is recorded also if it raises an exception, with the name of
+        the exception in the error field.
+
+        :param year: The simulated year.
+        :param stage: Name of the stage.
+        :param island: Map the cells and animals are counted on, nothing
+                       is counted if None.
+        """
+        cells = animals = None
+        if self.census and island is not None:
+            cells, animals = census(island)
+
+        blocks = sys.getallocatedblocks()
+        start = time.perf_counter()
+        error = None
+        try:
+            yield
+        except BaseException as exception:
+            error = type(exception).__name__
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+
+            record = {'year': year, 'stage': stage, 'seconds': seconds,
+                      'cells': cells, 'animals': animals,
+                      'animals_per_second': None,
+                      'allocated_blocks': sys.getallocatedblocks() - blocks,
+                      'error': error}
+            if animals is not None and seconds > 0:
+                record['animals_per_second'] = animals / seconds
+            self.records.append(record)
+
+    def summary(self):
+        """
+        Adds up the records of each stage over all years.
+
+        :return: Dictionary mapping stage names to a dictionary with the
+                 number of years, the total seconds, the share of the total
+                 time, the mean animals per second and the total change in
+                 allocated blocks.
+        """
+        total_seconds = sum(record['seconds'] for record in self.records)
+        stages = {}
+        for record in self.records:
+            stage = stages.setdefault(record['stage'], {
+                'years': 0, 'seconds': 0., 'animals': 0,
+                'allocated_blocks': 0})
+            stage['years'] += 1
+            stage['seconds'] += record['seconds']
+            stage['animals'] += record['animals'] or 0
+            stage['allocated_blocks'] += record['allocated_blocks']
+
+        for stage in stages.values():
+            stage['share'] = stage['seconds'] / total_seconds \
+                if total_seconds > 0 else 0.
+            stage['animals_per_second'] = stage.pop('animals') / \
+                stage['seconds'] if stage['seconds'] > 0 else 0.
+        return stages
+
+    def report(self):
+        """
+        Formats the summary as a table, with the slowest stage first.
+
+        :return: String with one line per stage.
+        """
+        lines = ['{:<30} {:>6} {:>10} {:>6} {:>14} {:>12}'.format(
+            'stage', 'years', 'seconds', 'share', 'animals/s', 'blocks')]
+        summary = sorted(self.summary().items(),
+                         key=lambda item: item[1]['seconds'], reverse=True)
+        for name, stage in summary:
+            lines.append('{:<30} {:>6} {:>10.4f} {:>6.1%} {:>14.0f} '
+                         '{:>12}'.format(name, stage['years'],
+                                         stage['seconds'], stage['share'],
+                                         stage['animals_per_second'],
+                                         stage['allocated_blocks']))
+        return '\n'.join(lines)
+
+    def write_jsonl(self, filename):
+        """
+        Writes the records to a file with one JSON object per line.
+
+        :param filename: Path of the file.
+        """
+        with open(filename, 'w') as file:
+            for record in self.records:
+                file.write(json.dumps(record) + '\n')
@@ -3,93 +3,510 @@
 __author__ = "Sebastian Kihle & Andreas Hoeimyr"
 __email__ = "sebaskih@nmbu.no & andrehoi@nmbu.no"
 
+from .animals import Animal
 from .geography import Mountain, Savannah, Jungle, Desert, Ocean, \
     OutOfBounds
+from .state import SPECIES_ATTRIBUTES
+import gc
+import math
 import numpy as np
-import re
+
+
+# Letters of the biomes. The position of a letter is its code in the
+# code_map of a Map.
+BIOME_LETTERS = 'OMDJS'
+BIOME_CLASSES = (Ocean, Mountain, Desert, Jungle, Savannah)
+OCEAN_CODE = BIOME_LETTERS.index('O')
+
+# Relative difference from the initial food below which a cell of a sparse
+# map counts as regrown, see Map.prune.
+PRUNE_TOLERANCE = 1e-12
+
+# One cell of each biome, returned by Map.neighbours for cells of a sparse
+# map that are not in use and that the animals looking cannot enter. No
+# animal is ever added to them, so they are shared by all maps.
+_SHARED_CELLS = [biome() for biome in BIOME_CLASSES]
+
+# First bytes of a binary map file, followed by the number of rows and
+# columns. See write_binary_map.
+MAP_MAGIC = b'BIOMAP\x01\x00'
+MAP_HEADER_SIZE = len(MAP_MAGIC) + 8
+
+# Lookup table from character to biome code. Characters that are not
+# biomes get the code _INVALID_CODE.
+_INVALID_CODE = 255
+_CODE_LOOKUP = np.full(256, _INVALID_CODE, dtype=np.uint8)
+for _code, _letter in enumerate(BIOME_LETTERS):
+    _CODE_LOOKUP[ord(_letter)] = _code
+
+
+def biome_codes(biome_names):
+    """
+    Finds the codes of biomes given by the names of their classes, e.g. the
+    legal biomes of an animal.
+
+    :param biome_names: Names of biome classes, e.g. 'Jungle'.
+    :return: List of biome codes.
+    """
+    return [code for code, biome in enumerate(BIOME_CLASSES)
+            if biome.__name__ in biome_names]
+
+
+def parse_island_map(island_map):
+    """
+    Converts a multi-line string or bytes with the island geography into a
+    NumPy array of biome codes, without looping over the cells in Python.
+    The code of a biome is the position of its letter in BIOME_LETTERS.
+
+    Raises a ValueError if the lines have different lengths, if the map
+    contains letters that are not biomes or if the edge of the map is not
+    ocean.
+
+    :param island_map: Multi-line string or bytes with letters J, S, D, O, M
+    :return: NumPy array of uint8 with one code per cell.
+    """
+    if isinstance(island_map, str):
+        island_map = island_map.encode('utf-8')
+    characters = np.frombuffer(island_map, dtype=np.uint8)
+
+    # Finds the start and end of each line, skipping empty lines.
+    newlines = np.flatnonzero(characters == ord('\n'))
+    starts = np.concatenate(([0], newlines + 1))
+    ends = np.concatenate((newlines, [len(characters)]))
+    lengths = ends - starts
+    lengths = lengths[lengths > 0]
+    if len(lengths) == 0:
+        raise ValueError('Map must contain at least one line')
+
+    # Checks that all lines in the map are as long as the first line.
+    if (lengths != lengths[0]).any():
+        raise ValueError('All lines in map must me same length')
+
+    # Checks that all letters in the map are defined for this island.
+    codes = _CODE_LOOKUP[characters[characters != ord('\n')]]
+    if (codes == _INVALID_CODE).any():
+        raise ValueError('Map contains biome not defined for this island')
+
+    code_map = codes.reshape(len(lengths), lengths[0])
+    check_ocean_edges(code_map)
+    return code_map
+
+
+def write_binary_map(filename, island_map):
+    """
+    Writes a map to a binary map file that can be opened with
+    Map.from_binary. The file starts with the 8 bytes MAP_MAGIC and the
+    number of rows and columns as little-endian uint32, followed by one
+    uint8 biome code per cell in row-major order.
+
+    :param filename: Path of the binary map file.
+    :param island_map: Multi-line string specifying island geography, or a
+                       Map instance.
+    """
+    if isinstance(island_map, Map):
+        code_map = island_map.code_map
+    else:
+        code_map = parse_island_map(island_map)
+
+    with open(filename, 'wb') as file:
+        file.write(MAP_MAGIC)
+        file.write(np.array(code_map.shape, dtype='<u4').tobytes())
+        file.write(np.ascontiguousarray(code_map, dtype=np.uint8).tobytes())
+
+
+def check_ocean_edges(code_map):
+    """
+    Verifies that cells on the edge of the map are ocean biomes, and raises
+    a ValueError if not.
+
+    :param code_map: NumPy array of biome codes.
+    """
+    for edge in (code_map[0], code_map[-1], code_map[:, 0], code_map[:, -1]):
+        if (edge != OCEAN_CODE).any():
+            raise ValueError('Edge of map must be ocean')
 
 
 class Map:
     """
-    The Map class takes a multiline string as input and creates a numpy
-    array of it.
-    The numpy array will contain one letter in each position and is saved as
-    biome_map.
-
-    The biome_map is then used to create a numpy array of class instances
-    named array_map. This is done with a dictionary. Each position in the
-    biome_map is a single letter string. In the dictionary(biome_dict) the
-    string is a key with a class instance as a value. The class instances in
-    the dictionary are the different classes defined in the geography file.
-    E. g. if a position in the biome_map is 'J' it will be
-    the class Jungle in the array_map.
+    The Map class takes a multiline string as input and converts it to a
+    numpy array of biome codes, saved as code_map. The code of a biome is
+    the position of its letter in BIOME_LETTERS. The string is converted
+    with NumPy operations on its bytes, so large maps are parsed without
+    looping over the cells in Python. The letters of the map are available
+    as biome_map.
+
+    The code_map is used to create a numpy array of class instances named
+    array_map. Each code is mapped to a class defined in the geography
+    file. E. g. if a position in the biome_map is 'J' it will be the class
+    Jungle in the array_map. The class instances are only created the first
+    time array_map is used.
+
+    If sparse is True no array_map is created. The class instances are
+    instead stored in a dictionary with the flat index of the cell as key,
+    and are only created for cells that are used, e.g. cells that animals
+    are added or migrate to. Cells that are in the same state as a new
+    class instance, i.e. without animals or left overs and with the initial
+    amount of food, are removed by the prune method. The memory used then
+    depends on the number of occupied cells instead of the size of the map.
+    Use the cell method to get the class instance of a cell in both modes.
+
+    The left overs from carnivore kills in all cells are kept in the NumPy
+    array left_overs, with one slot per cell, so they can be reset with
+    one call to fill. In a map that is not sparse the slot of a cell is
+    its flat index.
 
     The Map class also checks that the input string fulfills certain criteria.
     Each row of the multiline string must have the same amount of letters,
     else a ValueError is raised.
     The string can only contain the letters which has corresponding classes.
-    This is checked using ``regular expression``. As of now the only legal
-    letters are J, D, S, O and M, corresponding to the biomes Jungle,
-    Desert, Savannah, Ocean and Mountain. If there are different letters in
-    the input string a ValueError is raised.
+    This is checked using a lookup table from characters to biome codes. As
+    of now the only legal letters are J, D, S, O and M, corresponding to the
+    biomes Jungle, Desert, Savannah, Ocean and Mountain. If there are
+    different letters in the input string a ValueError is raised.
     It checks that the string gives a map where all edge cells are ocean,
     if not a ValueError is raised. See ``Examples`` for an example of an
     accepted input string.
 
     :param: A multiline string with letters J, S, D, O, M
+    :param sparse: Only stores the cells that are used if True.
     """
-    def __init__(self, island_multiline_sting):
+    biome_dict = dict(zip(BIOME_LETTERS, BIOME_CLASSES))
+
+    def __init__(self, island_multiline_sting, sparse=False):
         self.island_multiline_sting = island_multiline_sting
         self.x = 0
         self.y = 0
-        self.top = OutOfBounds()
-        self.bottom = OutOfBounds()
-        self.left = OutOfBounds()
-        self.right = OutOfBounds()
-
-        # Splits the multiline string and converts it into an array.
-        area = self.island_multiline_sting.split()
-        string_map = [[cell for cell in string] for string in area]
-        self.biome_map = np.array(string_map)
-
-        # Checks that all lines in the multiline string map are as long as
-        # the first line.
-        reference_length = len(self.biome_map[0])
-        for lines in self.biome_map:
-            if len(lines) != reference_length:
-                raise ValueError('All lines in map must me same length')
-
-        # Using regular expression to check if all letters in input string
-        # are defined for this island.
-        if re.fullmatch(r"[OMDJS\n]+", island_multiline_sting) is None:
-            raise ValueError('Map contains biome not defined for this island')
-
-        # Verifies that cells on the edge of the map are ocean biomes.
-        for cell in self.biome_map[0]:
-            if not cell == 'O':
-                raise ValueError('Edge of map must be ocean')
-
-        for cell in self.biome_map[-1]:
-            if not cell == 'O':
-                raise ValueError('Edge of map must be ocean')
-
-        for cell in self.biome_map.T[0]:
-            if not cell == 'O':
-                raise ValueError('Edge of map must be ocean')
-
-        for cell in self.biome_map.T[-1]:
-            if not cell == 'O':
-                raise ValueError('Edge of map must be ocean')
-
-        # Converts array elements from strings to object instances
-        self.array_map = np.array(string_map, dtype=object)
-        self.biome_dict = {'O': Ocean, 'D': Desert, 'J': Jungle, 'M': Mountain,
-                           'S': Savannah}
-
-        for row in range(self.array_map.shape[0]):
-            for col in range(self.array_map.shape[1]):
-                self.array_map[row, col] = self.biome_dict[self.array_map[
-                    row, col]]()
+
+        # Converts the multiline string to a NumPy array of biome codes and
+        # checks that it is a valid map.
+        self._set_code_map(parse_island_map(island_multiline_sting), sparse)
+
+    def _set_code_map(self, code_map, sparse=False, map_file=None):
+        """
+        Stores the biome codes of the map.
+
+        :param code_map: NumPy array of biome codes.
+        :param sparse: Only stores the cells that are used if True.
+        :param map_file: Path of the binary map file the codes are mapped
+                         from, None if they are kept in memory.
+        """
+        self.code_map = code_map
+        self.shape = code_map.shape
+        self.sparse = sparse
+        self._map_file = map_file
+
+        # The class instances of the cells and the letters of the biomes
+        # are created when first used.
+        self._array_map = None
+        self._biome_map = None
+        self._cells = {}
+
+        # The left overs of the cells are kept in one array with a slot
+        # for each cell. In a map that is not sparse the slot of a cell is
+        # its flat index. In a sparse map the slots of removed cells are
+        # reused, and the array grows when all slots are taken.
+        if sparse:
+            self.left_overs = np.zeros(16)
+            self._free_slots = []
+            self._num_slots = 0
+        else:
+            self.left_overs = np.zeros(code_map.size)
+
+    def _new_cell(self, code, slot):
+        """
+        Creates the class instance of a cell, with its left overs kept in
+        the left_overs array.
+
+        :param code: Biome code of the cell.
+        :param slot: Index of the cell in the left_overs array.
+        :return: Class instance of the biome.
+        """
+        cell = BIOME_CLASSES[code]()
+        cell.store_left_overs_in(self, slot)
+        return cell
+
+    def _take_slot(self):
+        """
+        Finds a free slot in the left_overs array of a sparse map, and
+        doubles the size of the array if all slots are taken.
+
+        :return: Index of the slot.
+        """
+        if len(self._free_slots) > 0:
+            return self._free_slots.pop()
+
+        if self._num_slots == len(self.left_overs):
+            self.left_overs = np.concatenate(
+                (self.left_overs, np.zeros(len(self.left_overs))))
+        self._num_slots += 1
+        return self._num_slots - 1
+
+    def __getstate__(self):
+        """
+        A map opened from a binary map file is pickled with the path of the
+        file instead of the codes, so processes that receive the map share
+        the file through the page cache instead of copying it.
+        """
+        state = self.__dict__.copy()
+        if self._map_file is not None:
+            state['code_map'] = None
+        state['_biome_map'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self._map_file is not None:
+            self.code_map = self._open_binary(self._map_file)
+
+    def fork(self):
+        """
+        Creates a copy of the map with its own cells, animals and left
+        overs. The biome codes, which never change, are shared with the
+        original, also when they are mapped from a binary map file, so only
+        the cells in use and their animals are copied. The garbage collector
+        is paused while they are copied, as in Animal.from_arrays.
+
+        :return: Map instance.
+        """
+        island = self.__class__.__new__(self.__class__)
+        island.__dict__.update(self.__dict__)
+        island.left_overs = self.left_overs.copy()
+
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            if self.sparse:
+                island._free_slots = list(self._free_slots)
+                island._cells = {index: self._fork_cell(cell, island)
+                                 for index, cell in self._cells.items()}
+            elif self._array_map is not None:
+                fork_cell = np.frompyfunc(
+                    lambda cell: self._fork_cell(cell, island), 1, 1)
+                island._array_map = fork_cell(self._array_map).astype(object)
+        finally:
+            if gc_enabled:
+                gc.enable()
+        return island
+
+    @staticmethod
+    def _fork_cell(cell, island):
+        """
+        Copies a cell and its animals for a forked map.
+
+        :param cell: Class instance of the biome in the cell.
+        :param island: The forked map keeping the left overs of the copy.
+        :return: Class instance of the biome.
+        """
+        copy = cell.__class__.__new__(cell.__class__)
+        copy.__dict__.update(cell.__dict__)
+        copy._store = island
+        for attribute in SPECIES_ATTRIBUTES:
+            setattr(copy, attribute,
+                    Animal.copy_animals(getattr(cell, attribute)))
+        return copy
+
+    @classmethod
+    def from_file(cls, filename, sparse=False):
+        """
+        Creates a map from a text file with the island geography.
+
+        :param filename: Path to file with the multi-line map.
+        :param sparse: Only stores the cells that are used if True.
+        :return: Map instance.
+        """
+        with open(filename) as file:
+            return cls(file.read(), sparse)
+
+    @classmethod
+    def from_binary(cls, filename, sparse=False):
+        """
+        Opens a binary map file written by write_binary_map. The biome codes
+        are mapped read-only into memory with numpy.memmap, so the map is
+        opened in constant time and only the parts that are used are read
+        from disk. The letters of the map are checked when the file is
+        written, only the edges are checked when it is opened.
+
+        :param filename: Path of the binary map file.
+        :param sparse: Only stores the cells that are used if True.
+        :return: Map instance.
+        """
+        code_map = cls._open_binary(filename)
+        check_ocean_edges(code_map)
+
+        island = cls.__new__(cls)
+        island.island_multiline_sting = None
+        island.x = 0
+        island.y = 0
+        island._set_code_map(code_map, sparse, filename)
+        return island
+
+    @staticmethod
+    def _open_binary(filename):
+        """
+        Maps the biome codes of a binary map file into memory.
+
+        :param filename: Path of the binary map file.
+        :return: Read-only numpy.memmap with the biome codes.
+        """
+        with open(filename, 'rb') as file:
+            header = file.read(MAP_HEADER_SIZE)
+        if len(header) < MAP_HEADER_SIZE or \
+                not header.startswith(MAP_MAGIC):
+            raise ValueError('{} is not a binary map file'.format(filename))
+
+        shape = tuple(int(n) for n in np.frombuffer(header[len(MAP_MAGIC):],
+                                                      dtype='<u4'))
+        return np.memmap(filename, dtype=np.uint8, mode='r',
+                         offset=MAP_HEADER_SIZE, shape=shape)
+
+    @property
+    def biome_map(self):
+        """
+        Read-only NumPy array with the letter of the biome in each cell.
+        The array is created from the biome codes the first time the
+        biome_map is used.
+        """
+        if self._biome_map is None:
+            biome_map = np.array(list(BIOME_LETTERS))[self.code_map]
+            biome_map.flags.writeable = False
+            self._biome_map = biome_map
+        return self._biome_map
+
+    @property
+    def array_map(self):
+        """
+        NumPy array with a class instance of the biome in each cell. The
+        instances are created the first time the array_map is used.
+        Sparse maps have no array_map.
+        """
+        if self.sparse:
+            raise ValueError('A sparse map has no array_map, use cell')
+        if self._array_map is None:
+            create_cell = np.frompyfunc(self._new_cell, 2, 1)
+            slots = np.arange(self.code_map.size).reshape(self.shape)
+            self._array_map = create_cell(self.code_map, slots).astype(object)
+        return self._array_map
+
+    def cell(self, row, col):
+        """
+        Returns the class instance of a cell. In a sparse map the instance
+        is created if the cell is not in use.
+
+        :param row: Row of the cell.
+        :param col: Column of the cell.
+        :return: Class instance of the biome in the cell.
+        """
+        if not self.sparse:
+            return self.array_map[row, col]
+
+        index = int(np.ravel_multi_index((row, col), self.shape))
+        cell = self._cells.get(index)
+        if cell is None:
+            cell = self._new_cell(self.code_map[row, col], self._take_slot())
+            self._cells[index] = cell
+        return cell
+
+    def cells(self):
+        """
+        Yields the flat index and class instance of each cell in use, in
+        row-major order. All cells are in use in a map that is not sparse.
+
+        :yields: Tuple with flat index and class instance of a cell.
+        """
+        if not self.sparse:
+            yield from enumerate(self.array_map.flat)
+        else:
+            for index in sorted(self._cells):
+                yield index, self._cells[index]
+
+    def prune(self):
+        """
+        Removes the cells of a sparse map that are in the same state as a
+        new class instance, i.e. without animals or left overs and with the
+        initial amount of food. Does nothing if the map is not sparse.
+
+        The food of a grazed savannah only approaches f_max when it regrows,
+        so the food is compared with a relative tolerance of PRUNE_TOLERANCE.
+        """
+        if not self.sparse:
+            return
+
+        unused = []
+        for index, cell in self._cells.items():
+            if len(cell.present_herbivores) == 0 and \
+                    len(cell.present_carnivores) == 0 and \
+                    len(cell.present_vultures) == 0 and \
+                    cell.left_overs == 0 and \
+                    math.isclose(cell.available_food, cell.initial_food(),
+                                 rel_tol=PRUNE_TOLERANCE):
+                unused.append(index)
+
+        for index in unused:
+            self._free_slots.append(self._cells.pop(index)._slot)
+
+    def _neighbour(self, row, col):
+        """
+        Returns the class instance of a cell, or an OutOfBounds cell if the
+        position is outside the map.
+
+        :param row: Row of the cell.
+        :param col: Column of the cell.
+        :return: Class instance of the cell.
+        """
+        if 0 <= row < self.shape[0] and 0 <= col < self.shape[1]:
+            return self.cell(row, col)
+        return OutOfBounds()
+
+    def neighbours(self, legal_biomes=None):
+        """
+        Returns the cells north, south, west and east of the current cell
+        of the map_iterator, like top, bottom, left and right.
+
+        In a sparse map, a neighbour that is not in use and has a biome
+        that is not in legal_biomes is not created. A cell of the biome
+        shared by all maps is returned instead, so the cells the animals
+        cannot enter, e.g. the ocean along the coast, are never stored.
+
+        :param legal_biomes: Names of the biomes the animals can enter,
+                             all biomes if None.
+        :return: Tuple with the four neighbouring cells.
+        """
+        positions = ((self.y - 1, self.x), (self.y + 1, self.x),
+                     (self.y, self.x - 1), (self.y, self.x + 1))
+        if not self.sparse or legal_biomes is None:
+            return tuple(self._neighbour(row, col) for row, col in positions)
+
+        cells = []
+        for row, col in positions:
+            if 0 <= row < self.shape[0] and 0 <= col < self.shape[1]:
+                code = self.code_map[row, col]
+                index = row * self.shape[1] + col
+                if index not in self._cells and \
+                        BIOME_CLASSES[code].__name__ not in legal_biomes:
+                    cells.append(_SHARED_CELLS[code])
+                    continue
+            cells.append(self._neighbour(row, col))
+        return tuple(cells)
+
+    @property
+    def top(self):
+        """ The cell north of the current cell of the map_iterator. """
+        return self._neighbour(self.y - 1, self.x)
+
+    @property
+    def bottom(self):
+        """ The cell south of the current cell of the map_iterator. """
+        return self._neighbour(self.y + 1, self.x)
+
+    @property
+    def left(self):
+        """ The cell west of the current cell of the map_iterator. """
+        return self._neighbour(self.y, self.x - 1)
+
+    @property
+    def right(self):
+        """ The cell east of the current cell of the map_iterator. """
+        return self._neighbour(self.y, self.x + 1)
 
     def map_iterator(self):
         """
@@ -104,51 +521,30 @@ class Map:
 
         Each time the map_iterator is called the values of x and y are reset
         to zero. The iterator then yields each cell until it has yielded
-        each cell in the array_map.
+        each cell in the array_map. In a sparse map only the cells in use
+        when the iteration starts are yielded, in the same order.
 
-        The map_iterator saves the surrounding cells around the current
-        cell. If the current cell is on the edge of the map,
-        the neighbouring cell outside the map is set to be OutOfBounds cell.
-        These neighbouring cells are stored and used when animals migrate.
+        The surrounding cells around the current cell are available as top,
+        bottom, left and right. If the current cell is on the edge of the
+        map, the neighbouring cell outside the map is an OutOfBounds cell.
+        These neighbouring cells are used when animals migrate, and are only
+        looked up when used.
 
         :yields: Object in current cell.
 
         """
-        # Starts in top left corner of map.
-        self.x = 0
-        self.y = 0
+        columns = self.shape[1]
+        if self.sparse:
+            cells = [(index, self._cells[index])
+                     for index in sorted(self._cells)]
+        else:
+            cells = enumerate(self.array_map.flat)
 
-        # For each cell in the map yields the object.
-        while True:
-            if self.y >= 1:
-                self.top = self.array_map[self.y-1, self.x]
-            else:
-                self.top = OutOfBounds()
-
-            if self.y < len(self.biome_map.T[0]) - 1:
-                self.bottom = self.array_map[self.y+1, self.x]
-            else:
-                self.bottom = OutOfBounds()
-
-            if self.x >= 1:
-                self.left = self.array_map[self.y, self.x-1]
-            else:
-                self.left = OutOfBounds()
-
-            if self.x < len(self.biome_map[0]) - 1:
-                self.right = self.array_map[self.y, self.x+1]
-            else:
-                self.right = OutOfBounds()
+        for index, cell in cells:
+            self.y, self.x = divmod(index, columns)
             # Use yield to be able to iterate through the map.
-            yield self.array_map[self.y, self.x]
-            self.x += 1
-
-            # When it reaches the end of the row, start at the first column,
-            # second row.
-            if self.x >= len(self.biome_map[0]):
-                self.y += 1
-                self.x = 0
-
-            # Stops when reaching bottom right cell of the map.
-            if self.y >= len(self.biome_map.T[0]):
-                return
+            yield cell
+
+        # Stops after the bottom right cell of the map.
+        self.x = 0
+        self.y = self.shape[0]
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+
+__author__ = "Sebastian Kihle & Andreas Hoeimyr"
+__email__ = "sebaskih@nmbu.no & andrehoi@nmbu.no"
+
+"""
+File with helpers for the animals of the island laid out cell by cell, so
+that the animals of one cell are a consecutive segment of one array.
+"""
+
+import numpy as np
+
+
+def segment_offsets(lengths):
+    """
+    Finds the start of each segment when segments of the given lengths are
+    placed after each other. The end of segment i is the start of segment
+    i + 1, so the offsets have one more element than lengths.
+
+    :param lengths: Number of elements in each segment.
+    :return: NumPy array with the offsets of the segments.
+    """
+    offsets = np.zeros(len(lengths) + 1, dtype=np.intp)
+    np.cumsum(lengths, out=offsets[1:])
+    return offsets
+
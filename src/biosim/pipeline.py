@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+
+__author__ = "Sebastian Kihle & Andreas Hoeimyr"
+__email__ = "sebaskih@nmbu.no & andrehoi@nmbu.no"
+
+"""
+File with the pipeline that runs the stages of a simulated year.
+"""
+
+SCOPES = ('cell', 'map')
+
+
+class Stage:
+    """
+    The Stage class describes one step of a simulated year, e.g. ageing.
+
+    A stage with scope 'cell' only reads and changes the cell it is given,
+    so it can be run for one cell after the other in any order. Its action
+    is called as ``action(cell, tracer)`` for each cell. A stage with scope
+    'map' moves animals or information between cells, e.g. migration, and
+    its action is called once as ``action(tracer=tracer)``. The tracer is a
+    Tracer recording the events of the stage, or None.
+
+    A stage that draws random numbers must say so, since running it
+    together with another stage that draws random numbers would change the
+    order the random numbers are drawn in.
+
+    A stage with defer_fitness set changes the age or weight of the
+    animals without recalculating their fitness. The pipeline recalculates
+    the fitness of the animals in the cell once before the fitness is used
+    by a later stage.
+
+    :param name: Name of the stage.
+    :param action: Function that runs the stage.
+    :param scope: 'cell' or 'map'.
+    :param draws_random: True if the stage draws random numbers.
+    :param defer_fitness: True if the stage leaves the fitness to the
+                          pipeline.
+    """
+
+    def __init__(self, name, action, scope='map', draws_random=False,
+                 defer_fitness=False):
+        if scope not in SCOPES:
+            raise ValueError('scope must be one of {}'.format(SCOPES))
+        if defer_fitness and scope != 'cell':
+            raise ValueError('Only cell stages can defer the fitness')
+
+        self.name = name
+        self.action = action
+        self.scope = scope
+        self.draws_random = draws_random
+        self.defer_fitness = defer_fitness
+
+    def __repr__(self):
+        return 'Stage({!r}, scope={!r})'.format(self.name, self.scope)
+
+
+def refresh_fitness(cell):
+    """
+    Recalculates the fitness of all animals in a cell.
+
+    :param cell: Class instance of the cell.
+    """
+    for animals in (cell.present_herbivores, cell.present_carnivores,
+                    cell.present_vultures):
+        for animal in animals:
+            animal.calculate_fitness()
+
+
+class Pipeline:
+    """
+    The Pipeline class runs the stages of a year in order. Consecutive
+    stages with scope 'cell' are fused into one pass through the map, where
+    all fused stages are run for a cell before moving on to the next cell,
+    so the animals of each cell are only visited once per pass.
+
+    Fusing gives the same result as running the stages one after the
+    other, each through the whole map. The cell stages do not depend on
+    other cells, and at most one stage in a pass draws random numbers, so
+    the random numbers are drawn in the same order. The stages themselves
+    may still differ from older versions of the cycles, e.g. carnivores
+    hunt with the NumPy generator of the simulation, so a seeded
+    simulation does not repeat the results of those versions.
+
+    :param stages: List of Stage instances in the order they are run.
+    :param island: The Map the cell stages are run on.
+    """
+
+    def __init__(self, stages, island):
+        self.stages = list(stages)
+        self.island = island
+        self.passes = self.schedule(self.stages)
+
+    @staticmethod
+    def schedule(stages):
+        """
+        Groups the stages into passes. A pass is either one map stage, or
+        consecutive cell stages where at most one draws random numbers.
+
+        :param stages: List of Stage instances in the order they are run.
+        :return: List of passes, each a list of stages.
+        """
+        passes = []
+        for stage in stages:
+            if stage.scope == 'cell' and len(passes) > 0 and \
+                    passes[-1][0].scope == 'cell' and \
+                    not (stage.draws_random and
+                         any(fused.draws_random for fused in passes[-1])):
+                passes[-1].append(stage)
+            else:
+                passes.append([stage])
+        return passes
+
+    def _run_cell_pass(self, stages, tracer=None):
+        """
+        Runs fused cell stages for each cell of the map.
+
+        :param stages: List of cell stages.
+        :param tracer: Tracer instance, or None.
+        """
+        for cell in self.island.map_iterator():
+            stale_fitness = False
+            for stage in stages:
+                if stale_fitness and not stage.defer_fitness:
+                    refresh_fitness(cell)
+                    stale_fitness = False
+                stage.action(cell, tracer)
+                stale_fitness = stale_fitness or stage.defer_fitness
+
+            if stale_fitness:
+                refresh_fitness(cell)
+
+    def _run_pass(self, stages, tracer=None):
+        """
+        Runs one pass.
+
+        :param stages: List of stages in the pass.
+        :param tracer: Tracer instance, or None.
+        """
+        if stages[0].scope == 'map':
+            stages[0].action(tracer=tracer)
+        else:
+            self._run_cell_pass(stages, tracer)
+
+    def run(self, tracer=None, instrumentation=None, year=None):
+        """
+        Runs all stages once. If instrumentation is given each pass is
+        measured as one stage, named by the names of its stages joined by
+        '+'.
+
+        :param tracer: Tracer instance, or None.
+        :param instrumentation: Instrumentation instance, or None.
+        :param year: The simulated year, used by the instrumentation.
+        """
+        if instrumentation is None:
+            for stages in self.passes:
+                self._run_pass(stages, tracer)
+            return
+
+        for stages in self.passes:
+            name = '+'.join(stage.name for stage in stages)
+            with instrumentation.measure(year, name, self.island):
+                self._run_pass(stages, tracer)
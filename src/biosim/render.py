@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+
+__author__ = "Sebastian Kihle & Andreas Hoeimyr"
+__email__ = "sebaskih@nmbu.no & andrehoi@nmbu.no"
+
+"""
+File with the offline renderer that draws the frames of a simulation from
+the animal counts recorded by a HeatmapRecorder.
+"""
+
+import multiprocessing
+import numpy as np
+
+from .graphics import Graphics
+from .statistics import SPECIES, open_heatmap_history, read_heatmap_header
+
+# Set in each worker process by _start_worker.
+_worker = {}
+
+
+def _population_history(cube, chunk_years=100):
+    """
+    Counts the number of animals of each species on the island each year.
+    The cube is read chunk_years years at a time.
+
+    :param cube: Cube from open_heatmap_history.
+    :param chunk_years: Number of years read from disk at a time.
+    :return: Array with one row per year and one column per species.
+    """
+    history = np.zeros((cube.shape[0], cube.shape[-1]), dtype=np.int64)
+    for start in range(0, cube.shape[0], chunk_years):
+        history[start:start + chunk_years] = cube[
+            start:start + chunk_years].sum(axis=(1, 2))
+    return history
+
+
+def _start_worker(filename, history, graphics_args):
+    """
+    Opens the cube and creates the figure in a worker process.
+
+    :param filename: The filename given to the HeatmapRecorder.
+    :param history: Array from _population_history.
+    :param graphics_args: Arguments used to create the Graphics instance.
+    """
+    # The figures are only saved to file, so no window is needed.
+    import matplotlib.pyplot as plt
+    plt.switch_backend('agg')
+
+    header = read_heatmap_header(filename)
+    first_year = header['first_year']
+
+    graphics = Graphics(*graphics_args)
+    graphics.setup(first_year + len(history))
+
+    # The line graphs start at year 0, also if the recording did not.
+    full_history = np.full((first_year + len(history), len(SPECIES)), np.nan)
+    full_history[first_year:] = history
+
+    _worker['cube'] = open_heatmap_history(filename)
+    _worker['graphics'] = graphics
+    _worker['history'] = full_history
+    _worker['first_year'] = first_year
+
+
+def _render_frames(frames):
+    """
+    Draws and saves a list of frames in a worker process. The frames must
+    be in increasing order.
+
+    :param frames: List of (image number, index in cube) pairs.
+    :return: Number of frames saved.
+    """
+    cube = _worker['cube']
+    graphics = _worker['graphics']
+    first_year = _worker['first_year']
+    history = _worker['history']
+
+    # Removes the years drawn in the previous chunk of this worker, and
+    # makes the next update draw the whole figure.
+    graphics.set_line_history(np.full(history.shape, np.nan))
+    graphics.setup(len(history))
+
+    drawn_until = 0
+    for img_no, index in frames:
+        year = first_year + index
+        counts = {species: cube[index, :, :, number]
+                  for number, species in enumerate(SPECIES)}
+        totals = {species: int(counts[species].sum()) for species in SPECIES}
+
+        # Years that are not drawn are still part of the line graphs.
+        graphics.set_line_history(history[drawn_until:year], drawn_until)
+        graphics.update(year, counts, totals)
+        graphics.save(img_no)
+        drawn_until = year
+    return len(frames)
+
+
+def render_history(filename, img_base, img_years=1, processes=None,
+                   ymax_animals=None, cmax_animals=None, island_map=None,
+                   movie=True):
+    """
+    Draws the frames of a recorded simulation in parallel and creates a
+    movie from them.
+
+    The frames have the same layout as the graphical interface of BioSim.
+    The years are split into consecutive chunks that are drawn by a pool of
+    worker processes, so the frames are drawn about N times faster on N
+    cores. Each worker fills in the line graphs up to the start of its
+    chunk from the recorded counts.
+
+    :param filename: The filename given to the HeatmapRecorder.
+    :param img_base: String with beginning of file name for figures.
+    :param img_years: Years between frames.
+    :param processes: Number of worker processes, number of cores if None.
+    :param ymax_animals: Number specifying y-axis limit for graph.
+    :param cmax_animals: Dictionary specifying color-code limits.
+    :param island_map: Multi-line string specifying island geography. The
+                       map stored by the HeatmapRecorder is used if None.
+    :param movie: Creates a movie from the frames if True.
+    :return: Number of frames saved.
+    """
+    header = read_heatmap_header(filename)
+    if island_map is None:
+        island_map = header['island_map']
+    if island_map is None:
+        raise ValueError('No island map stored in {}, give it as '
+                         'island_map'.format(filename))
+
+    history = _population_history(open_heatmap_history(filename))
+    frames = list(enumerate(range(0, len(history), img_years)))
+    if len(frames) == 0:
+        return 0
+
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+
+    # Several chunks per worker, so the workers finish at the same time.
+    num_chunks = min(len(frames), 4 * processes)
+    chunks = [[(int(img_no), int(index)) for img_no, index in chunk]
+              for chunk in np.array_split(frames, num_chunks)]
+
+    graphics_args = (island_map, ymax_animals, cmax_animals, img_base, 'png')
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(processes, initializer=_start_worker,
+                      initargs=(filename, history, graphics_args)) as pool:
+        num_frames = sum(pool.imap_unordered(_render_frames, chunks))
+
+    if movie:
+        Graphics(*graphics_args).make_movie()
+    return num_frames
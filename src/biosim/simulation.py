@@ -5,13 +5,28 @@ __author__ = "Sebastian Kihle & Andreas Hoeimyr"
 __email__ = "sebaskih@nmbu.no & andrehoi@nmbu.no"
 
 from .animals import Herbivore, Carnivore, Vulture
-from .island_class import Map
+from .checkpoint import catch_signals, load_checkpoint, save_checkpoint
+from .island_class import Map, biome_codes
+from .graphics import Graphics
+from .pipeline import Pipeline, Stage
+from .state import IslandState, YearSnapshot, SPECIES_ATTRIBUTES
+from .statistics import SPECIES
+from .stopping import (COMPLETED, INTERRUPTED, TIME_BUDGET,
+                       SimulationStatus)
+from .tracing import BIRTHS, DEATHS, KILLS, MOVES
+from contextlib import contextmanager, nullcontext
 import pandas as pd
 import numpy as np
 
-import matplotlib.pyplot as plt
 import random
-import subprocess
+import time
+import warnings
+
+# Classes of the species, in the order of SPECIES.
+SPECIES_CLASSES = (Herbivore, Carnivore, Vulture)
+
+# Columns of a population given as arrays or a DataFrame.
+POPULATION_COLUMNS = ('species', 'row', 'col', 'age', 'weight')
 
 
 class BioSim:
@@ -24,6 +39,7 @@ class BioSim:
             cmax_animals=None,
             img_base=None,
             img_fmt="png",
+            sparse=False,
     ):
         """
         The BioSim class will simulate an ecosystem on an island. You need
@@ -38,8 +54,15 @@ class BioSim:
 
         :param island_map: Multi-line string specifying island geography.
 
+        island_map can also be a Map instance, e.g. a large map opened from
+        a binary map file with Map.from_binary, so the map is not copied
+        into a string.
+
         :param ini_pop: List of dictionaries specifying initial population.
 
+        ini_pop can also be given as columns of arrays or a DataFrame, see
+        add_population.
+
         :param seed: Integer used as random number seed.
 
         :param ymax_animals: Number specifying y-axis limit for graph.
@@ -67,41 +90,170 @@ class BioSim:
         img_base should contain a path and beginning of a file name
 
         :param img_fmt: String with file type for figures, e.g. 'png'
+
+        If img_fmt is 'mp4' the figures are streamed directly to the movie
+        file img_base + '.mp4' through ffmpeg instead of being saved as
+        images, and make_movie finishes the movie. If ffmpeg is not
+        installed png files are saved instead.
+
+        :param sparse: Only stores the cells of the map that are in use.
+
+        Use sparse=True for large maps where most cells have no animals.
+        See ``Map`` for details. Ignored if island_map is a Map instance.
         """
 
-        self.map = Map(island_map)
+        if isinstance(island_map, Map):
+            self.map = island_map
+        else:
+            self.map = Map(island_map, sparse)
         self.island_map = island_map
         self.seed = random.seed(seed)
+        # NumPy generator for the array based stages. random.seed accepts
+        # any hashable seed, so the generator is seeded through random.
+        self.rng = np.random.default_rng(random.Random(seed).getrandbits(128))
+        # State of the random module used by the simulation, None while it
+        # shares the global state, see reseed.
+        self._random_state = None
         self.current_year = 0
         self.sim_year = 0
 
-        # The following will be initialized by _setup_graphics.
-        self._fig = None
-        self._heatmap_herb_ax = None
-        self._heatmap_herb_graphics = None
-        self._line_graph_ax = None
-        self.herbivore_line_graph = None
-        self.legend_is_set_up = False
+        # Number of animals of each species left after death, counted by
+        # _death_cell when _run_year is asked to count them.
+        self._survivors = None
 
         self.add_population(ini_pop)
 
-        self._img_base = img_base
-        self._img_fmt = img_fmt
-        self._img_counter = 0
+        # The stages of a simulated year.
+        self._pipeline = Pipeline(self._year_stages(), self.map)
 
-        if ymax_animals is None:
-            self.graph_ymax = 8000
-        else:
-            self.graph_ymax = ymax_animals
+        # The figure is created by _setup_graphics.
+        self._graphics_args = (island_map, ymax_animals, cmax_animals,
+                               img_base, img_fmt)
+        self._graphics = Graphics(*self._graphics_args)
 
-        if cmax_animals is None:
-            self.color_bar_max_herb = 150
-            self.color_bar_max_carn = 100
-            self.color_bar_max_vult = 20
-        else:
-            self.color_bar_max_herb = cmax_animals['Herbivore']
-            self.color_bar_max_carn = cmax_animals['Carnivore']
-            self.color_bar_max_vult = cmax_animals['Vulture']
+    def _year_stages(self):
+        """
+        Lists the stages of a simulated year in the order they are run. The
+        stages with scope 'cell' only change the animals in one cell, and
+        consecutive cell stages are run in one pass through the map by the
+        Pipeline, e.g. ageing, weight loss and death.
+
+        :return: List of Stage instances.
+        """
+        return [
+            Stage('feeding', self.feeding_cycle, 'map', draws_random=True),
+            Stage('breeding', self._breed_cell, 'cell', draws_random=True),
+            Stage('migration', self.migration_cycle, 'map',
+                  draws_random=True),
+            Stage('ageing', self._age_cell, 'cell', defer_fitness=True),
+            Stage('weight_loss', self._lose_weight_cell, 'cell',
+                  defer_fitness=True),
+            Stage('death', self._death_cell, 'cell', draws_random=True),
+        ]
+
+    def __getstate__(self):
+        """
+        The state pickled by save_checkpoint. The figure and the stages of
+        the year are left out and created again when the simulation is
+        loaded.
+        """
+        state = self.__dict__.copy()
+        del state['_graphics']
+        del state['_pipeline']
+        return state
+
+    def __setstate__(self, state):
+        """ Restores a simulation pickled by save_checkpoint. """
+        self.__dict__.update(state)
+        self._pipeline = Pipeline(self._year_stages(), self.map)
+        self._graphics = Graphics(*self._graphics_args)
+
+    def save_checkpoint(self, filename):
+        """
+        Writes the full state of the simulation to a checkpoint file, see
+        ``checkpoint.save_checkpoint``. The figure is not saved.
+
+        :param filename: Path of the checkpoint file.
+        """
+        save_checkpoint(self, filename)
+
+    @classmethod
+    def from_checkpoint(cls, filename):
+        """
+        Loads a simulation from a checkpoint file written by
+        save_checkpoint. The random number generators and the animal and
+        biome parameters are restored with it, so the simulation continues
+        as if it had never stopped.
+
+        :param filename: Path of the checkpoint file.
+        :return: BioSim instance.
+        """
+        sim = load_checkpoint(filename)
+        if not isinstance(sim, cls):
+            raise ValueError('{} is not a checkpoint of a {}'.format(
+                filename, cls.__name__))
+        return sim
+
+    def branch_seed(self):
+        """
+        Finds a new seed for a branch of the simulation. The seeds are
+        spawned from the seed of the NumPy generator, so they are different
+        for each branch and the same in each run, and the random numbers of
+        the simulation do not change.
+
+        :return: Integer seed.
+        """
+        child = self.rng.bit_generator.seed_seq.spawn(1)[0]
+        return int.from_bytes(child.generate_state(4).tobytes(), 'little')
+
+    def reseed(self, seed):
+        """
+        Gives the simulation its own random number streams from a seed. The
+        simulation then no longer uses or changes the global state of the
+        random module, so it can run beside other simulations without
+        changing their random numbers.
+
+        :param seed: Integer used as random number seed.
+        """
+        self.rng = np.random.default_rng(random.Random(seed).getrandbits(128))
+        self._random_state = random.Random(seed).getstate()
+
+    def fork(self, seed=None):
+        """
+        Creates an independent copy of the simulation with its own random
+        number streams, e.g. to simulate several scenarios after the same
+        burn-in::
+
+            sim.simulate(100)
+            branch = sim.fork()
+            branch.add_population(carnivores)
+            branch.simulate(100)
+
+        Neither simulation changes the other, and the random numbers of the
+        parent are the same as if it was never forked. The biome codes of
+        the map are shared, and only the cells in use and the animals are
+        copied, see ``Map.fork``. The animals are Python objects that change
+        every year, so the cost of a fork grows with the number of animals,
+        but is far smaller than simulating the burn-in again.
+
+        The animal and biome parameters are class attributes and are still
+        shared, use ``branching.run_branches`` to give each scenario its own
+        parameters.
+
+        :param seed: Integer used as random number seed of the copy. A seed
+                     is found with branch_seed if None.
+        :return: BioSim instance.
+        """
+        if seed is None:
+            seed = self.branch_seed()
+        state = self.__getstate__()
+        state['map'] = self.map.fork()
+        if self.island_map is self.map:
+            state['island_map'] = state['map']
+        branch = self.__class__.__new__(self.__class__)
+        branch.__setstate__(state)
+        branch.reseed(seed)
+        return branch
 
     @staticmethod
     def set_animal_parameters(species, params):
@@ -130,50 +282,105 @@ class BioSim:
         """
         self.map.biome_dict[landscape].biome_parameters(params)
 
-    def feeding_cycle(self, prints=False):
+    def feeding_cycle(self, prints=None, tracer=None):
         """
         Eating cycle for each animal in each cell. The animal with the
         highest fitness eats first for each species. The carnivores will try to
         eat the herbivores with the lowest fitness first.
 
-        Calls the respective feeding method for each animal.
+        Calls the respective feeding method for each animal. The carnivores
+        of each cell hunt together through ``Carnivore.hunt_cell``, which
+        draws its random numbers from the NumPy generator ``self.rng``
+        seeded with the seed of the simulation.
 
-        :param prints: Prints relevant actions if True.
+        :param prints: Deprecated and ignored, events are recorded by
+                       the tracer.
+        :param tracer: Tracer recording the kills, or None.
         """
+        tracer = self._cycle_tracer(prints, tracer)
 
-        for cell in self.map.map_iterator():
-            if prints:
-                print('Current cell:', type(cell).__name__, 'Feeding')
+        # Sorts each list in according to order of descending fitness.
+        self._sort_by_fitness(SPECIES_ATTRIBUTES, descending=True)
 
+        for cell in self.map.map_iterator():
             cell.regrow()
 
-            # Sorts each list in according to order of descending fitness.
-            cell.present_herbivores.sort(key=lambda x: x.phi, reverse=True)
-            cell.present_carnivores.sort(key=lambda x: x.phi, reverse=True)
-            cell.present_vultures.sort(key=lambda x: x.phi, reverse=True)
-
             # Eating method for the herbivores.
             for herbivore in cell.present_herbivores:
                 cell.available_food = herbivore.eat(cell.available_food)
-                if prints:
-                    print('Weight of herbivore:', herbivore.weight)
 
-            cell.present_herbivores.sort(key=lambda x: x.phi)
-            # Eating method for each carnivore in cell.
-            for carnivore in cell.present_carnivores:
-                left_overs_from_kills = carnivore.hunt(cell.present_herbivores)
-                if left_overs_from_kills is not None:
-                    cell.left_overs += left_overs_from_kills
+        # Eating does not use random numbers, so the herbivores of all cells
+        # can eat before the carnivores of any cell hunt.
+        self._sort_by_fitness(['present_herbivores'])
 
-                # Only keeps the herbivores that survived the hunt
-                alive_herbivores = [herbivore for herbivore in
-                                    cell.present_herbivores if herbivore.alive]
+        for cell in self.map.map_iterator():
+            # The carnivores in the cell hunt, and only the herbivores that
+            # survived the hunt are kept.
+            herbivores = len(cell.present_herbivores)
+            cell.present_herbivores, left_overs_from_kills = \
+                Carnivore.hunt_cell(cell.present_carnivores,
+                                    cell.present_herbivores, self.rng)
+            cell.left_overs += left_overs_from_kills
+
+            if tracer is not None:
+                tracer.record(KILLS, 0, self.map.y, self.map.x,
+                              herbivores - len(cell.present_herbivores))
+
+        # Vultures eat the left overs from the carnivore hunt.
+        scavenging_cells = [cell for _, cell in self.map.cells()
+                            if len(cell.present_vultures) > 0]
+        if len(scavenging_cells) > 0:
+            left_overs = Vulture.scavenge_cells(
+                [cell.present_vultures for cell in scavenging_cells],
+                np.array([cell.left_overs for cell in scavenging_cells]))
+            for cell, cell_left_overs in zip(scavenging_cells, left_overs):
+                cell.left_overs = cell_left_overs
+
+    def _sort_by_fitness(self, attributes, descending=False):
+        """
+        Sorts the animals in each cell by fitness, in one pass through the
+        cells in use. The sort is stable, also in descending order.
 
-                cell.present_herbivores = alive_herbivores
+        :param attributes: Names of the lists of animals to sort, e.g.
+                           'present_herbivores'.
+        :param descending: Sorts in descending order of fitness if True.
+        """
+        for _, cell in self.map.cells():
+            self._sort_cell(cell, attributes, descending)
 
-            # Vultures eat the left overs from the carnivore hunt.
-            for vulture in cell.present_vultures:
-                cell.left_overs = vulture.scavenge(cell.left_overs)
+    @staticmethod
+    def _sort_cell(cell, attributes, descending=False):
+        """
+        Sorts the animals in one cell by fitness, see _sort_by_fitness.
+
+        :param cell: Class instance of the cell.
+        :param attributes: Names of the lists of animals to sort.
+        :param descending: Sorts in descending order of fitness if True.
+        """
+        for attribute in attributes:
+            getattr(cell, attribute).sort(key=lambda animal: animal.phi,
+                                          reverse=descending)
+
+    @staticmethod
+    def _cycle_tracer(prints, tracer):
+        """
+        Checks the arguments given to a cycle method. The cycles used to
+        take a flag printing each action, which is replaced by the tracer.
+        The flag is still accepted, but only gives a DeprecationWarning.
+
+        :param prints: The deprecated print flag, or None.
+        :param tracer: Tracer instance, or None.
+        :return: The tracer.
+        """
+        if prints is not None:
+            warnings.warn('prints is deprecated and ignored, give a Tracer '
+                          'with the tracer keyword to record the events',
+                          DeprecationWarning, stacklevel=3)
+        if tracer is not None and not callable(getattr(tracer, 'record',
+                                                       None)):
+            raise TypeError('tracer must be a Tracer or None, not {}'.format(
+                type(tracer).__name__))
+        return tracer
 
     @staticmethod
     def _breed_one_species(present_animals):
@@ -200,29 +407,38 @@ class BioSim:
         # Updates the herbivores present in the cell.
         return current_animals + newborn_animals
 
-    def breeding_cycle(self, prints=False):
+    def breeding_cycle(self, prints=None, tracer=None):
         """
         Method for yearly breeding for all animals. All animals breed.
         Animals have no gender, so there only needs to be one other animal
         of same species in the cell to reproduce.
 
-        :param prints: Prints relevant actions if True.
+        :param prints: Deprecated and ignored, events are recorded by
+                       the tracer.
+        :param tracer: Tracer recording the births, or None.
         """
+        tracer = self._cycle_tracer(prints, tracer)
 
         for cell in self.map.map_iterator():
-            if prints:
-                print('Current cell:', type(cell).__name__, 'Breeding')
+            self._breed_cell(cell, tracer)
 
-            cell.present_herbivores = self._breed_one_species(
-                cell.present_herbivores)
+    def _breed_cell(self, cell, tracer=None):
+        """
+        Breeds the animals in one cell, see breeding_cycle.
 
-            cell.present_carnivores = self._breed_one_species(
-                cell.present_carnivores)
+        :param cell: Class instance of the cell.
+        :param tracer: Tracer recording the births, or None.
+        """
+        for species, attribute in enumerate(SPECIES_ATTRIBUTES):
+            present_animals = getattr(cell, attribute)
+            animals = self._breed_one_species(present_animals)
+            setattr(cell, attribute, animals)
 
-            cell.present_vultures = self._breed_one_species(
-                cell.present_vultures)
+            if tracer is not None:
+                tracer.record(BIRTHS, species, self.map.y, self.map.x,
+                              len(animals) - len(present_animals))
 
-    def _migrate_one_species(self, present_animals, prints=False):
+    def _migrate_one_species(self, present_animals, species, tracer=None):
         """
         Migrates all of one species in the current cell. Animals have a
         parameter that tracks if the animal has moved during the year. This
@@ -230,7 +446,8 @@ class BioSim:
         left the cell.
 
         :param present_animals: The list of a species present in the cell.
-        :param prints: prints relevant information if True.
+        :param species: Index of the species in SPECIES.
+        :param tracer: Tracer recording the moves, or None.
         :return: The animals that stay in the current cell.
         """
         # Herbivores in cell at start of cycle.
@@ -239,10 +456,18 @@ class BioSim:
         # Herbivores that leave the current cell.
         exited_animals = []
 
+        # The neighbouring cells are looked up once for the cell. All
+        # animals of the species can enter the same biomes.
+        neighbours = None
+
+        # Number of animals moved to each neighbour, only when tracing.
+        moved = [0, 0, 0, 0] if tracer is not None else None
+
         for animal in migrating_animals:
             if not animal.has_moved:
-                target_cell = animal.migrate(self.map.top, self.map.bottom,
-                                             self.map.left, self.map.right)
+                if neighbours is None:
+                    neighbours = self.map.neighbours(animal.legal_biomes)
+                target_cell = animal.migrate(*neighbours)
                 animal.has_moved = True
 
                 # Moves to the target cell unless it is an invalid biome.
@@ -255,40 +480,48 @@ class BioSim:
                         target_cell.present_vultures.append(animal)
 
                     exited_animals.append(animal)
-                    if prints:
-                        print('An animal moved to ',
-                              type(target_cell).__name__)
+                    if moved is not None:
+                        moved[[neighbour is target_cell for neighbour in
+                               neighbours].index(True)] += 1
+
+        if moved is not None:
+            row, col = self.map.y, self.map.x
+            for (to_row, to_col), count in zip(
+                    ((row - 1, col), (row + 1, col), (row, col - 1),
+                     (row, col + 1)), moved):
+                tracer.record(MOVES, species, row, col, count, to_row,
+                              to_col)
 
         # Updates present herbivores in the cell.
         return [animal for animal in migrating_animals if animal not in
                 exited_animals]
 
-    def migration_cycle(self, prints=False):
+    def migration_cycle(self, prints=None, tracer=None):
         """
         Migration method that moves all animals on the map. Animals move
         depending on fitness, where the animal of each species with the
         highest fitness moves first. Herbivores move first.
 
-        :param prints: Prints relevant actions if True.
+        :param prints: Deprecated and ignored, events are recorded by
+                       the tracer.
+        :param tracer: Tracer recording the moves, or None.
         """
+        tracer = self._cycle_tracer(prints, tracer)
 
         for cell in self.map.map_iterator():
-            if prints:
-                print('Current cell:', type(cell).__name__, 'migration')
-
-            # Sorts each list in according to order of descending fitness.
-            cell.present_herbivores.sort(key=lambda x: x.phi, reverse=True)
-            cell.present_carnivores.sort(key=lambda x: x.phi, reverse=True)
-            cell.present_vultures.sort(key=lambda x: x.phi, reverse=True)
+            # Sorts each list in according to order of descending fitness,
+            # just before the animals of the cell migrate. Animals that
+            # arrived from earlier cells are sorted in with the others.
+            self._sort_cell(cell, SPECIES_ATTRIBUTES, descending=True)
 
             cell.present_herbivores = self._migrate_one_species(
-                cell.present_herbivores, prints)
+                cell.present_herbivores, 0, tracer)
 
             cell.present_carnivores = self._migrate_one_species(
-                cell.present_carnivores, prints)
+                cell.present_carnivores, 1, tracer)
 
             cell.present_vultures = self._migrate_one_species(
-                cell.present_vultures, prints)
+                cell.present_vultures, 2, tracer)
 
         # Makes all animals able to move again next year.
         for cell in self.map.map_iterator():
@@ -301,128 +534,155 @@ class BioSim:
             for vulture in cell.present_vultures:
                 vulture.has_moved = False
 
-    def ageing_cycle(self, prints=False):
+    def ageing_cycle(self, prints=None, tracer=None):
         """
         Ages all animals on the map by one year by calling the 'ageing'
-        method for each animal.
+        method for each animal. The fitness of all animals of a species is
+        then updated at once with 'update_fitness'.
 
-        :param prints: Prints relevant actions if True.
+        :param prints: Deprecated and ignored, events are recorded by
+                       the tracer.
+        :param tracer: Tracer, no events are recorded by ageing.
         """
+        tracer = self._cycle_tracer(prints, tracer)
+        animals = {attribute: [] for attribute in SPECIES_ATTRIBUTES}
 
         for cell in self.map.map_iterator():
-            if prints:
-                print('Current cell:', type(cell).__name__, 'ageing')
+            self._age_cell(cell, tracer)
+            for attribute in SPECIES_ATTRIBUTES:
+                animals[attribute].extend(getattr(cell, attribute))
 
-            # Ages the herbivores, then the carnivores.
-            for herbivore in cell.present_herbivores:
-                herbivore.ageing()
-                if prints:
-                    print('Age:', herbivore.age)
-
-            for carnivore in cell.present_carnivores:
-                carnivore.ageing()
-                if prints:
-                    print('Age:', carnivore.age)
-
-            for vulture in cell.present_vultures:
-                vulture.ageing()
-                if prints:
-                    print('Age:', vulture.age)
+        self._update_fitness(animals)
 
-    def weight_loss_cycle(self, prints=False):
+    @staticmethod
+    def _age_cell(cell, tracer=None):
         """
-        Each animal on the map loses weight by calling the 'lose_weight'
-        method for each animal.
+        Ages the animals in one cell without recalculating their fitness.
 
-        :param prints: Prints relevant actions if True.
+        :param cell: Class instance of the cell.
+        :param tracer: Tracer, no events are recorded by ageing.
         """
-        for cell in self.map.map_iterator():
-            if prints:
-                print('Current cell:', type(cell).__name__, 'weight_loss')
+        # Ages the herbivores, then the carnivores.
+        for herbivore in cell.present_herbivores:
+            herbivore.ageing(update_fitness=False)
 
-            # The herbivores lose weight, then the carnivores.
-            for herbivore in cell.present_herbivores:
-                herbivore.lose_weight()
-                if prints:
-                    print('Weight after loss:', herbivore.weight)
+        for carnivore in cell.present_carnivores:
+            carnivore.ageing(update_fitness=False)
 
-            for carnivore in cell.present_carnivores:
-                carnivore.lose_weight()
-                if prints:
-                    print('Weight after loss:', carnivore.weight)
-
-            for vulture in cell.present_vultures:
-                vulture.lose_weight()
-                if prints:
-                    print('Weight after loss:', vulture.weight)
+        for vulture in cell.present_vultures:
+            vulture.ageing(update_fitness=False)
 
-    def death_cycle(self, prints=False):
+    def weight_loss_cycle(self, prints=None, tracer=None):
         """
-        Each animal has a chance of dying. The probability depends
-        on fitness. The lower the fitness, the higher the chances of dying.
-        Removes dead animals.
+        Each animal on the map loses weight by calling the 'lose_weight'
+        method for each animal. The fitness of all animals of a species is
+        then updated at once with 'update_fitness'.
 
-        :param prints: Prints relevant actions if True.
+        :param prints: Deprecated and ignored, events are recorded by
+                       the tracer.
+        :param tracer: Tracer, no events are recorded by weight loss.
         """
+        tracer = self._cycle_tracer(prints, tracer)
+        animals = {attribute: [] for attribute in SPECIES_ATTRIBUTES}
 
         for cell in self.map.map_iterator():
-            if prints:
-                print('Current cell:', type(cell).__name__, 'death')
-
-            for herbivore in cell.present_herbivores:
-                herbivore.potential_death()
+            self._lose_weight_cell(cell, tracer)
+            for attribute in SPECIES_ATTRIBUTES:
+                animals[attribute].extend(getattr(cell, attribute))
 
-            for carnivore in cell.present_carnivores:
-                carnivore.potential_death()
-
-            for vulture in cell.present_vultures:
-                vulture.potential_death()
+        self._update_fitness(animals)
 
-            # Removes herbivores killed from natural causes.
-            alive_herbivores = [herbivore for herbivore in
-                                cell.present_herbivores if herbivore.alive]
-
-            dead = len(cell.present_herbivores) - len(alive_herbivores)
-
-            if dead > 0:
-                if prints:
-                    print(dead, 'Herbivores died')
+    @staticmethod
+    def _lose_weight_cell(cell, tracer=None):
+        """
+        The animals in one cell lose weight, without recalculating their
+        fitness.
 
-            # Updates living herbivores in cell.
-            cell.present_herbivores = alive_herbivores
+        :param cell: Class instance of the cell.
+        :param tracer: Tracer, no events are recorded by weight loss.
+        """
+        # The herbivores lose weight, then the carnivores.
+        for herbivore in cell.present_herbivores:
+            herbivore.lose_weight(update_fitness=False)
 
-            alive_carnivores = [carnivore for carnivore in
-                                cell.present_carnivores if carnivore.alive]
+        for carnivore in cell.present_carnivores:
+            carnivore.lose_weight(update_fitness=False)
 
-            dead = len(cell.present_carnivores) - len(alive_carnivores)
+        for vulture in cell.present_vultures:
+            vulture.lose_weight(update_fitness=False)
 
-            if dead > 0:
-                if prints:
-                    print(dead, 'Carnivores died')
+    @staticmethod
+    def _update_fitness(animals):
+        """
+        Updates the fitness of the animals of each species at once.
 
-            # Updates living carnivores in cell.
-            cell.present_carnivores = alive_carnivores
+        :param animals: Dictionary mapping the names of the lists of animals
+                        in a cell, e.g. 'present_herbivores', to a list of
+                        animals of that species.
+        """
+        for species, attribute in zip(SPECIES_CLASSES, SPECIES_ATTRIBUTES):
+            species.update_fitness(animals[attribute])
 
-            # Removes vultures killed from natural causes.
-            alive_vultures = [vulture for vulture in cell.present_vultures
-                              if vulture.alive]
+    def death_cycle(self, prints=None, tracer=None):
+        """
+        Each animal has a chance of dying. The probability depends
+        on fitness. The lower the fitness, the higher the chances of dying.
+        Removes dead animals.
 
-            dead = len(cell.present_vultures) - len(alive_vultures)
+        :param prints: Deprecated and ignored, events are recorded by
+                       the tracer.
+        :param tracer: Tracer recording the deaths, or None.
+        """
+        tracer = self._cycle_tracer(prints, tracer)
 
-            if dead > 0:
-                if prints:
-                    print(dead, 'Vultures died')
+        for cell in self.map.map_iterator():
+            self._death_cell(cell, tracer)
 
-            # Updates living vultures in cell.
-            cell.present_vultures = alive_vultures
+    def _death_cell(self, cell, tracer=None):
+        """
+        Animals in one cell die with a probability depending on fitness,
+        and the dead animals are removed, see death_cycle.
 
-    def simulate(self, num_years, vis_years=1, img_years=None, prints=False):
+        :param cell: Class instance of the cell.
+        :param tracer: Tracer recording the deaths, or None.
+        """
+        for herbivore in cell.present_herbivores:
+            herbivore.potential_death()
+
+        for carnivore in cell.present_carnivores:
+            carnivore.potential_death()
+
+        for vulture in cell.present_vultures:
+            vulture.potential_death()
+
+        # Removes the animals killed from natural causes.
+        for species, attribute in enumerate(SPECIES_ATTRIBUTES):
+            present_animals = getattr(cell, attribute)
+            alive_animals = [animal for animal in present_animals
+                             if animal.alive]
+            setattr(cell, attribute, alive_animals)
+
+            # Death is the last stage of the year, so the animals left are
+            # the animals at the end of the year.
+            if self._survivors is not None:
+                self._survivors[species] += len(alive_animals)
+
+            if tracer is not None:
+                tracer.record(DEATHS, species, self.map.y, self.map.x,
+                              len(present_animals) - len(alive_animals))
+
+    def simulate(self, num_years, vis_years=1, img_years=None, prints=False,
+                 sinks=None, renderer=None, instrumentation=None,
+                 tracer=None, stop_conditions=None, time_budget=None,
+                 checkpoint=None):
         """
         Run simulation while visualizing the result. Each year consists of
         going through the feeding cycle of all animals, then the breeding
         cycle for all animals, then migration cycle, aging cycle weight loss
-        cycle and lastly the death cycle. Visualization will happen at the
-        end of each year.
+        cycle and lastly the death cycle. The cycles are run as the stages
+        of a Pipeline, where ageing, weight loss and death are done in one
+        pass through the map. Visualization will happen at the end of each
+        year.
         The simulation will run until it has reached the desired number of
         years simulated (num_years). The simulation also tracks the amount of
         years that have been simulated (current_year).
@@ -430,41 +690,290 @@ class BioSim:
         :param num_years: number of years to simulate.
         :param vis_years: years between visualization updates.
         :param img_years: years between visualizations saved to files.
-        :param prints: Option to print the actions in each cell.
+        :param prints: Prints the number of simulated years after each
+                       year if True.
+        :param sinks: List of statistics sinks, e.g. StatisticsWriter.
+        :param renderer: Draws the visualization in a separate process,
+                         e.g. BackgroundRenderer.
+        :param instrumentation: Measures the time used by each stage of
+                                each year, see Instrumentation.
+        :param tracer: Records the births, deaths, kills and moves in each
+                       cell, see Tracer.
+        :param stop_conditions: List of conditions that stop the
+                                simulation early, e.g. SpeciesExtinct.
+        :param time_budget: Wall clock seconds the simulation may use.
+        :param checkpoint: Path of the checkpoint written if the
+                           simulation is stopped by the time budget or a
+                           signal.
+        :return: SimulationStatus telling why and when the simulation
+                 stopped.
 
         Image files will be numbered consecutively.
+
+        Each statistics sink is given the number of animals of each species
+        in each cell at the end of every year through its ``record`` method.
+        The sinks are flushed when the simulation is done.
+
+        If a renderer is given the figure is drawn and saved by the
+        rendering process, and the simulation only sends it the animal
+        counts. The renderer is started on the first call to simulate and
+        must be closed by the user.
+
+        If instrumentation is given, each pass of the pipeline and the
+        aggregation, visualization, statistics and decay stages are
+        measured every year.
+
+        The stages only look for events to record if a tracer is given.
+
+        The stop conditions are checked after each year with the number of
+        animals of each species, which are counted by the death stage
+        while it goes through the map, so no extra pass is needed. The
+        simulation stops after the first year where a
+        condition is met, and the returned status gives the reason.
+
+        If a time budget is given, the simulation stops after the last year
+        that is expected to end within the budget, judged by the time used
+        by the year before. If a checkpoint is given, SIGTERM and SIGINT
+        no longer stop the program at once, but end the simulation after
+        the current year. In both cases the full state is written to the
+        checkpoint, and the returned status is resumable::
+
+            status = sim.simulate(5000, time_budget=3600,
+                                  checkpoint='run.ckpt')
+            ...
+            sim = BioSim.from_checkpoint('run.ckpt')
+            sim.simulate(status.remaining_years, checkpoint='run.ckpt')
         """
         self.sim_year = 0
+        if sinks is None:
+            sinks = []
+        if stop_conditions is None:
+            stop_conditions = []
+        for condition in stop_conditions:
+            condition.reset()
+
+        def measure(stage):
+            """ Measures a stage if instrumentation is given. """
+            return self._measure(instrumentation, stage)
+
+        if renderer is None:
+            self._setup_graphics(num_years)
+        else:
+            if not renderer.is_running:
+                renderer.start(*self._graphics_args)
+            renderer.setup(num_years + self.current_year)
+
+        # SIGTERM and SIGINT end the simulation after the current year if
+        # there is a checkpoint to save it to.
+        start = time.perf_counter()
+        with catch_signals(checkpoint is not None) as received:
+            while True:
+
+                # Yearly actions for all animals.
+                year_start = time.perf_counter()
+                totals = self._run_year(tracer, instrumentation,
+                                        count=len(stop_conditions) > 0)
+
+                # The animals are counted once and shared by the
+                # visualization and the statistics sinks.
+                visualize = self.current_year % vis_years == 0
+                save = img_years is not None and \
+                    self.current_year % img_years == 0
+                population = None
+                if visualize or save or len(sinks) > 0:
+                    with measure('aggregation'):
+                        population = self._aggregate_population()
+
+                if visualize or save:
+                    with measure('visualization'):
+                        if renderer is not None:
+                            renderer.push(self.year, population['counts'],
+                                          save)
+                        else:
+                            if visualize:
+                                self._update_graphics(population)
+
+                            if save:
+                                self._save_graphics()
+
+                if len(sinks) > 0:
+                    with measure('statistics'):
+                        for sink in sinks:
+                            sink.record(self.current_year,
+                                        population['counts'])
+
+                self._end_year(instrumentation)
+                if prints:
+                    print('Current year in sim:', self.sim_year)
+
+                status = None
+                remaining_years = num_years - self.sim_year
+                if len(stop_conditions) > 0:
+                    for condition in stop_conditions:
+                        reason = condition.check(totals)
+                        if reason is not None:
+                            status = SimulationStatus(
+                                reason, self.year, self.sim_year, condition,
+                                remaining_years=remaining_years)
+                            break
+
+                if status is None and remaining_years <= 0:
+                    status = SimulationStatus(COMPLETED, self.year,
+                                              self.sim_year)
+
+                # Stops before the next year if it would not finish within the
+                # time budget, judged by the time used by this year.
+                now = time.perf_counter()
+                if status is None and (len(received) > 0 or (
+                        time_budget is not None and
+                        now + (now - year_start) - start > time_budget)):
+                    reason = INTERRUPTED if len(received) > 0 else TIME_BUDGET
+                    status = SimulationStatus(reason, self.year, self.sim_year,
+                                              remaining_years=remaining_years,
+                                              checkpoint=checkpoint)
+                    if checkpoint is not None:
+                        self.save_checkpoint(checkpoint)
+
+                if status is not None:
+                    for sink in sinks:
+                        sink.flush()
+                    return status
+
+    def simulate_iter(self, num_years, grids=False, sinks=None,
+                      instrumentation=None, tracer=None):
+        """
+        Runs the simulation one year at a time, and yields a YearSnapshot
+        after each year, without visualization. The consumer can stop the
+        simulation at any time by not asking for more years, e.g. with
+        break in a for loop::
+
+            for snapshot in sim.simulate_iter(1000):
+                if snapshot.totals['Carnivore'] == 0:
+                    break
+
+        The snapshot of a year holds the number of the year, which is the
+        year the statistics sinks record the counts under, the number of
+        animals of each species and, if grids is True, the read-only count
+        grids of all species from ``state``. The counts are found in one
+        pass through the map, which is shared with the statistics sinks,
+        and are not copied.
+
+        :param num_years: Largest number of years to simulate.
+        :param grids: Includes the count grids in the snapshots if True.
+        :param sinks: List of statistics sinks, see simulate. The sinks are
+                      flushed when the simulation stops.
+        :param instrumentation: Measures the stages of each year, see
+                                simulate.
+        :param tracer: Records the events of each year, see simulate.
+        """
+        self.sim_year = 0
+        if sinks is None:
+            sinks = []
+
+        try:
+            for _ in range(num_years):
+                self._run_year(tracer, instrumentation)
+
+                with self._measure(instrumentation, 'aggregation'):
+                    state = self.state()
+
+                # The snapshot and the sinks give the counts the same year.
+                year = self.current_year
+                if len(sinks) > 0:
+                    with self._measure(instrumentation, 'statistics'):
+                        counts = {name: state.counts[number]
+                                  for number, name in enumerate(SPECIES)}
+                        for sink in sinks:
+                            sink.record(year, counts)
+
+                self._end_year(instrumentation)
+                yield YearSnapshot(year, state.totals,
+                                   state.counts if grids else None)
+        finally:
+            for sink in sinks:
+                sink.flush()
+
+    def _species_totals(self):
+        """
+        Counts the animals of each species from the length of the lists of
+        animals in each cell.
 
-        self._setup_graphics(num_years)
-        while True:
-
-            # Yearly actions for all animals.
-            self.feeding_cycle(prints)
-            self.breeding_cycle(prints)
-            self.migration_cycle(prints)
-            self.ageing_cycle(prints)
-            self.weight_loss_cycle(prints)
-            self.death_cycle(prints)
-
-            if self.current_year % vis_years == 0:
-                self._update_graphics()
+        :return: Dictionary with the number of animals of each species.
+        """
+        totals = [0] * len(SPECIES)
+        for _, cell in self.map.cells():
+            totals[0] += len(cell.present_herbivores)
+            totals[1] += len(cell.present_carnivores)
+            totals[2] += len(cell.present_vultures)
+        return dict(zip(SPECIES, totals))
+
+    def _measure(self, instrumentation, stage):
+        """
+        Measures a stage of the current year if instrumentation is given.
 
-            if img_years is not None:
-                if self.current_year % img_years == 0:
-                    self._save_graphics()
+        :param instrumentation: Instrumentation instance, or None.
+        :param stage: Name of the stage.
+        :return: Context manager measuring the stage.
+        """
+        if instrumentation is None:
+            return nullcontext()
+        return instrumentation.measure(self.current_year, stage)
 
-            self.sim_year += 1
-            self.current_year += 1
-            if prints:
-                print('Current year in sim:', self.sim_year)
+    def _run_year(self, tracer=None, instrumentation=None, count=False):
+        """
+        Runs the stages of the current year, see _year_stages.
+
+        :param tracer: Tracer instance, or None.
+        :param instrumentation: Instrumentation instance, or None.
+        :param count: Counts the animals of each species while the death
+                      stage goes through the map if True.
+        :return: Dictionary with the number of animals of each species at
+                 the end of the year if count is True, else None.
+        """
+        if tracer is not None:
+            tracer.year = self.current_year
+        self._survivors = [0] * len(SPECIES) if count else None
+        try:
+            with self._random_stream():
+                self._pipeline.run(tracer, instrumentation,
+                                   self.current_year)
+        finally:
+            survivors, self._survivors = self._survivors, None
+        return dict(zip(SPECIES, survivors)) if count else None
+
+    @contextmanager
+    def _random_stream(self):
+        """
+        Uses the random state of the simulation in the random module while
+        the block runs, if it has its own, see reseed.
+        """
+        if self._random_state is None:
+            yield
+            return
+        global_state = random.getstate()
+        random.setstate(self._random_state)
+        try:
+            yield
+        finally:
+            self._random_state = random.getstate()
+            random.setstate(global_state)
+
+    def _end_year(self, instrumentation=None):
+        """
+        Ends the current year. The left overs rot, unused cells of a sparse
+        map are removed and the year is counted.
 
+        :param instrumentation: Instrumentation instance, or None.
+        """
+        with self._measure(instrumentation, 'decay'):
             # Left overs from carnivore kills rot
-            for cell in self.map.map_iterator():
-                cell.left_overs = 0
+            self.map.left_overs.fill(0)
+
+            # Removes unused cells from a sparse map.
+            self.map.prune()
 
-            if self.sim_year >= num_years:
-                return
+        self.sim_year += 1
+        self.current_year += 1
 
     def add_population(self, population):
         """
@@ -473,8 +982,8 @@ class BioSim:
         Takes a list of dictionaries as input. First it unpacks the
         dictionaries to get the type of animal, e.g. Herbivore or Carnivore
         and the cell in which you would like to store the animals.
-        The method uses the coordinates to navigate the array_map produced
-        in the Map class and then appends the animal to the present animals
+        The method uses the coordinates to get the cell from the Map class
+        with ``Map.cell`` and then appends the animal to the present animals
         lists(present_herbivores, present_carnivores and present_vultures)
         in each cell(``see geography``). The method also checks that there
         are only valid inputs in the dictionary and raises a ValueError if
@@ -491,7 +1000,15 @@ class BioSim:
         {'species': 'Carnivore', 'age': 1, 'weight': 15}
         ]
         }]``
+
+        The population can also be given as columns with one element per
+        animal, see _add_population_columns. This is much faster for large
+        populations.
         """
+        if isinstance(population, (dict, pd.DataFrame)):
+            self._add_population_columns(population)
+            return
+
         # Unpacks the coordinates and animals to add.
         # Adds new animals to a temporary list.
         for dictionary in population:
@@ -514,32 +1031,102 @@ class BioSim:
                 if animal_class == 'Herbivore':
                     new_animal = Herbivore(animal['age'], animal['weight'])
 
-                    if type(self.map.array_map[coordinates]).__name__ not in \
+                    if type(self.map.cell(*coordinates)).__name__ not in \
                             new_animal.legal_biomes:
                         raise ValueError('This animal cannot be placed in '
                                          'this biome')
-                    self.map.array_map[coordinates]. \
+                    self.map.cell(*coordinates). \
                         present_herbivores.append(new_animal)
 
                 elif animal_class == 'Carnivore':
                     new_animal = Carnivore(animal['age'], animal['weight'])
-                    if type(self.map.array_map[coordinates]).__name__ not in \
+                    if type(self.map.cell(*coordinates)).__name__ not in \
                             new_animal.legal_biomes:
                         raise ValueError('This animal cannot be placed in '
                                          'this biome')
-                    self.map.array_map[coordinates]. \
+                    self.map.cell(*coordinates). \
                         present_carnivores.append(new_animal)
 
                 elif animal_class == 'Vulture':
                     new_animal = Vulture(animal['age'], animal['weight'])
 
-                    if type(self.map.array_map[coordinates]).__name__ not in \
+                    if type(self.map.cell(*coordinates)).__name__ not in \
                             new_animal.legal_biomes:
                         raise ValueError('This animal cannot be placed in '
                                          'this biome')
-                    self.map.array_map[coordinates]. \
+                    self.map.cell(*coordinates). \
                         present_vultures.append(new_animal)
 
+    def _add_population_columns(self, population):
+        """
+        Adds a population given as columns to the island. The population is
+        a dictionary of NumPy arrays or a Pandas DataFrame with the columns
+        species, row, col, age and weight, e.g. from
+        ``workload.generate_population``. The species are given by name.
+
+        The columns are checked at once before any animal is added. A
+        ValueError is raised for the same errors as for a list of
+        dictionaries, for unknown species and for cells outside the map.
+        The animals of each species are created at once with
+        ``from_arrays`` and added to each cell in the order they are given.
+
+        :param population: Dictionary or DataFrame with the columns.
+        """
+        for name in POPULATION_COLUMNS:
+            if name not in population:
+                raise ValueError('The population has no column '
+                                 '{}'.format(name))
+        columns = {name: np.asarray(population[name])
+                   for name in POPULATION_COLUMNS}
+        if len({len(column) for column in columns.values()}) != 1:
+            raise ValueError('The columns must have the same length')
+        if len(columns['species']) == 0:
+            return
+
+        for name in ('row', 'col'):
+            if not np.issubdtype(columns[name].dtype, np.integer):
+                raise ValueError('{} must be integers'.format(name))
+        rows, cols = columns['row'], columns['col']
+        if np.any((rows < 0) | (rows >= self.map.shape[0]) |
+                  (cols < 0) | (cols >= self.map.shape[1])):
+            raise ValueError('The animals must be placed on the map')
+        if np.any(columns['age'] < 0) or np.any(columns['weight'] < 0):
+            raise ValueError('Age and weight cannot be negative')
+
+        names, species = np.unique(columns['species'], return_inverse=True)
+        for name in names:
+            if name not in SPECIES:
+                raise ValueError('Unknown species {}'.format(name))
+        species = np.array([SPECIES.index(name) for name in names])[
+            species.ravel()]
+
+        # Checks the biome of every animal against its legal biomes.
+        codes = self.map.code_map[rows, cols]
+        for number, species_class in enumerate(SPECIES_CLASSES):
+            legal_codes = biome_codes(species_class(0, 1).legal_biomes)
+            if np.any(~np.isin(codes[species == number], legal_codes)):
+                raise ValueError('This animal cannot be placed in '
+                                 'this biome')
+
+        cells = rows.astype(np.intp) * self.map.shape[1] + cols
+        for number, species_class in enumerate(SPECIES_CLASSES):
+            selected = np.flatnonzero(species == number)
+            if len(selected) == 0:
+                continue
+
+            # The animals are grouped by cell, keeping their order.
+            selected = selected[np.argsort(cells[selected], kind='stable')]
+            animals = species_class.from_arrays(columns['age'][selected],
+                                                columns['weight'][selected])
+            cell_indices, starts = np.unique(cells[selected],
+                                             return_index=True)
+            ends = np.append(starts[1:], len(selected))
+            for index, start, end in zip(cell_indices.tolist(),
+                                         starts.tolist(), ends.tolist()):
+                cell = self.map.cell(*divmod(index, self.map.shape[1]))
+                getattr(cell, SPECIES_ATTRIBUTES[number]).extend(
+                    animals[start:end])
+
     @property
     def year(self):
         """
@@ -556,47 +1143,17 @@ class BioSim:
 
         :return: Total number of animals on island.
         """
-        animal_counter = 0
-
-        for cell in self.map.map_iterator():
-            for _ in cell.present_herbivores:
-                animal_counter += 1
-
-            for _ in cell.present_carnivores:
-                animal_counter += 1
-
-            for _ in cell.present_vultures:
-                animal_counter += 1
-        return animal_counter
+        return sum(self.num_animals_per_species.values())
 
     @property
     def num_animals_per_species(self):
         """
-        Number of animals per species in island, as dictionary.
+        Number of animals per species in island, as dictionary. Only the
+        cells in use are visited, and no count grids are created.
 
         :return: Dictionary with number of animals per species.
         """
-        animal_dictionary = {}
-        herbivore_counter = 0
-        carnivore_counter = 0
-        vulture_counter = 0
-
-        # Counts all animals in all cells
-        for cell in self.map.map_iterator():
-            for herbivore in cell.present_herbivores:
-                herbivore_counter += 1
-
-            for carnivore in cell.present_carnivores:
-                carnivore_counter += 1
-
-            for vulture in cell.present_vultures:
-                vulture_counter += 1
-
-        animal_dictionary['Herbivore'] = herbivore_counter
-        animal_dictionary['Carnivore'] = carnivore_counter
-        animal_dictionary['Vulture'] = vulture_counter
-
-        return animal_dictionary
+        return self._species_totals()
 
     @property
     def animal_distribution(self):
@@ -605,24 +1162,19 @@ class BioSim:
         each cell on island. The DataFrame has five columns one for row,
         one for columns and one for each of the three different animals.
 
+        The columns are made from the count grids of ``state`` without a
+        loop over the cells. Use ``state`` to get the counts as NumPy arrays
+        without creating a DataFrame.
+
         :return: Pandas DataFrame with animal distribution.
         """
-        list_of_all_herbivores = []
-        list_of_all_carnivores = []
-        list_of_all_vultures = []
-        list_of_rows = []
-        list_of_columns = []
-        for cell in self.map.map_iterator():
-            list_of_all_herbivores.append(len(cell.present_herbivores))
-            list_of_all_carnivores.append(len(cell.present_carnivores))
-            list_of_all_vultures.append(len(cell.present_vultures))
-            list_of_rows.append(self.map.y)
-            list_of_columns.append(self.map.x)
-
-        distribution_dict = {'Herbivore': list_of_all_herbivores,
-                             'Carnivore': list_of_all_carnivores,
-                             'Vulture': list_of_all_vultures,
-                             'Row': list_of_rows, 'Col': list_of_columns}
+        counts = self.state().counts
+        rows, columns = np.indices(self.map.shape)
+
+        distribution_dict = {'Row': rows.ravel(), 'Col': columns.ravel()}
+        for number, species in enumerate(SPECIES):
+            distribution_dict[species] = counts[number].ravel()
+
         data_frame = pd.DataFrame(distribution_dict, columns=['Row',
                                                               'Col',
                                                               'Carnivore',
@@ -630,352 +1182,172 @@ class BioSim:
                                                               'Vulture'])
         return data_frame
 
-    def _herb_array(self):
+    def state(self, attributes=False):
         """
-        Creates a NumPy array of the distribution of herbivores on the island.
-        This is used to create the heatmaps.
+        Returns the read-only state of the island now, see IslandState. The
+        count grid of each species is a view of one array of counts, and
+        if attributes is True the age, weight, fitness and cell of every
+        animal are gathered into NumPy arrays.
 
-        :return: A NumPy array with population of herbivores in each cell.
+        :param attributes: Gathers the attributes of every animal if True.
+        :return: IslandState instance.
         """
-        x_length = len(self.map.array_map[0])
-        y_length = len(self.map.array_map.T[0])
-
-        herb_array = np.zeros((y_length, x_length))
+        return IslandState(self.map, self.current_year, attributes)
 
-        for cell in self.map.map_iterator():
-            herb_array[self.map.y, self.map.x] = len(cell.present_herbivores)
-        return herb_array
-
-    def _carn_array(self):
+    def _aggregate_population(self, extended=False):
         """
-        Creates a NumPy array of the distribution of carnivores on the island.
-        This is used to create the heatmap for carnivores.
-
-        :return: A NumPy array with population of herbivores in each cell.
+        Counts the animals of each species in each cell of the island in
+        one pass through the map. The result is shared by the
+        visualization and the statistics sinks.
+
+        If extended is True the total weight (biomass) and the mean fitness
+        of each species in each cell are also calculated. The mean fitness
+        is NaN in cells without animals of the species. They are added up
+        per cell with ``numpy.bincount`` from the attributes of the animals
+        gathered by IslandState.
+
+        :param extended: Also calculates biomass and mean fitness if True.
+        :return: Dictionary with the keys ``counts`` and ``totals`` and,
+                 if extended, ``biomass`` and ``fitness``. Each maps the
+                 species names to a NumPy array or a number.
         """
-        x_length = len(self.map.array_map[0])
-        y_length = len(self.map.array_map.T[0])
-
-        carn_array = np.zeros((y_length, x_length))
+        state = self.state(attributes=extended)
+        population = {
+            'counts': {name: state.counts[number]
+                       for number, name in enumerate(SPECIES)},
+            'totals': state.totals
+        }
+
+        if extended:
+            population['biomass'] = {name: state.cell_sum(name, 'weight')
+                                     for name in SPECIES}
+            with np.errstate(invalid='ignore', divide='ignore'):
+                population['fitness'] = {
+                    name: state.cell_sum(name, 'fitness') /
+                    population['counts'][name] for name in SPECIES}
+        return population
 
-        for cell in self.map.map_iterator():
-            carn_array[self.map.y, self.map.x] = len(cell.present_carnivores)
-        return carn_array
-
-    def _vult_array(self):
-        """
-        Creates a NumPy array of the distribution of herbivores on the island.
-        This is used to create the heatmaps.
-
-        :return: A NumPy array with population of herbivores in each cell.
-        """
-        x_length = len(self.map.array_map[0])
-        y_length = len(self.map.array_map.T[0])
-
-        vult_array = np.zeros((y_length, x_length))
-
-        for cell in self.map.map_iterator():
-            vult_array[self.map.y, self.map.x] = len(cell.present_vultures)
-        return vult_array
+    @property
+    def _fig(self):
+        """ The figure of the graphical interface. """
+        return self._graphics._fig
 
-    def _create_colour_island(self, map):
-        """
-        Creates a colored map of the island.
+    @property
+    def _heatmap_herb_ax(self):
+        """ The axes of the herbivore heatmap. """
+        return self._graphics._heatmap_herb_ax
 
-        :param map: The string map
-        """
-        self.rgb_value = {'O': (0.0, 0.0, 1.0),  # blue
-                          'M': (0.5, 0.5, 0.5),  # grey
-                          'J': (0.0, 0.6, 0.0),  # dark green
-                          'S': (0.5, 1.0, 0.5),  # light green
-                          'D': (1.0, 1.0, 0.5)}  # light yellow
+    @property
+    def _heatmap_carn_ax(self):
+        """ The axes of the carnivore heatmap. """
+        return self._graphics._heatmap_carn_ax
 
-        map_rgb = [[self.rgb_value[column] for column in row] for row in
-                   map.splitlines()]
+    @property
+    def _line_graph_ax(self):
+        """ The axes of the population graph. """
+        return self._graphics._line_graph_ax
 
-        self._landscape_map_ax.imshow(map_rgb)
-        self._landscape_map_ax.grid(True)
-        self._landscape_map_ax.set_xticks(range(len(map_rgb[0])))
-        self._landscape_map_ax.set_xticklabels(range(len(map_rgb[0])))
-        self._landscape_map_ax.set_yticks(range(len(map_rgb)))
-        self._landscape_map_ax.set_yticklabels(range(len(map_rgb)))
+    @property
+    def legend_is_set_up(self):
+        """ True if the legends of the graphical interface are drawn. """
+        return self._graphics.legend_is_set_up
 
-    def _setup_graphics(self, num_years):
-        """
-        Creates a interface with 4 subplots. A map of the island with
-        colors, two heatmaps, one line graph and a colored map of the island.
-        Each heatmap depicts the distribution of an animal, one for
-        herbivores and one for carnivores. The line graph shows the total
-        number of each animal species on the island each year. The colored map
-        shows the position of the biomes on the map.
+    @property
+    def graph_ymax(self):
+        """ Upper limit of the y-axis of the population graph. """
+        return self._graphics.graph_ymax
 
-        :param num_years: Number of years simulated.
-        """
+    @graph_ymax.setter
+    def graph_ymax(self, value):
+        self._set_graphics_setting('graph_ymax', value)
 
-        # create new figure window
-        if self._fig is None:
-            self._fig = plt.figure()
-            self._fig.subplots_adjust(hspace=0.75)
-            self._fig.suptitle('Model of the Ecosystem of Rossoya')
-
-        # Add left subplot for images created with imshow().
-        # We cannot create the actual ImageAxis object before we know
-        # the size of the image, so we delay its creation.
-        if self._heatmap_herb_ax is None:
-            self._heatmap_herb_ax = self._fig.add_subplot(3, 2, 1)
-            self._heatmap_herb_graphics = None
-
-            self._heatmap_carn_ax = self._fig.add_subplot(3, 2, 3)
-            self._heatmap_carn_graphics = None
-
-            self._heatmap_vult_ax = self._fig.add_subplot(3, 2, 5)
-            self._heatmap_vult_graphics = None
-
-            self._landscape_map_ax = self._fig.add_subplot(3, 2, 2)
-
-            self._create_colour_island(self.island_map)
-
-            # Create the legend for the graphics
-            if not self.legend_is_set_up:
-                axlg = self._fig.add_axes([0.915, 0.725, 0.08, 0.15])
-                axlg.axis('off')
-                for ix, name in enumerate(('Ocn', 'Mtn', 'Jgl',
-                                           'Svn', 'Dst')):
-                    axlg.add_patch(plt.Rectangle((0., ix * 0.2), 0.3, 0.1,
-                                                 edgecolor='none',
-                                                 facecolor=self.rgb_value[name[
-                                                     0]]))
-                    axlg.text(0.35, ix * 0.2, name, transform=axlg.transAxes)
-
-                self._landscape_map_ax.title.set_text('Island map')
-                self._heatmap_herb_ax.title.set_text('Herbivore heatmap')
-                self._heatmap_carn_ax.title.set_text('Carnivore heatmap')
-                self._heatmap_vult_ax.title.set_text('Vulture heatmap')
-                self._landscape_map_ax.get_xaxis().set_visible(False)
-                self._landscape_map_ax.get_yaxis().set_visible(False)
-                self._heatmap_herb_ax.get_xaxis().set_visible(False)
-                self._heatmap_herb_ax.get_yaxis().set_visible(False)
-                self._heatmap_carn_ax.get_xaxis().set_visible(False)
-                self._heatmap_carn_ax.get_yaxis().set_visible(False)
-                self._heatmap_vult_ax.get_xaxis().set_visible(False)
-                self._heatmap_vult_ax.get_yaxis().set_visible(False)
-
-        # Add right subplot for line graph of population.
-        if self._line_graph_ax is None:
-            self._line_graph_ax = plt.subplot2grid((3, 2), (1, 1),
-                                                   rowspan=2, colspan=1)
-            self._line_graph_ax.set_ylim(0, self.graph_ymax)
-            self._line_graph_ax.yaxis.tick_right()
-            self._line_graph_ax.title.set_text('Population of species over '
-                                               'time')
-
-        # Needs updating on subsequent calls to simulate()
-        self._line_graph_ax.set_xlim(0, num_years + self.current_year)
-
-        if self.herbivore_line_graph is None:
-            herbivores_per_year = self._line_graph_ax.plot(
-
-                np.arange(0, num_years + self.current_year),
-                np.full(num_years + self.current_year, np.nan), 'g',
-                label='Herbivore count'
-
-            )
-
-            carnivores_per_year = self._line_graph_ax.plot(
-
-                np.arange(0, num_years + self.current_year),
-                np.full(num_years + self.current_year, np.nan), 'r',
-                label='Carnivore count'
-
-            )
-
-            vultures_per_year = self._line_graph_ax.plot(
-
-                np.arange(0, num_years + self.current_year),
-                np.full(num_years + self.current_year, np.nan), 'y',
-                label='Vulture count'
-
-            )
-
-            if not self.legend_is_set_up:
-                self._line_graph_ax.legend(loc='upper left', mode='expand')
-                self.legend_is_set_up = True
-
-            self.herbivore_line_graph = herbivores_per_year[0]
-            self.carnivore_line_graph = carnivores_per_year[0]
-            self.vulture_line_graph = vultures_per_year[0]
-        else:
-            years, herbivores = self.herbivore_line_graph.get_data()
-            years, carnivores = self.carnivore_line_graph.get_data()
-            years, vultures = self.vulture_line_graph.get_data()
+    @property
+    def color_bar_max_herb(self):
+        """ Upper limit of the colour bar of the herbivore heatmap. """
+        return self._graphics.color_bar_max_herb
 
-            new_year = np.arange(years[-1] + 1, num_years + self.current_year)
-            if len(new_year) > 0:
+    @color_bar_max_herb.setter
+    def color_bar_max_herb(self, value):
+        self._set_graphics_setting('color_bar_max_herb', value)
 
-                herbivore_new = np.full(new_year.shape, np.nan)
-                self.herbivore_line_graph.set_data(
-                    np.hstack((years, new_year)),
-                    np.hstack((herbivores, herbivore_new))
-                )
+    @property
+    def color_bar_max_carn(self):
+        """ Upper limit of the colour bar of the carnivore heatmap. """
+        return self._graphics.color_bar_max_carn
 
-                carnivore_new = np.full(new_year.shape, np.nan)
-                self.carnivore_line_graph.set_data(
-                    np.hstack((years, new_year)),
-                    np.hstack((carnivores, carnivore_new))
-                )
+    @color_bar_max_carn.setter
+    def color_bar_max_carn(self, value):
+        self._set_graphics_setting('color_bar_max_carn', value)
 
-                vulture_new = np.full(new_year.shape, np.nan)
-                self.vulture_line_graph.set_data(
-                    np.hstack((years, new_year)),
-                    np.hstack((vultures, vulture_new))
-                )
+    @property
+    def color_bar_max_vult(self):
+        """ Upper limit of the colour bar of the vulture heatmap. """
+        return self._graphics.color_bar_max_vult
 
-    def _update_system_map_herbivore(self, animal_array):
-        """
-        Updates the heatmap for herbivore distribution.
+    @color_bar_max_vult.setter
+    def color_bar_max_vult(self, value):
+        self._set_graphics_setting('color_bar_max_vult', value)
 
-        :param animal_array: array of the distribution of animals
-        """
+    @property
+    def herbivore_line_graph(self):
+        """ The line of herbivores in the population graph, or None. """
+        return self._graphics.herbivore_line_graph
 
-        if self._heatmap_herb_graphics is not None:
-            self._heatmap_herb_graphics.set_data(animal_array)
-        else:
-            self._heatmap_herb_graphics = \
-                self._heatmap_herb_ax.imshow(animal_array,
-                                             interpolation='nearest',
-                                             vmin=0,
-                                             vmax=self.color_bar_max_herb)
-            plt.colorbar(self._heatmap_herb_graphics, ax=self._heatmap_herb_ax,
-                         orientation='horizontal')
+    @property
+    def carnivore_line_graph(self):
+        """ The line of carnivores in the population graph, or None. """
+        return getattr(self._graphics, 'carnivore_line_graph', None)
 
-    def _update_system_map_carnivore(self, animal_array):
-        """
-        Updates the heatmap for carnivore distribution.
+    @property
+    def vulture_line_graph(self):
+        """ The line of vultures in the population graph, or None. """
+        return getattr(self._graphics, 'vulture_line_graph', None)
 
-        :param animal_array: array of the distribution of animals
+    def _set_graphics_setting(self, name, value):
         """
+        Changes a setting of the graphical interface. The arguments used to
+        create the Graphics instance are updated too, so renderers started
+        later and simulations loaded from a checkpoint use the setting.
 
-        if self._heatmap_carn_graphics is not None:
-            self._heatmap_carn_graphics.set_data(animal_array)
-        else:
-            self._heatmap_carn_graphics = \
-                self._heatmap_carn_ax.imshow(animal_array,
-                                             interpolation='nearest',
-                                             vmin=0,
-                                             vmax=self.color_bar_max_carn,
-                                             cmap='magma')
-            plt.colorbar(self._heatmap_carn_graphics, ax=self._heatmap_carn_ax,
-                         orientation='horizontal')
-
-    def _update_system_map_vulture(self, animal_array):
+        :param name: Name of the attribute of Graphics.
+        :param value: The new value.
         """
-        Updates the heatmap for carnivore distribution.
+        setattr(self._graphics, name, value)
+        island_map, _, _, img_base, img_fmt = self._graphics_args
+        cmax_animals = {'Herbivore': self._graphics.color_bar_max_herb,
+                        'Carnivore': self._graphics.color_bar_max_carn,
+                        'Vulture': self._graphics.color_bar_max_vult}
+        self._graphics_args = (island_map, self._graphics.graph_ymax,
+                               cmax_animals, img_base, img_fmt)
 
-        :param animal_array: array of the distribution of animals
+    def _setup_graphics(self, num_years):
         """
+        Sets up the graphical interface, see ``Graphics.setup``.
 
-        if self._heatmap_vult_graphics is not None:
-            self._heatmap_vult_graphics.set_data(animal_array)
-        else:
-            self._heatmap_vult_graphics = \
-                self._heatmap_vult_ax.imshow(animal_array,
-                                             interpolation='nearest',
-                                             vmin=0,
-                                             vmax=self.color_bar_max_vult,
-                                             cmap='cividis')
-            plt.colorbar(self._heatmap_vult_graphics, ax=self._heatmap_vult_ax,
-                         orientation='horizontal')
-
-    def _update_num_animals_graph(self, num_herbivores, num_carnivores,
-                                  num_vultures):
+        :param num_years: Number of years simulated.
         """
-        Updates the lines on the line graph.
+        self._graphics.setup(num_years + self.current_year)
 
-        :param num_herbivores: Number of herbivores on island.
-        :param num_carnivores: Number of carnivores on island.
-        :param num_vultures: Number of vultures on island.
+    def _update_graphics(self, population):
         """
-        ydata = self.herbivore_line_graph.get_ydata()
-        ydata[self.year] = num_herbivores
-        self.herbivore_line_graph.set_ydata(ydata)
-
-        cdata = self.carnivore_line_graph.get_ydata()
-        cdata[self.year] = num_carnivores
-        self.carnivore_line_graph.set_ydata(cdata)
-
-        vdata = self.vulture_line_graph.get_ydata()
-        vdata[self.year] = num_vultures
-        self.vulture_line_graph.set_ydata(vdata)
+        Updates the graphical interface with the animal counts of the
+        current year.
 
-    def _update_graphics(self):
+        :param population: Animal counts from _aggregate_population.
         """
-        Updates all the subplots on the graphical interface with the new
-        graphics from _update_num_animals_graph,
-        _update_system_map_carnivore and _update_system_map_herbivore methods.
-        """
-
-        self._update_system_map_herbivore(self._herb_array())
-
-        self._update_system_map_carnivore(self._carn_array())
-
-        self._update_system_map_vulture(self._vult_array())
-
-        self._update_num_animals_graph(
-
-            self.num_animals_per_species['Herbivore'],
-            self.num_animals_per_species['Carnivore'],
-            self.num_animals_per_species['Vulture']
-
-        )
-
-        plt.pause(1e-6)
+        self._graphics.update(self.year, population['counts'],
+                              population['totals'])
 
     def _save_graphics(self):
         """Saves graphics to file if file name given."""
-
-        if self._img_base is None:
-            return
-
-        plt.savefig('{base}_{num:05d}.{type}'.format(base=self._img_base,
-                                                     num=self._img_counter,
-                                                     type=self._img_fmt))
-        self._img_counter += 1
+        self._graphics.save()
 
     def make_movie(self):
         """
-        Creates MPEG4 movie from visualization images saved.
-        Saves the movie in a requested folder:
-        E. g. "/Users/User/Documents/inf200_january/biosim/movie"
-
-        where ``movie`` will be the name of the file in folder biosim.
+        Creates MPEG4 movie from visualization images saved, see
+        ``Graphics.make_movie``.
 
         .. :note:
             Requires ffmpeg
-
-        The movie is stored as img_base + movie_fmt
-        """
-        _FFMPEG_BINARY = 'ffmpeg'
-        movie_fmt = 'mp4'
-
-        if self._img_base is None:
-            raise RuntimeError("No filename defined.")
-
-        if movie_fmt == 'mp4':
-            try:
-                # Parameters chosen according to
-                # http://trac.ffmpeg.org/wiki/Encode/H.264,
-                # section "Compatibility"
-                subprocess.check_call([_FFMPEG_BINARY,
-                                       '-i', '{}_%05d.png'.format
-                                       (self._img_base),
-                                       '-y',
-                                       '-profile:v', 'baseline',
-                                       '-level', '3.0',
-                                       '-pix_fmt', 'yuv420p',
-                                       '{}.{}'.format(self._img_base,
-                                                      movie_fmt)])
-            except subprocess.CalledProcessError as err:
-                raise RuntimeError('ERROR: ffmpeg failed with: {}'.format(err))
-
-        else:
-            raise ValueError('Unknown movie format: ' + movie_fmt)
+        """
+        self._graphics.make_movie()
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+
+__author__ = "Sebastian Kihle & Andreas Hoeimyr"
+__email__ = "sebaskih@nmbu.no & andrehoi@nmbu.no"
+
+"""
+File with the read-only state of the island, for analysis code that looks
+at the simulation every year.
+"""
+
+import numpy as np
+
+from .statistics import SPECIES
+
+# Names of the lists of animals of each species in a cell.
+SPECIES_ATTRIBUTES = ('present_herbivores', 'present_carnivores',
+                      'present_vultures')
+
+# Attributes of the animals gathered by IslandState.
+ANIMAL_ATTRIBUTES = ('cell', 'row', 'col', 'age', 'weight', 'fitness')
+
+
+def _read_only(array):
+    """ Makes a NumPy array read-only and returns it. """
+    array.flags.writeable = False
+    return array
+
+
+class IslandState:
+    """
+    The IslandState class holds the number of animals of each species in
+    each cell of the island at one time, found in one pass through the map.
+    The counts of all species are stored in one array, and the count grid
+    of each species is a view of that array, so no counts are copied when
+    they are read.
+
+    If attributes is True the cell, row, column, age, weight and fitness of
+    every animal are also gathered in the same pass, into one NumPy array
+    per attribute and species. The animals of each species are ordered cell
+    by cell, in row-major order.
+
+    All arrays are read-only. The state does not change when the
+    simulation goes on, ask BioSim.state for a new state every year.
+
+    :param island: Map instance.
+    :param year: The year of the state.
+    :param attributes: Gathers the attributes of every animal if True.
+    """
+
+    def __init__(self, island, year, attributes=False):
+        self.year = year
+        self.shape = island.shape
+
+        size = self.shape[0] * self.shape[1]
+        counts = np.zeros((len(SPECIES), size), dtype=int)
+        animals = [[] for _ in SPECIES]
+        for index, cell in island.cells():
+            for number, attribute in enumerate(SPECIES_ATTRIBUTES):
+                present_animals = getattr(cell, attribute)
+                counts[number, index] = len(present_animals)
+                if attributes:
+                    animals[number].extend(present_animals)
+
+        self.counts = _read_only(counts.reshape((len(SPECIES),) +
+                                                self.shape))
+        self._animals = None
+        if attributes:
+            self._animals = [self._gather(counts[number], animals[number])
+                             for number in range(len(SPECIES))]
+
+    def _gather(self, counts, animals):
+        """
+        Creates the attribute arrays of the animals of one species.
+
+        :param counts: Number of animals of the species in each cell.
+        :param animals: The animals, cell by cell.
+        :return: Dictionary mapping ANIMAL_ATTRIBUTES to arrays.
+        """
+        cells = np.repeat(np.arange(len(counts)), counts)
+        rows, cols = np.divmod(cells, self.shape[1])
+        return {
+            'cell': _read_only(cells),
+            'row': _read_only(rows),
+            'col': _read_only(cols),
+            'age': _read_only(np.array([animal.age for animal in animals],
+                                       dtype=float)),
+            'weight': _read_only(np.fromiter(
+                (animal.weight for animal in animals), dtype=float,
+                count=len(animals))),
+            'fitness': _read_only(np.fromiter(
+                (animal.phi for animal in animals), dtype=float,
+                count=len(animals))),
+        }
+
+    def count_grid(self, species):
+        """
+        The number of animals of a species in each cell, as a view of
+        counts.
+
+        :param species: Name of the species, e.g. 'Herbivore'.
+        :return: Read-only NumPy array with one element per cell.
+        """
+        if species not in SPECIES:
+            raise ValueError('Unknown species {}'.format(species))
+        return self.counts[SPECIES.index(species)]
+
+    @property
+    def totals(self):
+        """ Dictionary with the number of animals of each species. """
+        return {name: int(self.counts[number].sum())
+                for number, name in enumerate(SPECIES)}
+
+    def animals(self, species):
+        """
+        The attributes of every animal of a species.
+
+        :param species: Name of the species, e.g. 'Herbivore'.
+        :return: Dictionary mapping ANIMAL_ATTRIBUTES to read-only NumPy
+                 arrays with one element per animal.
+        """
+        if self._animals is None:
+            raise ValueError('The attributes of the animals were not '
+                             'gathered, use attributes=True')
+        if species not in SPECIES:
+            raise ValueError('Unknown species {}'.format(species))
+        return self._animals[SPECIES.index(species)]
+
+    def cell_sum(self, species, attribute):
+        """
+        Adds up an attribute of the animals of a species in each cell, e.g.
+        the biomass for 'weight'.
+
+        :param species: Name of the species, e.g. 'Herbivore'.
+        :param attribute: Name of the attribute, e.g. 'weight'.
+        :return: NumPy array with one element per cell.
+        """
+        animals = self.animals(species)
+        return np.bincount(animals['cell'], weights=animals[attribute],
+                           minlength=self.shape[0] * self.shape[1]
+                           ).reshape(self.shape)
+
+
+class YearSnapshot:
+    """
+    The YearSnapshot class holds what BioSim.simulate_iter reports after
+    each simulated year: the year, the number of animals of each species
+    and optionally the read-only count grids of all species.
+
+    :param year: The simulated year, as recorded by the statistics sinks.
+    :param totals: Dictionary with the number of animals of each species.
+    :param counts: Array with the count grid of each species, or None.
+    """
+    __slots__ = ('year', 'totals', 'counts')
+
+    def __init__(self, year, totals, counts=None):
+        self.year = year
+        self.totals = totals
+        self.counts = counts
+
+    def __repr__(self):
+        return 'YearSnapshot(year={}, totals={})'.format(self.year,
+                                                         self.totals)
+
+    def count_grid(self, species):
+        """
+        The number of animals of a species in each cell.
+
+        :param species: Name of the species, e.g. 'Herbivore'.
+        :return: Read-only NumPy array with one element per cell.
+        """
+        if self.counts is None:
+            raise ValueError('The snapshot has no count grids, use '
+                             'grids=True')
+        if species not in SPECIES:
+            raise ValueError('Unknown species {}'.format(species))
+        return self.counts[SPECIES.index(species)]
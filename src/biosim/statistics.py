@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+
+__author__ = "Sebastian Kihle & Andreas Hoeimyr"
+__email__ = "sebaskih@nmbu.no & andrehoi@nmbu.no"
+
+"""
+File with the statistics sinks that store the history of a simulation.
+"""
+
+import glob
+import json
+import numpy as np
+
+SPECIES = ('Herbivore', 'Carnivore', 'Vulture')
+
+
+class StatisticsWriter:
+    """
+    The StatisticsWriter class stores the species totals and the number of
+    animals of each species in each cell for every simulated year. It is
+    given to ``BioSim.simulate`` as a statistics sink.
+
+    The yearly counts are kept in a preallocated buffer that holds
+    ``flush_years`` years. When the buffer is full it is written to disk as
+    one chunk, so the whole history is never kept in memory and writing to
+    disk only happens every ``flush_years`` years. The buffer is also
+    flushed at the end of each call to ``simulate``.
+
+    Each chunk is a NumPy ``.npz`` file named
+
+        '{}_{:05d}.npz'.format(file_base, chunk_no)
+
+    where chunk_no are consecutive numbers starting from 0. A chunk
+    contains the arrays ``year`` (n_years), ``totals`` (n_years x species)
+    and ``counts`` (n_years x species x rows x columns). The species are
+    ordered as in ``SPECIES``. Use ``read_statistics`` to load the chunks.
+
+    :param file_base: String with path and beginning of file names.
+    :param flush_years: Number of years stored between each write to disk.
+    :param compress: Compresses the chunks if True.
+    """
+
+    def __init__(self, file_base, flush_years=100, compress=False):
+        if flush_years < 1:
+            raise ValueError('flush_years must be at least 1')
+
+        self.file_base = file_base
+        self.flush_years = flush_years
+        self.compress = compress
+
+        self._chunk_counter = 0
+        self._num_buffered = 0
+
+        # The buffers are created when the size of the map is known.
+        self._years = None
+        self._totals = None
+        self._counts = None
+
+    def _allocate(self, shape):
+        """
+        Creates the buffers for the yearly counts.
+
+        :param shape: Shape of the map, (rows, columns).
+        """
+        self._years = np.zeros(self.flush_years, dtype=np.int64)
+        self._totals = np.zeros((self.flush_years, len(SPECIES)),
+                                dtype=np.int64)
+        self._counts = np.zeros((self.flush_years, len(SPECIES)) + shape,
+                                dtype=np.int32)
+
+    def record(self, year, grids):
+        """
+        Stores the counts for one year in the buffer, and writes the buffer
+        to disk if it is full.
+
+        :param year: The year the counts belong to.
+        :param grids: Dictionary mapping species names to NumPy arrays with
+                      the number of animals in each cell.
+        """
+        if self._counts is None:
+            self._allocate(np.shape(grids[SPECIES[0]]))
+
+        row = self._num_buffered
+        self._years[row] = year
+        for index, species in enumerate(SPECIES):
+            self._counts[row, index] = grids[species]
+            self._totals[row, index] = self._counts[row, index].sum()
+
+        self._num_buffered += 1
+        if self._num_buffered == self.flush_years:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes the years stored in the buffer to disk as a new chunk. Does
+        nothing if the buffer is empty.
+        """
+        if self._num_buffered == 0:
+            return
+
+        n = self._num_buffered
+        save = np.savez_compressed if self.compress else np.savez
+        save('{}_{:05d}.npz'.format(self.file_base, self._chunk_counter),
+             year=self._years[:n], totals=self._totals[:n],
+             counts=self._counts[:n])
+
+        self._chunk_counter += 1
+        self._num_buffered = 0
+
+    def close(self):
+        """ Writes the remaining buffered years to disk. """
+        self.flush()
+
+
+def read_statistics(file_base, counts=True):
+    """
+    Reads all chunks written by a StatisticsWriter and joins them.
+
+    :param file_base: The file_base given to the StatisticsWriter.
+    :param counts: Also loads the per-cell counts if True.
+    :return: Dictionary with the arrays ``year``, ``totals`` and, if
+             requested, ``counts``.
+    """
+    files = sorted(glob.glob('{}_[0-9][0-9][0-9][0-9][0-9].npz'.format(
+        file_base)))
+    if len(files) == 0:
+        raise FileNotFoundError('No statistics found for ' + file_base)
+
+    keys = ['year', 'totals'] + (['counts'] if counts else [])
+    chunks = {key: [] for key in keys}
+    for file in files:
+        with np.load(file) as chunk:
+            for key in keys:
+                chunks[key].append(chunk[key])
+
+    return {key: np.concatenate(chunks[key]) for key in keys}
+
+
+class HeatmapRecorder:
+    """
+    The HeatmapRecorder class stores the number of animals of each species
+    in each cell for every simulated year in a disk-backed NumPy array. It
+    is given to ``BioSim.simulate`` as a statistics sink.
+
+    The counts are written to a ``numpy.memmap`` cube with the axes (year,
+    row, column, species), where the species are ordered as in ``SPECIES``.
+    The file is preallocated for ``chunk_years`` years and grows by
+    ``chunk_years`` years each time it is full, so only the pages that are
+    written to are kept in memory by the operating system.
+
+    The shape of the cube is stored next to the data in the file
+    ``filename + '.json'``. Use ``open_heatmap_history`` to open the cube
+    read-only.
+
+    If the island map is given it is stored in the json file, so the
+    recorded years can be rendered later with ``biosim render``. A Map
+    instance, e.g. opened from a binary map file, is stored as the letters
+    of its biomes.
+
+    :param filename: Path of the file the cube is stored in.
+    :param chunk_years: Number of years the file grows with when full.
+    :param island_map: Multi-line string specifying island geography, or a
+                       Map instance.
+    """
+
+    dtype = np.int32
+
+    def __init__(self, filename, chunk_years=100, island_map=None):
+        if chunk_years < 1:
+            raise ValueError('chunk_years must be at least 1')
+        if island_map is not None and not isinstance(island_map, str):
+            biome_map = getattr(island_map, 'biome_map', None)
+            if biome_map is None:
+                raise TypeError('island_map must be a string or a Map, not '
+                                '{}'.format(type(island_map).__name__))
+            island_map = '\n'.join(''.join(row) for row in biome_map)
+
+        self.filename = filename
+        self.chunk_years = chunk_years
+        self.island_map = island_map
+        self.num_years = 0
+        self.first_year = None
+
+        # The cube is created when the size of the map is known.
+        self._shape = None
+        self._capacity = 0
+        self._cube = None
+
+    @property
+    def _year_bytes(self):
+        """ Number of bytes used to store one year. """
+        return int(np.prod(self._shape)) * np.dtype(self.dtype).itemsize
+
+    def _grow(self):
+        """
+        Makes room for another chunk_years years in the file and maps the
+        whole file into memory again.
+        """
+        if self._cube is not None:
+            self._cube.flush()
+            self._cube = None
+
+        self._capacity += self.chunk_years
+
+        mode = 'r+b' if self.num_years > 0 else 'w+b'
+        with open(self.filename, mode) as file:
+            file.truncate(self._capacity * self._year_bytes)
+
+        self._cube = np.memmap(self.filename, dtype=self.dtype, mode='r+',
+                               shape=(self._capacity,) + self._shape)
+
+    def _write_header(self):
+        """ Writes the shape of the cube to the json file. """
+        header = {'shape': [self.num_years] + list(self._shape),
+                  'dtype': np.dtype(self.dtype).str,
+                  'species': list(SPECIES),
+                  'first_year': self.first_year,
+                  'island_map': self.island_map}
+        with open(self.filename + '.json', 'w') as file:
+            json.dump(header, file)
+
+    def record(self, year, grids):
+        """
+        Writes the counts for one year to the cube, and grows the file if
+        it is full.
+
+        :param year: The year the counts belong to.
+        :param grids: Dictionary mapping species names to NumPy arrays with
+                      the number of animals in each cell.
+        """
+        if self._shape is None:
+            self._shape = np.shape(grids[SPECIES[0]]) + (len(SPECIES),)
+            self.first_year = year
+
+        if self.num_years == self._capacity:
+            self._grow()
+
+        for index, species in enumerate(SPECIES):
+            self._cube[self.num_years, :, :, index] = grids[species]
+        self.num_years += 1
+
+    def flush(self):
+        """ Flushes the cube to disk and updates the json file. """
+        if self._cube is None:
+            return
+        self._cube.flush()
+        self._write_header()
+
+    def close(self):
+        """
+        Flushes the cube and removes the unused part of the last chunk
+        from the file.
+        """
+        if self._cube is None:
+            return
+        self.flush()
+        self._cube = None
+
+        with open(self.filename, 'r+b') as file:
+            file.truncate(self.num_years * self._year_bytes)
+        self._capacity = self.num_years
+
+
+def read_heatmap_header(filename):
+    """
+    Reads the json file describing a cube written by a HeatmapRecorder.
+
+    :param filename: The filename given to the HeatmapRecorder.
+    :return: Dictionary with the shape, dtype, species, first_year and
+             island_map of the cube.
+    """
+    with open(filename + '.json') as file:
+        return json.load(file)
+
+
+def open_heatmap_history(filename):
+    """
+    Opens a cube written by a HeatmapRecorder read-only. Slicing the cube
+    only reads the requested years from disk.
+
+    :param filename: The filename given to the HeatmapRecorder.
+    :return: numpy.memmap with the axes (year, row, column, species).
+    """
+    header = read_heatmap_header(filename)
+
+    return np.memmap(filename, dtype=np.dtype(header['dtype']), mode='r',
+                     shape=tuple(header['shape']))
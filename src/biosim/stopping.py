@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+
+__author__ = "Sebastian Kihle & Andreas Hoeimyr"
+__email__ = "sebaskih@nmbu.no & andrehoi@nmbu.no"
+
+"""
+File with the conditions that stop a simulation early, and the status
+returned by BioSim.simulate.
+"""
+
+from collections import deque
+
+from .statistics import SPECIES
+
+COMPLETED = 'completed'
+TIME_BUDGET = 'time budget used'
+INTERRUPTED = 'interrupted'
+
+
+class SimulationStatus:
+    """
+    The SimulationStatus class tells why and when ``BioSim.simulate``
+    returned.
+
+    A simulation stopped because the time budget was used or because it
+    was interrupted by a signal is resumable. It can be continued for the
+    remaining years, e.g. from the checkpoint written when it stopped.
+
+    :param reason: COMPLETED if all years were simulated, TIME_BUDGET or
+                   INTERRUPTED, otherwise the reason given by the condition
+                   that stopped the simulation.
+    :param year: The year property of the simulation when it returned.
+    :param sim_years: Number of years simulated by the call.
+    :param condition: The condition that stopped the simulation, or None.
+    :param remaining_years: Number of years not simulated.
+    :param checkpoint: Path of the checkpoint written when the simulation
+                       stopped, or None.
+    """
+
+    def __init__(self, reason, year, sim_years, condition=None,
+                 remaining_years=0, checkpoint=None):
+        self.reason = reason
+        self.year = year
+        self.sim_years = sim_years
+        self.condition = condition
+        self.remaining_years = remaining_years
+        self.checkpoint = checkpoint
+
+    def __repr__(self):
+        return 'SimulationStatus({!r}, year={})'.format(self.reason,
+                                                        self.year)
+
+    @property
+    def completed(self):
+        """ True if all years were simulated. """
+        return self.reason == COMPLETED
+
+    @property
+    def resumable(self):
+        """ True if the simulation was stopped by time or a signal. """
+        return self.reason in (TIME_BUDGET, INTERRUPTED)
+
+
+class AllExtinct:
+    """
+    The AllExtinct class stops the simulation when there are no animals
+    left on the island.
+    """
+
+    def reset(self):
+        """ Forgets the years seen before, nothing to forget. """
+
+    def check(self, totals):
+        """
+        Checks the condition after a year.
+
+        :param totals: Dictionary with the number of animals of each
+                       species.
+        :return: Reason for stopping, or None.
+        """
+        if sum(totals.values()) == 0:
+            return 'all species extinct'
+        return None
+
+
+class SpeciesExtinct:
+    """
+    The SpeciesExtinct class stops the simulation when there are no animals
+    of a species left on the island.
+
+    :param species: Name of the species, e.g. 'Carnivore'.
+    """
+
+    def __init__(self, species):
+        if species not in SPECIES:
+            raise ValueError('Unknown species {}'.format(species))
+        self.species = species
+
+    def reset(self):
+        """ Forgets the years seen before, nothing to forget. """
+
+    def check(self, totals):
+        """
+        Checks the condition after a year.
+
+        :param totals: Dictionary with the number of animals of each
+                       species.
+        :return: Reason for stopping, or None.
+        """
+        if totals[self.species] == 0:
+            return '{} extinct'.format(self.species)
+        return None
+
+
+class SteadyState:
+    """
+    The SteadyState class stops the simulation when the number of animals
+    of each species has stayed within a band for a number of years. The
+    band is relative to the mean number of animals of the species over
+    the years, so that
+
+        max - min <= tolerance * mean
+
+    for each species over the last window years. Species without animals
+    in all of these years are skipped, so an extinction is reported by
+    AllExtinct or SpeciesExtinct and not as a steady state.
+
+    :param window: Number of years the numbers must stay within the band.
+    :param tolerance: Width of the band relative to the mean.
+    :param species: Names of the species checked, all species if None.
+    """
+
+    def __init__(self, window=50, tolerance=0.1, species=None):
+        if window < 2:
+            raise ValueError('window must be at least 2 years')
+        if tolerance < 0:
+            raise ValueError('tolerance cannot be negative')
+        if species is None:
+            species = SPECIES
+        for name in species:
+            if name not in SPECIES:
+                raise ValueError('Unknown species {}'.format(name))
+
+        self.window = window
+        self.tolerance = tolerance
+        self.species = tuple(species)
+        self._history = deque(maxlen=window)
+
+    def reset(self):
+        """ Forgets the years seen before. """
+        self._history.clear()
+
+    def check(self, totals):
+        """
+        Checks the condition after a year.
+
+        :param totals: Dictionary with the number of animals of each
+                       species.
+        :return: Reason for stopping, or None.
+        """
+        self._history.append([totals[name] for name in self.species])
+        if len(self._history) < self.window:
+            return None
+
+        steady = False
+        for numbers in zip(*self._history):
+            if max(numbers) == 0:
+                continue
+            if max(numbers) - min(numbers) > \
+                    self.tolerance * sum(numbers) / self.window:
+                return None
+            steady = True
+        if steady:
+            return 'steady state for {} years'.format(self.window)
+        return None
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+
+__author__ = "Sebastian Kihle & Andreas Hoeimyr"
+__email__ = "sebaskih@nmbu.no & andrehoi@nmbu.no"
+
+"""
+File with the tracer that records what happens in each cell of a
+simulation.
+"""
+
+import json
+import numpy as np
+
+from .statistics import SPECIES
+
+# Categories of events, combined into a mask with |.
+BIRTHS = 1
+DEATHS = 2
+KILLS = 4
+MOVES = 8
+CATEGORIES = {'births': BIRTHS, 'deaths': DEATHS, 'kills': KILLS,
+              'moves': MOVES}
+
+# Layout of one event in the ring buffer and in binary trace files.
+EVENT_DTYPE = np.dtype([('year', '<i4'), ('category', 'u1'),
+                        ('species', 'u1'), ('row', '<i4'), ('col', '<i4'),
+                        ('to_row', '<i4'), ('to_col', '<i4'),
+                        ('count', '<i4')])
+
+
+class Tracer:
+    """
+    The Tracer class records the events of a simulation in a ring buffer of
+    fixed size. It is given to ``BioSim.simulate`` with the ``tracer``
+    keyword. When the buffer is full the oldest events are overwritten, so
+    the tracer always holds the latest events and never uses more memory.
+
+    Events are counted per cell, species and year, e.g. that 3 herbivores
+    died in cell (4, 7) in year 12, and are of the categories
+
+        births: Animals born in the cell.
+        deaths: Animals that died of natural causes in the cell.
+        kills: Herbivores killed by carnivores in the cell.
+        moves: Animals that moved from the cell to the cell
+               (to_row, to_col).
+
+    Only the categories given are recorded. When no tracer is given to
+    simulate the stages of the year do not look for events at all.
+
+    :param categories: Names of the categories to record.
+    :param capacity: Number of events the buffer holds.
+    """
+
+    def __init__(self, categories=tuple(CATEGORIES), capacity=2 ** 16):
+        if capacity < 1:
+            raise ValueError('capacity must be positive')
+        self.mask = 0
+        for category in categories:
+            if category not in CATEGORIES:
+                raise ValueError('Unknown category {}, must be one of '
+                                 '{}'.format(category, tuple(CATEGORIES)))
+            self.mask |= CATEGORIES[category]
+
+        self.events = np.zeros(capacity, dtype=EVENT_DTYPE)
+        self.recorded = 0
+        self.year = 0
+
+    def enabled(self, category):
+        """
+        Checks if a category is recorded.
+
+        :param category: Category of events, e.g. DEATHS.
+        :return: True if the category is recorded.
+        """
+        return bool(self.mask & category)
+
+    def record(self, category, species, row, col, count, to_row=-1,
+               to_col=-1):
+        """
+        Records an event in the current year. Events of categories that are
+        not recorded and events with a count of zero are ignored.
+
+        :param category: Category of the event, e.g. DEATHS.
+        :param species: Index of the species in SPECIES.
+        :param row: Row of the cell.
+        :param col: Column of the cell.
+        :param count: Number of animals.
+        :param to_row: Row of the cell moved to, -1 if not a move.
+        :param to_col: Column of the cell moved to, -1 if not a move.
+        """
+        if count == 0 or not self.mask & category:
+            return
+        self.events[self.recorded % len(self.events)] = (
+            self.year, category, species, row, col, to_row, to_col, count)
+        self.recorded += 1
+
+    @property
+    def dropped(self):
+        """ Number of events overwritten since the buffer was full. """
+        return max(0, self.recorded - len(self.events))
+
+    def trace(self):
+        """
+        Returns the events in the buffer, oldest first.
+
+        :return: NumPy array of events with dtype EVENT_DTYPE.
+        """
+        capacity = len(self.events)
+        if self.recorded <= capacity:
+            return self.events[:self.recorded].copy()
+        start = self.recorded % capacity
+        return np.concatenate((self.events[start:], self.events[:start]))
+
+    def select(self, category=None, year=None, row=None, col=None):
+        """
+        Selects the events in the buffer of a category, year or cell. Moves
+        are selected by the cell they moved from.
+
+        :param category: Category of the events, e.g. DEATHS, or None.
+        :param year: Year of the events, or None.
+        :param row: Row of the cell, or None.
+        :param col: Column of the cell, or None.
+        :return: NumPy array of events with dtype EVENT_DTYPE.
+        """
+        events = self.trace()
+        selected = np.ones(len(events), dtype=bool)
+        for field, value in (('category', category), ('year', year),
+                             ('row', row), ('col', col)):
+            if value is not None:
+                selected &= events[field] == value
+        return events[selected]
+
+    def write_binary(self, filename):
+        """
+        Writes the events to a NumPy .npy file, read with read_trace.
+
+        :param filename: Path of the file.
+        """
+        np.save(filename, self.trace(), allow_pickle=False)
+
+    def write_jsonl(self, filename):
+        """
+        Writes the events to a file with one JSON object per line. The
+        category and species are written by name.
+
+        :param filename: Path of the file.
+        """
+        names = {bit: name for name, bit in CATEGORIES.items()}
+        with open(filename, 'w') as file:
+            for event in self.trace():
+                record = {field: int(event[field])
+                          for field in EVENT_DTYPE.names}
+                record['category'] = names[record['category']]
+                record['species'] = SPECIES[record['species']]
+                file.write(json.dumps(record) + '\n')
+
+
+def read_trace(filename):
+    """
+    Reads the events written by Tracer.write_binary.
+
+    :param filename: Path of the file.
+    :return: NumPy array of events with dtype EVENT_DTYPE.
+    """
+    events = np.load(filename, allow_pickle=False)
+    if events.dtype != EVENT_DTYPE:
+        raise ValueError('{} is not a trace file'.format(filename))
+    return events
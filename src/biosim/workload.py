@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+
+__author__ = "Sebastian Kihle & Andreas Hoeimyr"
+__email__ = "sebaskih@nmbu.no & andrehoi@nmbu.no"
+
+"""
+File with the generator of large islands and populations used by the
+benchmarks and scaling tests. The same seed always gives the same island
+and population.
+"""
+
+import numpy as np
+
+from .animals import Herbivore, Carnivore, Vulture
+from .island_class import BIOME_LETTERS, biome_codes, parse_island_map
+
+SPECIES_CLASSES = {'Herbivore': Herbivore, 'Carnivore': Carnivore,
+                   'Vulture': Vulture}
+
+# Share of the inner cells of each biome.
+DEFAULT_BIOME_MIX = {'J': 0.4, 'S': 0.3, 'D': 0.15, 'M': 0.1, 'O': 0.05}
+
+# Mean age and the mean and standard deviation of the weight of the
+# generated animals of each species.
+DEFAULT_AGE = {'Herbivore': 5, 'Carnivore': 5, 'Vulture': 5}
+DEFAULT_WEIGHT = {'Herbivore': (20., 5.), 'Carnivore': (30., 8.),
+                  'Vulture': (10., 3.)}
+
+# Columns of a generated population.
+COLUMNS = ('species', 'row', 'col', 'age', 'weight')
+
+
+def generate_island(rows, columns, biome_mix=None, smoothing=2, seed=None):
+    """
+    Generates an island surrounded by ocean. The biomes of the inner cells
+    are drawn from a smoothed random field, so that cells of the same biome
+    lie together in regions, like on a real island.
+
+    :param rows: Number of rows, including the ocean.
+    :param columns: Number of columns, including the ocean.
+    :param biome_mix: Dictionary mapping biome letters to their share of
+                      the inner cells, DEFAULT_BIOME_MIX if None.
+    :param smoothing: Number of times the random field is smoothed. More
+                      smoothing gives larger regions.
+    :param seed: Seed of the random numbers.
+    :return: Multi-line string specifying island geography.
+    """
+    if rows < 3 or columns < 3:
+        raise ValueError('The island must have at least 3 rows and columns')
+    if biome_mix is None:
+        biome_mix = DEFAULT_BIOME_MIX
+    for letter, share in biome_mix.items():
+        if letter not in BIOME_LETTERS or share < 0:
+            raise ValueError('Invalid biome share {}: {}'.format(letter,
+                                                                 share))
+    total = sum(biome_mix.values())
+    if total <= 0:
+        raise ValueError('The biome shares must add up to more than 0')
+
+    rng = np.random.default_rng(seed)
+    field = rng.random((rows - 2, columns - 2))
+    for _ in range(smoothing):
+        field = (field + np.roll(field, 1, 0) + np.roll(field, -1, 0) +
+                 np.roll(field, 1, 1) + np.roll(field, -1, 1)) / 5
+
+    # The cells are given biomes in the order of their value in the field,
+    # so each biome gets its share of the cells.
+    letters = list(biome_mix)
+    bounds = np.cumsum([biome_mix[letter] for letter in letters]) / total
+    ranks = np.empty(field.size)
+    ranks[np.argsort(field, axis=None)] = np.arange(field.size) / field.size
+    inner = np.array(letters)[np.searchsorted(bounds, ranks, side='right')
+                              .clip(max=len(letters) - 1)]
+
+    island = np.full((rows, columns), 'O')
+    island[1:-1, 1:-1] = inner.reshape(field.shape)
+    return '\n'.join(''.join(row) for row in island)
+
+
+def _habitat(code_map, species):
+    """
+    Finds the cells a species can be placed in.
+
+    :param code_map: NumPy array with the biome code of each cell.
+    :param species: Name of the species.
+    :return: Flat indices of the cells.
+    """
+    codes = biome_codes(SPECIES_CLASSES[species](0, 1).legal_biomes)
+    return np.flatnonzero(np.isin(code_map, codes))
+
+
+def generate_population(island_map, counts, age=None, weight=None,
+                        seed=None):
+    """
+    Generates animals placed at random in the cells of the island they can
+    live in. The ages are Poisson distributed and the weights are normal
+    distributed, truncated at 1.
+
+    The population is returned as columns, one NumPy array for each of
+    species, row, col, age and weight, with one element per animal. The
+    species are given by name.
+
+    :param island_map: Multi-line string specifying island geography.
+    :param counts: Dictionary mapping species names to the number of
+                   animals.
+    :param age: Dictionary mapping species names to the mean age,
+                DEFAULT_AGE is used for species not given.
+    :param weight: Dictionary mapping species names to the mean and the
+                   standard deviation of the weight, DEFAULT_WEIGHT is used
+                   for species not given.
+    :param seed: Seed of the random numbers.
+    :return: Dictionary mapping the names in COLUMNS to NumPy arrays.
+    """
+    age = dict(DEFAULT_AGE, **(age or {}))
+    weight = dict(DEFAULT_WEIGHT, **(weight or {}))
+    code_map = parse_island_map(island_map)
+    rng = np.random.default_rng(seed)
+
+    # Starts with empty columns, so that no species gives no animals.
+    columns = {'species': [np.zeros(0, dtype='<U9')],
+               'row': [np.zeros(0, dtype=int)],
+               'col': [np.zeros(0, dtype=int)],
+               'age': [np.zeros(0, dtype=int)], 'weight': [np.zeros(0)]}
+    for species, count in counts.items():
+        if species not in SPECIES_CLASSES:
+            raise ValueError('Unknown species {}'.format(species))
+        if count < 0:
+            raise ValueError('The number of animals cannot be negative')
+        habitat = _habitat(code_map, species)
+        if count > 0 and len(habitat) == 0:
+            raise ValueError('There are no cells for {}'.format(species))
+
+        cells = habitat[rng.integers(len(habitat), size=count)]
+        rows, cols = np.divmod(cells, code_map.shape[1])
+        mean, sd = weight[species]
+
+        columns['species'].append(np.full(count, species))
+        columns['row'].append(rows)
+        columns['col'].append(cols)
+        columns['age'].append(rng.poisson(age[species], size=count))
+        columns['weight'].append(
+            rng.normal(mean, sd, size=count).clip(min=1.))
+
+    return {name: np.concatenate(arrays) for name, arrays in columns.items()}
+
+
+def population_records(columns):
+    """
+    Converts generated columns to the list of dictionaries taken by
+    ``BioSim.add_population``, with one dictionary per cell.
+
+    :param columns: Dictionary from generate_population.
+    :return: List of dictionaries specifying population and place.
+    """
+    order = np.lexsort((columns['col'], columns['row']))
+    population = []
+    for index in order:
+        loc = (int(columns['row'][index]), int(columns['col'][index]))
+        if len(population) == 0 or population[-1]['loc'] != loc:
+            population.append({'loc': loc, 'pop': []})
+        population[-1]['pop'].append({
+            'species': str(columns['species'][index]),
+            'age': int(columns['age'][index]),
+            'weight': float(columns['weight'][index])})
+    return population
@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+
+__author__ = "Sebastian Kihle & Andreas Hoeimyr"
+__email__ = "sebaskih@nmbu.no & andrehoi@nmbu.no"
+
+"""
+Fixtures shared by all tests
+"""
+
+import matplotlib.pyplot as plt
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def close_figures():
+    """
+    Closes the figures opened by a test, e.g. by simulate or the renderer,
+    so the figures do not pile up over the test session.
+    """
+    yield
+    plt.close('all')
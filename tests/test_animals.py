@@ -11,6 +11,8 @@ from biosim.animals import Herbivore, Carnivore, Vulture
 from biosim.simulation import BioSim
 from biosim.geography import Jungle, Ocean, Mountain, Desert, Savannah
 
+import numpy as np
+import pytest
 import random
 
 
@@ -353,6 +355,22 @@ def test_vulture_breeding():
     Vulture.new_parameters({'gamma': 0.9})
 
 
+@pytest.mark.parametrize('birth_weight', [-0.5, 0])
+@pytest.mark.parametrize('species', [Herbivore, Carnivore, Vulture])
+def test_no_offspring_with_negative_birth_weight(species, birth_weight,
+                                                 monkeypatch):
+    """
+    Test that a drawn birth weight that is not positive gives no offspring
+    and does not change the weight of the mother, instead of failing when
+    the offspring is created.
+    """
+    monkeypatch.setattr(random, 'random', lambda: 0)
+    monkeypatch.setattr(random, 'gauss', lambda mu, sigma: birth_weight)
+    mother = species(3, 100)
+    assert mother.breeding(10) is None
+    assert mother.weight == 100
+
+
 def test_vulture_scavange():
     """ Test that the vultures gain weight from scavenging """
     vult = Vulture(3, 20)
@@ -405,3 +423,167 @@ def test_vultures_migrate_twice():
     sim.map.array_map[1, 1].present_vultures.append(vult)
     sim.migration_cycle()
     assert len(sim.map.array_map[2, 3].present_vultures) == 1
+
+
+def test_hunt_cell_stops_when_full_and_returns_left_overs():
+    """
+    Tests that the carnivores hunting together in a cell stop killing when
+    full, and that the left overs and survivors are returned.
+    """
+    herb_list = [Herbivore(100, 35), Herbivore(100, 35), Herbivore(4, 35)]
+    herb_list.sort(key=lambda x: x.phi)
+    hunter = Carnivore(3, 50)
+    old_delta_phi_max = Carnivore.param_dict['DeltaPhiMax']
+    Carnivore.new_parameters({'DeltaPhiMax': 0.01})
+    try:
+        survivors, left_overs = Carnivore.hunt_cell(
+            [hunter], herb_list, np.random.default_rng(1))
+    finally:
+        Carnivore.new_parameters({'DeltaPhiMax': old_delta_phi_max})
+
+    assert left_overs == 20
+    assert hunter.weight == 50 + 0.75 * 50
+    assert survivors == [herb_list[2]]
+    assert not herb_list[0].alive and not herb_list[1].alive
+
+
+def test_hunt_cell_matches_hunt_statistically():
+    """
+    Tests that hunting with hunt_cell gives the same mean number of
+    survivors, left overs and carnivore weight as calling hunt for each
+    carnivore, within four standard errors.
+    """
+    def new_cell():
+        herbivores = [Herbivore(age, weight) for age, weight in
+                      [(1, 5), (2, 8), (5, 12), (10, 20), (30, 20), (3, 40),
+                       (20, 25), (1, 3), (8, 60), (50, 10)]]
+        herbivores.sort(key=lambda x: x.phi)
+        carnivores = [Carnivore(age, weight) for age, weight in
+                      [(3, 40), (6, 25), (2, 15)]]
+        carnivores.sort(key=lambda x: x.phi, reverse=True)
+        return carnivores, herbivores
+
+    def reference(carnivores, herbivores):
+        left_overs = 0
+        for carnivore in carnivores:
+            left_overs += carnivore.hunt(herbivores) or 0
+            herbivores = [herbivore for herbivore in herbivores
+                          if herbivore.alive]
+        return herbivores, left_overs
+
+    old_delta_phi_max = Carnivore.param_dict['DeltaPhiMax']
+    Carnivore.new_parameters({'DeltaPhiMax': 0.8})
+    random.seed(2)
+    rng = np.random.default_rng(2)
+    results = {'reference': [], 'hunt_cell': []}
+    try:
+        for _ in range(4000):
+            carnivores, herbivores = new_cell()
+            survivors, left_overs = reference(carnivores, herbivores)
+            results['reference'].append(
+                (len(survivors), left_overs,
+                 sum(carnivore.weight for carnivore in carnivores)))
+
+            carnivores, herbivores = new_cell()
+            survivors, left_overs = Carnivore.hunt_cell(carnivores,
+                                                        herbivores, rng)
+            results['hunt_cell'].append(
+                (len(survivors), left_overs,
+                 sum(carnivore.weight for carnivore in carnivores)))
+    finally:
+        Carnivore.new_parameters({'DeltaPhiMax': old_delta_phi_max})
+
+    reference_results = np.array(results['reference'])
+    hunt_cell_results = np.array(results['hunt_cell'])
+    standard_error = np.sqrt(
+        (reference_results.var(axis=0) + hunt_cell_results.var(axis=0)) /
+        len(reference_results))
+    difference = abs(reference_results.mean(axis=0) -
+                     hunt_cell_results.mean(axis=0))
+    assert (difference <= 4 * standard_error).all()
+    assert reference_results[:, 0].mean() < 10
+
+
+def test_scavenge_cells_matches_scavenge():
+    """
+    Tests that the vultures of several cells eat the same amount as when
+    scavenge is called for each vulture.
+    """
+    def new_cells():
+        return [[Vulture(age, 10) for age in range(number)]
+                for number in (3, 1, 0, 4)]
+
+    left_overs = np.array([25., 4., 7., 50.])
+
+    reference = new_cells()
+    expected = []
+    for vultures, cell_left_overs in zip(reference, left_overs):
+        for vulture in vultures:
+            cell_left_overs = vulture.scavenge(cell_left_overs)
+        expected.append(cell_left_overs)
+
+    vultures_per_cell = new_cells()
+    remaining = Vulture.scavenge_cells(vultures_per_cell, left_overs)
+
+    assert remaining == pytest.approx(expected)
+    for vultures, reference_vultures in zip(vultures_per_cell, reference):
+        assert [vulture.weight for vulture in vultures] == pytest.approx(
+            [vulture.weight for vulture in reference_vultures])
+
+
+def test_age_table_follows_parameters():
+    """
+    Tests that the age factors are looked up in a table that is
+    recalculated when a_half or phi_age changes.
+    """
+    old_parameters = {key: Carnivore.param_dict[key]
+                      for key in ('a_half', 'phi_age')}
+    try:
+        first = Carnivore(10, 20).phi
+        assert Carnivore._age_table is not None
+        assert Herbivore._age_table is not Carnivore._age_table
+
+        Carnivore.new_parameters({'a_half': 5})
+        assert Carnivore._age_table is None
+        assert Carnivore(10, 20).phi < first
+    finally:
+        Carnivore.new_parameters(old_parameters)
+    assert Carnivore(10, 20).phi == first
+
+
+def test_update_fitness():
+    """
+    Tests that updating the fitness of many animals at once gives the same
+    fitness as calculate_fitness, also for ages that are not integers and
+    ages outside the table.
+    """
+    animals = [Herbivore(age, weight) for age, weight in
+               [(0, 5), (3, 0), (2.5, 10), (500, 30), (40, 80)]]
+    expected = [animal.phi for animal in animals]
+    for animal in animals:
+        animal.phi = -1
+
+    Herbivore.update_fitness(animals)
+    assert [animal.phi for animal in animals] == pytest.approx(expected)
+    assert animals[1].phi == 0
+
+
+def test_from_arrays():
+    """
+    Tests that animals created at once from arrays are the same as animals
+    created one at a time.
+    """
+    ages = np.array([0, 3, 7])
+    weights = np.array([5., 0., 30.])
+    animals = Vulture.from_arrays(ages, weights)
+    expected = [Vulture(age, weight) for age, weight in zip([0, 3, 7],
+                                                            [5., 0., 30.])]
+
+    for animal, other in zip(animals, expected):
+        assert type(animal) is Vulture
+        assert type(animal.age) is int
+        assert animal.age == other.age
+        assert animal.weight == other.weight
+        assert animal.phi == pytest.approx(other.phi)
+        assert animal.alive and not animal.has_moved
+        assert animal.legal_biomes == other.legal_biomes
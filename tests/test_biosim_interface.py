@@ -23,9 +23,14 @@ import pandas
 import glob
 import os
 import os.path
+import random
+import numpy as np
 
 from biosim.simulation import BioSim
 from biosim.animals import Carnivore, Herbivore
+from biosim.geography import Jungle, Savannah
+from biosim.island_class import Map, write_binary_map
+from biosim.statistics import SPECIES, StatisticsWriter, read_statistics
 
 
 def test_empty_island():
@@ -478,3 +483,309 @@ def test_cannot_move_of_of_map():
     sim.migration_cycle()
 
     assert len(sim.map.array_map[0, 0].present_herbivores) == 1
+
+
+def test_aggregate_population(plain_sim, population):
+    """
+    Tests that the counts, biomass and mean fitness of each species are
+    found in one pass, and agree with the population properties.
+    """
+    plain_sim.add_population(population)
+    aggregated = plain_sim._aggregate_population(extended=True)
+
+    assert aggregated['counts']['Herbivore'][1, 1] == 3
+    assert aggregated['counts']['Carnivore'][1, 2] == 3
+    assert aggregated['totals'] == plain_sim.num_animals_per_species
+    assert aggregated['biomass']['Herbivore'][1, 1] == 300
+
+    herbivore = plain_sim.map.array_map[1, 1].present_herbivores[0]
+    assert aggregated['fitness']['Herbivore'][1, 1] == pytest.approx(
+        herbivore.phi)
+    assert np.isnan(aggregated['fitness']['Herbivore'][1, 2])
+
+
+def test_binary_island_map(tmp_path):
+    """ Tests that a map opened from a binary map file can be simulated. """
+    filename = str(tmp_path / 'island.map')
+    write_binary_map(filename, 'OOOO\nOJSO\nOOOO')
+    sim = BioSim(island_map=Map.from_binary(filename), seed=1, ini_pop=[
+        {'loc': (1, 1),
+         'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}]}])
+    sim.simulate(2, vis_years=1)
+
+    assert sim.year == 2
+    assert sim.num_animals > 0
+
+
+def test_sparse_island_map():
+    """
+    Tests that a simulation on a sparse map gives the same result as on a
+    map where all cells are stored.
+    """
+    island_map = 'OOOOOO\nOJJSDO\nOSJJMO\nOOOOOO'
+    ini_pop = [{'loc': (1, 1),
+                'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}
+                        for _ in range(20)] +
+                       [{'species': 'Carnivore', 'age': 5, 'weight': 20}
+                        for _ in range(5)]}]
+
+    dense = BioSim(island_map=island_map, ini_pop=ini_pop, seed=12)
+    dense.simulate(10, vis_years=100)
+    sparse = BioSim(island_map=island_map, ini_pop=ini_pop, seed=12,
+                    sparse=True)
+    sparse.simulate(10, vis_years=100)
+
+    assert dense.animal_distribution.equals(sparse.animal_distribution)
+
+
+def test_sort_by_fitness(plain_sim):
+    """
+    Tests that the animals of each cell are sorted by fitness like
+    list.sort with reverse=True.
+    """
+    plain_sim.add_population([
+        {'loc': (1, 1),
+         'pop': [{'species': 'Herbivore', 'age': age, 'weight': weight}
+                 for age, weight in [(50, 10), (2, 40), (10, 20), (2, 40)]]},
+        {'loc': (1, 2),
+         'pop': [{'species': 'Herbivore', 'age': 5, 'weight': weight}
+                 for weight in (5, 30, 15)]}])
+    cells = [plain_sim.map.cell(1, 1), plain_sim.map.cell(1, 2)]
+    expected = [sorted(cell.present_herbivores, key=lambda x: x.phi,
+                       reverse=True) for cell in cells]
+
+    plain_sim._sort_by_fitness(['present_herbivores'], descending=True)
+    for cell, animals in zip(cells, expected):
+        assert cell.present_herbivores == animals
+
+
+def test_migration_sorts_each_cell_before_it_migrates():
+    """
+    Tests that the animals of a cell are sorted just before they migrate,
+    so animals that arrived from earlier cells are sorted in with the
+    animals of the cell.
+    """
+    island_map = 'OOOOOO\nOJJJJO\nOJJJJO\nOOOOOO'
+    ini_pop = [{'loc': (row, col),
+                'pop': [{'species': 'Herbivore', 'age': age, 'weight': 20}
+                        for age in (1, 10, 30, 60)]}
+               for row in (1, 2) for col in (1, 2, 3, 4)]
+    Herbivore.new_parameters({'mu': 1})
+
+    sim = BioSim(island_map=island_map, ini_pop=ini_pop, seed=3)
+    random.seed(3)
+    sim.migration_cycle()
+
+    expected = BioSim(island_map=island_map, ini_pop=ini_pop, seed=3)
+    random.seed(3)
+    for cell in expected.map.map_iterator():
+        cell.present_herbivores.sort(key=lambda x: x.phi, reverse=True)
+        cell.present_herbivores = expected._migrate_one_species(
+            cell.present_herbivores, 0)
+    Herbivore.new_parameters({'mu': 0.25})
+
+    assert animals_on_island(sim) == animals_on_island(expected)
+
+
+def test_pipeline_matches_cycles():
+    """
+    Tests that a year run by the pipeline, with ageing, weight loss and
+    death in one pass, gives the same result as running the cycles one
+    after the other.
+    """
+    island_map = 'OOOOOO\nOJJSDO\nOSJJMO\nOOOOOO'
+    ini_pop = [{'loc': (1, 1),
+                'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}
+                        for _ in range(20)] +
+                       [{'species': 'Carnivore', 'age': 5, 'weight': 20}
+                        for _ in range(5)]}]
+
+    pipeline_sim = BioSim(island_map=island_map, ini_pop=ini_pop, seed=5)
+    for _ in range(5):
+        pipeline_sim._pipeline.run()
+        pipeline_sim.map.left_overs.fill(0)
+
+    cycles_sim = BioSim(island_map=island_map, ini_pop=ini_pop, seed=5)
+    for _ in range(5):
+        cycles_sim.feeding_cycle()
+        cycles_sim.breeding_cycle()
+        cycles_sim.migration_cycle()
+        cycles_sim.ageing_cycle()
+        cycles_sim.weight_loss_cycle()
+        cycles_sim.death_cycle()
+        cycles_sim.map.left_overs.fill(0)
+
+    assert pipeline_sim.animal_distribution.equals(
+        cycles_sim.animal_distribution)
+
+
+def test_seeded_simulation_golden_values():
+    """
+    Tests that a seeded simulation still ends with the recorded population.
+    Changing the order of the stages, the animals or the random numbers
+    changes the result, and the values below must then be recorded again
+    on purpose.
+    """
+    island_map = 'OOOOOO\nOJJSDO\nOSJJMO\nOOOOOO'
+    ini_pop = [{'loc': (1, 1),
+                'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}
+                        for _ in range(20)] +
+                       [{'species': 'Carnivore', 'age': 5, 'weight': 20}
+                        for _ in range(5)] +
+                       [{'species': 'Vulture', 'age': 5, 'weight': 10}
+                        for _ in range(5)]}]
+    # Other tests change the landscape parameters, so the defaults are set.
+    Jungle.biome_parameters({'f_max': 800})
+    Savannah.biome_parameters({'f_max': 300, 'alpha': 0.3})
+    sim = BioSim(island_map=island_map, ini_pop=ini_pop, seed=5)
+    sim.simulate(15, vis_years=100)
+
+    assert sim.num_animals_per_species == {'Herbivore': 280, 'Carnivore': 3,
+                                           'Vulture': 1}
+    assert sum(weight for _, _, _, weight in animals_on_island(sim)) == \
+        pytest.approx(5479.960275182672)
+
+
+def population_columns():
+    """ Returns a population as columns of arrays. """
+    return {'species': np.array(['Herbivore', 'Carnivore', 'Herbivore',
+                                 'Vulture', 'Herbivore'], dtype=object),
+            'row': np.array([1, 1, 2, 2, 1]),
+            'col': np.array([2, 2, 1, 2, 2]),
+            'age': np.array([1, 3, 5, 2, 4]),
+            'weight': np.array([10., 20., 15., 5., 12.])}
+
+
+def animals_on_island(sim):
+    """ Lists the species, cell, age and weight of all animals. """
+    return [(type(animal).__name__, index, animal.age, animal.weight)
+            for index, cell in sim.map.cells()
+            for animal in cell.present_herbivores + cell.present_carnivores +
+            cell.present_vultures]
+
+
+@pytest.mark.parametrize('as_frame', [False, True])
+def test_add_population_columns(as_frame):
+    """
+    Tests that a population given as columns or as a DataFrame gives the
+    same animals in the same order as a list of dictionaries.
+    """
+    island_map = 'OOOO\nOJSO\nODJO\nOOOO'
+    columns = population_columns()
+    population = pandas.DataFrame(columns) if as_frame else columns
+    bulk_sim = BioSim(island_map=island_map, ini_pop=population, seed=1)
+
+    records = [{'loc': (int(row), int(col)),
+                'pop': [{'species': species, 'age': int(age),
+                         'weight': float(weight)}]}
+               for species, row, col, age, weight in zip(*columns.values())]
+    sim = BioSim(island_map=island_map, ini_pop=records, seed=1)
+
+    assert animals_on_island(bulk_sim) == animals_on_island(sim)
+    assert bulk_sim.num_animals == 5
+
+
+@pytest.mark.parametrize('column, value', [
+    ('age', -1), ('weight', -1.), ('species', 'Mammoth'), ('row', 4),
+    ('col', -1), ('row', 1.5), ('species', 'Carnivore')])
+def test_add_population_columns_invalid(column, value):
+    """
+    Tests that invalid columns raise a ValueError before any animal is
+    added. The last animal is placed on a mountain if its species is
+    changed, where only vultures can be.
+    """
+    island_map = 'OOOO\nOJSO\nODMO\nOOOO'
+    columns = population_columns()
+    columns['species'][-1] = 'Vulture'
+    columns['row'][-1], columns['col'][-1] = 2, 2
+    assert BioSim(island_map, columns, seed=1).num_animals == 5
+
+    sim = BioSim(island_map=island_map, ini_pop=[], seed=1)
+    columns[column] = np.append(columns[column][:-1], value)
+    with pytest.raises(ValueError):
+        sim.add_population(columns)
+    assert sim.num_animals == 0
+
+
+def test_add_population_columns_missing():
+    """ Tests that missing columns and different lengths are rejected. """
+    sim = BioSim(island_map='OOOO\nOJSO\nODJO\nOOOO', ini_pop=[], seed=1)
+    columns = population_columns()
+    del columns['age']
+    with pytest.raises(ValueError):
+        sim.add_population(columns)
+
+    columns = population_columns()
+    columns['weight'] = columns['weight'][:-1]
+    with pytest.raises(ValueError):
+        sim.add_population(columns)
+
+
+def iter_population():
+    """ Returns a population of herbivores and carnivores in one cell. """
+    return [{'loc': (1, 1),
+             'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}
+                     for _ in range(30)] +
+                    [{'species': 'Carnivore', 'age': 5, 'weight': 30}
+                     for _ in range(5)]}]
+
+
+def test_simulate_iter_matches_simulate():
+    """
+    Tests that simulate_iter yields one snapshot per year, and gives the
+    same simulation as simulate.
+    """
+    island_map = 'OOOOO\nOJSJO\nOJJDO\nOOOOO'
+    sim = BioSim(island_map=island_map, ini_pop=iter_population(), seed=4)
+    snapshots = list(sim.simulate_iter(5, grids=True))
+
+    assert [snapshot.year for snapshot in snapshots] == [0, 1, 2, 3, 4]
+    assert snapshots[-1].totals == sim.num_animals_per_species
+    assert snapshots[-1].count_grid('Herbivore').sum() == \
+        snapshots[-1].totals['Herbivore']
+    distribution = sim.animal_distribution
+
+    other_sim = BioSim(island_map=island_map, ini_pop=iter_population(),
+                       seed=4)
+    other_sim.simulate(5, vis_years=100)
+    assert other_sim.animal_distribution.equals(distribution)
+
+
+def test_simulate_iter_stops_early(tmpdir):
+    """
+    Tests that the consumer can stop the simulation, and that the
+    statistics sinks are flushed when it stops.
+    """
+    sim = BioSim(island_map='OOOO\nOJSO\nOOOO', ini_pop=iter_population(),
+                 seed=1)
+    file_base = str(tmpdir.join('stats'))
+    sink = StatisticsWriter(file_base)
+
+    for snapshot in sim.simulate_iter(100, sinks=[sink]):
+        assert snapshot.counts is None
+        if snapshot.year == 2:
+            break
+
+    assert sim.year == 3
+    assert list(read_statistics(file_base)['year']) == [0, 1, 2]
+
+
+def test_simulate_iter_years_match_sinks(tmpdir):
+    """
+    Tests that a snapshot and the statistics sinks give the same counts
+    under the same year.
+    """
+    sim = BioSim(island_map='OOOO\nOJSO\nOOOO', ini_pop=iter_population(),
+                 seed=2)
+    file_base = str(tmpdir.join('stats'))
+    snapshots = list(sim.simulate_iter(
+        4, grids=True, sinks=[StatisticsWriter(file_base)]))
+    statistics = read_statistics(file_base)
+
+    assert [snapshot.year for snapshot in snapshots] == \
+        list(statistics['year'])
+    for snapshot, totals, counts in zip(snapshots, statistics['totals'],
+                                        statistics['counts']):
+        assert [snapshot.totals[name] for name in SPECIES] == list(totals)
+        for number, name in enumerate(SPECIES):
+            assert (snapshot.count_grid(name) == counts[number]).all()
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+
+__author__ = "Sebastian Kihle & Andreas Hoeimyr"
+__email__ = "sebaskih@nmbu.no & andrehoi@nmbu.no"
+
+"""
+Test file for branching simulations with fork and run_branches
+"""
+
+import pytest
+from pandas.testing import assert_frame_equal
+
+from biosim.branching import run_branches
+from biosim.simulation import BioSim
+
+ISLAND = 'OOOOOO\nOJSJDO\nOSJMJO\nOOOOOO'
+CARNIVORES = [{'loc': (1, 2),
+               'pop': [{'species': 'Carnivore', 'age': 5, 'weight': 20}
+                       for _ in range(5)]}]
+
+
+def make_sim():
+    """ Creates a small simulation with herbivores only. """
+    return BioSim(island_map=ISLAND, seed=7, ini_pop=[
+        {'loc': (1, 1),
+         'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}
+                 for _ in range(30)]}])
+
+
+def with_carnivores(branch):
+    """ Scenario adding carnivores to the branch. """
+    branch.add_population(CARNIVORES)
+    branch.simulate(4, vis_years=100)
+    return branch.num_animals_per_species
+
+
+def without_carnivores(branch):
+    """ Scenario simulating the branch as it is. """
+    branch.simulate(4, vis_years=100)
+    return branch.num_animals_per_species
+
+
+def test_fork_is_independent():
+    """
+    Tests that a fork and its parent do not change each other, and that
+    the parent simulates as if it was never forked.
+    """
+    sim = make_sim()
+    sim.simulate(8, vis_years=100)
+    expected = sim.animal_distribution
+
+    sim = make_sim()
+    sim.simulate(4, vis_years=100)
+    branch = sim.fork()
+    branch.add_population(CARNIVORES)
+    branch.simulate(4, vis_years=100)
+    sim.simulate(4, vis_years=100)
+
+    assert_frame_equal(sim.animal_distribution, expected)
+    assert branch.num_animals_per_species['Carnivore'] > 0
+    assert sim.num_animals_per_species['Carnivore'] == 0
+
+
+@pytest.mark.parametrize('sparse', [False, True])
+def test_fork_shares_only_the_codes(sparse):
+    """
+    Tests that a fork shares the biome codes of the map, and has its own
+    cells, animals and left overs.
+    """
+    sim = BioSim(island_map=ISLAND, ini_pop=CARNIVORES, seed=7,
+                 sparse=sparse)
+    sim.map.cell(1, 2).left_overs = 10
+    branch = sim.fork()
+
+    assert branch.map.code_map is sim.map.code_map
+    cell, branch_cell = sim.map.cell(1, 2), branch.map.cell(1, 2)
+    assert branch_cell is not cell
+    assert branch_cell.left_overs == 10
+    branch_cell.left_overs = 0
+    assert cell.left_overs == 10
+
+    animal = cell.present_carnivores[0]
+    branch_animal = branch_cell.present_carnivores[0]
+    assert branch_animal is not animal
+    assert type(branch_animal) is type(animal)
+    assert (branch_animal.age, branch_animal.weight, branch_animal.phi) == \
+        (animal.age, animal.weight, animal.phi)
+    branch_animal.weight = 1
+    assert animal.weight == 20
+
+
+def test_fork_seeds():
+    """
+    Tests that forks with the same seed give the same simulation, and that
+    forks without a seed are given different seeds.
+    """
+    sim = make_sim()
+    sim.simulate(2, vis_years=100)
+    first, second = sim.fork(5), sim.fork(5)
+    first.simulate(4, vis_years=100)
+    second.simulate(4, vis_years=100)
+    assert_frame_equal(first.animal_distribution, second.animal_distribution)
+
+    assert sim.branch_seed() != sim.branch_seed()
+
+
+@pytest.mark.parametrize('processes', [1, 2])
+def test_run_branches(processes):
+    """
+    Tests that the scenarios give the same results in worker processes as
+    one by one, and that the simulation is not changed.
+    """
+    sim = make_sim()
+    sim.simulate(3, vis_years=100)
+    before = sim.animal_distribution
+
+    scenarios = [with_carnivores, without_carnivores, with_carnivores]
+    results = run_branches(sim, scenarios, seeds=[1, 2, 1],
+                           processes=processes)
+    expected = [scenario(sim.fork(seed))
+                for scenario, seed in zip(scenarios, [1, 2, 1])]
+
+    assert results == expected
+    assert results[0] == results[2]
+    assert results[1]['Carnivore'] == 0
+    assert_frame_equal(sim.animal_distribution, before)
+
+
+def test_run_branches_invalid_seeds():
+    """ Tests that a seed must be given for each scenario. """
+    with pytest.raises(ValueError):
+        run_branches(make_sim(), [without_carnivores], seeds=[1, 2])
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+
+__author__ = "Sebastian Kihle & Andreas Hoeimyr"
+__email__ = "sebaskih@nmbu.no & andrehoi@nmbu.no"
+
+"""
+Test file for checkpoints and simulations stopped by a time budget or a
+signal
+"""
+
+import os
+import pickle
+import random
+import signal
+
+import pytest
+from pandas.testing import assert_frame_equal
+
+from biosim.checkpoint import catch_signals
+from biosim.simulation import BioSim
+from biosim.stopping import INTERRUPTED, TIME_BUDGET
+
+ISLAND = 'OOOOOO\nOJSJDO\nOSJMJO\nOOOOOO'
+
+
+def make_sim():
+    """ Creates a small simulation with all species. """
+    return BioSim(island_map=ISLAND, seed=4, ini_pop=[
+        {'loc': (1, 1),
+         'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}
+                 for _ in range(30)] +
+                [{'species': 'Carnivore', 'age': 5, 'weight': 20}
+                 for _ in range(5)] +
+                [{'species': 'Vulture', 'age': 5, 'weight': 10}
+                 for _ in range(5)]}])
+
+
+def test_resume_from_checkpoint(tmpdir):
+    """
+    Tests that a simulation saved to a checkpoint and loaded again ends
+    exactly like a simulation that was never stopped, even if the random
+    numbers are used in between.
+    """
+    sim = make_sim()
+    sim.simulate(10, vis_years=100)
+    expected = sim.animal_distribution
+
+    filename = str(tmpdir.join('run.ckpt'))
+    sim = make_sim()
+    sim.simulate(5, vis_years=100)
+    sim.save_checkpoint(filename)
+    random.seed(999)
+    sim.simulate(3, vis_years=100)
+
+    resumed = BioSim.from_checkpoint(filename)
+    assert resumed.year == 5
+    resumed.simulate(5, vis_years=100)
+    assert resumed.year == 10
+    assert_frame_equal(resumed.animal_distribution, expected)
+
+
+def test_time_budget(tmpdir):
+    """
+    Tests that a used time budget stops the simulation after the year,
+    writes the checkpoint and reports the remaining years.
+    """
+    filename = str(tmpdir.join('run.ckpt'))
+    sim = make_sim()
+    status = sim.simulate(10, vis_years=100, time_budget=0,
+                          checkpoint=filename)
+
+    assert status.reason == TIME_BUDGET
+    assert status.resumable and not status.completed
+    assert status.sim_years == 1
+    assert status.remaining_years == 9
+    assert status.checkpoint == filename
+    assert BioSim.from_checkpoint(filename).year == 1
+
+
+def test_time_budget_completes():
+    """ Tests that a large time budget does not stop the simulation. """
+    status = make_sim().simulate(3, vis_years=100, time_budget=3600)
+    assert status.completed
+    assert status.remaining_years == 0
+
+
+def test_interrupted_by_signal(tmpdir):
+    """
+    Tests that SIGTERM during a year stops the simulation after the year
+    and writes the checkpoint, and that the old handler is put back.
+    """
+
+    class Killer:
+        """ Sends SIGTERM to the process when the year is recorded. """
+
+        def record(self, year, counts):
+            if year == 2:
+                os.kill(os.getpid(), signal.SIGTERM)
+
+        def flush(self):
+            pass
+
+    filename = str(tmpdir.join('run.ckpt'))
+    old_handler = signal.getsignal(signal.SIGTERM)
+    sim = make_sim()
+    status = sim.simulate(10, vis_years=100, sinks=[Killer()],
+                          checkpoint=filename)
+
+    assert status.reason == INTERRUPTED
+    assert status.year == 3
+    assert status.remaining_years == 7
+    assert BioSim.from_checkpoint(filename).year == 3
+    assert signal.getsignal(signal.SIGTERM) is old_handler
+
+
+def test_catch_signals_disabled():
+    """ Tests that no handlers are set when catching is disabled. """
+    old_handler = signal.getsignal(signal.SIGINT)
+    with catch_signals(False) as received:
+        assert signal.getsignal(signal.SIGINT) is old_handler
+    assert received == []
+
+
+def test_invalid_checkpoint(tmpdir):
+    """ Tests that files that are not checkpoints are rejected. """
+    filename = str(tmpdir.join('other.pkl'))
+    with open(filename, 'wb') as file:
+        pickle.dump({'version': 0}, file)
+    with pytest.raises(ValueError):
+        BioSim.from_checkpoint(filename)
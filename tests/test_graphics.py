@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+
+__author__ = "Sebastian Kihle & Andreas Hoeimyr"
+__email__ = "sebaskih@nmbu.no & andrehoi@nmbu.no"
+
+"""
+Test file for the graphical interface
+"""
+
+import os
+import sys
+import numpy as np
+import pytest
+
+from biosim import graphics
+from biosim.simulation import BioSim
+from biosim.graphics import BackgroundRenderer
+
+
+def test_unknown_policy():
+    """ Tests that only the drop and block policies can be used. """
+    with pytest.raises(ValueError):
+        BackgroundRenderer(policy='wait')
+
+
+def test_background_renderer_saves_figures(tmp_path):
+    """
+    Tests that the rendering process draws and saves the figures, and that
+    no figure is created in the simulation process.
+    """
+    img_base = os.path.join(str(tmp_path), 'bg')
+    sim = BioSim(island_map="OOOO\nOJSO\nOOOO", ini_pop=[], seed=1,
+                 img_base=img_base)
+    renderer = BackgroundRenderer(max_frames=2, policy='block')
+    sim.simulate(3, vis_years=1, img_years=1, renderer=renderer)
+    renderer.close()
+
+    assert sim._fig is None
+    assert not renderer.is_running
+    assert renderer.dropped_frames == 0
+    for num in range(3):
+        assert os.path.isfile('{}_{:05d}.png'.format(img_base, num))
+
+
+@pytest.fixture
+def fake_ffmpeg(tmp_path, monkeypatch):
+    """
+    Replaces ffmpeg with a script that copies the frames it is given to the
+    movie file.
+    """
+    script = os.path.join(str(tmp_path), 'fake_ffmpeg')
+    with open(script, 'w') as file:
+        file.write('#!{}\n'
+                   'import sys, shutil\n'
+                   'with open(sys.argv[-1], "wb") as movie:\n'
+                   '    shutil.copyfileobj(sys.stdin.buffer, movie)\n'
+                   .format(sys.executable))
+    os.chmod(script, 0o755)
+    monkeypatch.setattr(graphics, '_FFMPEG_BINARY', script)
+
+
+def test_frames_streamed_to_ffmpeg(tmp_path, fake_ffmpeg):
+    """ Tests that the frames are piped to ffmpeg without image files. """
+    img_base = os.path.join(str(tmp_path), 'movie')
+    sim = BioSim(island_map="OOOO\nOJSO\nOOOO", ini_pop=[], seed=1,
+                 img_base=img_base, img_fmt='mp4')
+    sim.simulate(3, vis_years=1, img_years=1)
+    width, height = sim._fig.canvas.get_width_height()
+    sim.make_movie()
+
+    assert not os.path.isfile(img_base + '_00000.png')
+    assert os.path.getsize(img_base + '.mp4') >= 3 * width * height * 4
+
+
+def test_ffmpeg_failure_is_reported(tmp_path, monkeypatch):
+    """
+    Tests that ffmpeg stopping while the frames are written raises a
+    RuntimeError with its exit status and messages.
+    """
+    script = os.path.join(str(tmp_path), 'broken_ffmpeg')
+    with open(script, 'w') as file:
+        file.write('#!{}\n'
+                   'import sys\n'
+                   'sys.stderr.write("Unknown encoder\\n")\n'
+                   'sys.exit(3)\n'.format(sys.executable))
+    os.chmod(script, 0o755)
+    monkeypatch.setattr(graphics, '_FFMPEG_BINARY', script)
+
+    sim = BioSim(island_map="OOOO\nOJSO\nOOOO", ini_pop=[], seed=1)
+    sim.simulate(1, vis_years=1)
+    writer = graphics.MovieWriter(os.path.join(str(tmp_path), 'movie.mp4'))
+    with pytest.raises(RuntimeError, match='status 3: Unknown encoder'):
+        for _ in range(100):
+            writer.write(sim._fig)
+
+
+def test_movie_falls_back_to_png(tmp_path, monkeypatch):
+    """ Tests that png files are saved if ffmpeg is not installed. """
+    monkeypatch.setattr(graphics, '_FFMPEG_BINARY', 'no_such_ffmpeg')
+    img_base = os.path.join(str(tmp_path), 'movie')
+    sim = BioSim(island_map="OOOO\nOJSO\nOOOO", ini_pop=[], seed=1,
+                 img_base=img_base, img_fmt='mp4')
+    with pytest.warns(UserWarning):
+        sim.simulate(2, vis_years=1, img_years=1)
+
+    assert os.path.isfile(img_base + '_00000.png')
+    assert os.path.isfile(img_base + '_00001.png')
+
+
+def test_line_graph_grows_without_copies():
+    """
+    Tests that the counts are written into the line graphs, and that the
+    data of the lines is only replaced when the capacity is too small.
+    """
+    sim = BioSim(island_map="OOOO\nOJSO\nOOOO", seed=1, ini_pop=[
+        {"loc": (1, 1),
+         "pop": [{"species": "Herbivore", "age": 5, "weight": 20.0}
+                 for _ in range(5)]}])
+    sim.simulate(10, vis_years=1)
+    line = sim._graphics.herbivore_line_graph
+    ydata = line.get_ydata()
+    assert ydata[9] == sim.num_animals_per_species['Herbivore']
+
+    sim.simulate(5, vis_years=1)
+    assert len(line.get_xdata()) == 20
+    ydata = line.get_ydata()
+
+    sim.simulate(5, vis_years=1)
+    assert line.get_ydata() is ydata
+    assert not np.isnan(ydata[:20]).any()
+
+
+def test_blitting_after_first_draw():
+    """
+    Tests that the backgrounds are stored after the first draw and that
+    later years are blitted on top of them.
+    """
+    sim = BioSim(island_map="OOOO\nOJSO\nOOOO", ini_pop=[], seed=1)
+    sim.simulate(2, vis_years=1)
+    backgrounds = sim._graphics._backgrounds
+    assert backgrounds is not None
+
+    sim._graphics.update(1, sim._aggregate_population()['counts'],
+                         sim.num_animals_per_species)
+    assert sim._graphics._backgrounds is backgrounds
+
+
+def test_background_renderer_reports_error():
+    """
+    Tests that an error in the rendering process is raised by close, with
+    the traceback of the process, and that the renderer is stopped.
+    """
+    renderer = BackgroundRenderer(timeout=30)
+    renderer.start('OOOO\nOXSO\nOOOO')
+    renderer.setup(3)
+    with pytest.raises(RuntimeError, match='biome not defined'):
+        renderer.close()
+    assert not renderer.is_running
+
+
+def test_background_renderer_stopped_process():
+    """
+    Tests that waiting for a rendering process that has stopped raises a
+    RuntimeError instead of waiting forever.
+    """
+    renderer = BackgroundRenderer(max_frames=1, policy='block')
+    renderer.start('OOOO\nOJSO\nOOOO')
+    renderer._process.terminate()
+    renderer._process.join()
+
+    counts = {species: np.zeros((3, 4)) for species in graphics.SPECIES}
+    with pytest.raises(RuntimeError, match='exit code'):
+        for year in range(3):
+            renderer.push(year, counts, save=True)
+    assert not renderer.is_running
+
+
+def test_graphics_settings_on_simulation():
+    """
+    Tests that the plot limits can be read and changed on the simulation,
+    and that a renderer started later uses the changed limits.
+    """
+    sim = BioSim(island_map="OOOO\nOJSO\nOOOO", ini_pop=[], seed=1,
+                 ymax_animals=500)
+    assert sim.graph_ymax == 500
+    assert sim.color_bar_max_herb == 150
+    assert sim.herbivore_line_graph is None
+
+    sim.graph_ymax = 1000
+    sim.color_bar_max_vult = 40
+    assert sim._graphics.graph_ymax == 1000
+    assert sim._graphics_args[1] == 1000
+    assert sim._graphics_args[2]['Vulture'] == 40
+
+    sim.simulate(1, vis_years=1)
+    assert sim.herbivore_line_graph is sim._graphics.herbivore_line_graph
+    assert sim._line_graph_ax.get_ylim()[1] == 1000
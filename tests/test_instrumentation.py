@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+
+__author__ = "Sebastian Kihle & Andreas Hoeimyr"
+__email__ = "sebaskih@nmbu.no & andrehoi@nmbu.no"
+
+"""
+Test file for the instrumentation of the simulation
+"""
+
+import json
+import pytest
+
+from biosim.instrumentation import Instrumentation
+from biosim.simulation import BioSim
+
+
+@pytest.fixture
+def populated_sim():
+    """ Returns a small island with herbivores and carnivores. """
+    return BioSim(
+        island_map="OOOO\nOJSO\nOOOO",
+        ini_pop=[
+            {
+                "loc": (1, 1),
+                "pop": [{"species": "Herbivore", "age": 5, "weight": 20}
+                        for _ in range(20)] +
+                       [{"species": "Carnivore", "age": 5, "weight": 20}
+                        for _ in range(2)],
+            }
+        ],
+        seed=1,
+    )
+
+
+def test_records_each_stage_each_year(populated_sim):
+    """
+    Tests that each pass of the pipeline and the stages of simulate are
+    recorded once per year.
+    """
+    instrumentation = Instrumentation()
+    populated_sim.simulate(num_years=3, vis_years=1, img_years=None,
+                           sinks=[], instrumentation=instrumentation)
+
+    stages = ['feeding', 'breeding', 'migration', 'ageing+weight_loss+death',
+              'aggregation', 'visualization', 'decay']
+    for stage in stages:
+        years = [record['year'] for record in instrumentation.records
+                 if record['stage'] == stage]
+        assert years == [0, 1, 2]
+
+    first = instrumentation.records[0]
+    assert first['stage'] == 'feeding'
+    assert first['cells'] == 12
+    assert first['animals'] == 22
+    assert first['seconds'] >= 0
+
+
+def test_summary_shares(populated_sim):
+    """
+    Tests that the shares of the total time of all stages add up to one.
+    """
+    instrumentation = Instrumentation(census=False)
+    populated_sim.simulate(num_years=2, vis_years=100,
+                           instrumentation=instrumentation)
+
+    summary = instrumentation.summary()
+    assert sum(stage['share'] for stage in summary.values()) == \
+        pytest.approx(1)
+    assert all(record['animals'] is None
+               for record in instrumentation.records)
+    assert instrumentation.report().splitlines()[0].startswith('stage')
+
+
+def test_write_jsonl(populated_sim, tmpdir):
+    """
+    Tests that each record is written as one JSON object per line.
+    """
+    instrumentation = Instrumentation()
+    populated_sim.simulate(num_years=2, vis_years=100,
+                           instrumentation=instrumentation)
+
+    filename = str(tmpdir.join('stages.jsonl'))
+    instrumentation.write_jsonl(filename)
+    with open(filename) as file:
+        records = [json.loads(line) for line in file]
+    assert records == instrumentation.records
+
+
+def test_failed_stage_is_recorded():
+    """
+    Tests that a stage that raises an exception is still recorded, with
+    the name of the exception.
+    """
+    instrumentation = Instrumentation(census=False)
+    with instrumentation.measure(0, 'fine'):
+        pass
+    with pytest.raises(RuntimeError):
+        with instrumentation.measure(0, 'broken'):
+            raise RuntimeError('stage failed')
+
+    fine, broken = instrumentation.records
+    assert fine['error'] is None
+    assert broken['stage'] == 'broken'
+    assert broken['error'] == 'RuntimeError'
+    assert broken['seconds'] >= 0
@@ -7,7 +7,11 @@ __email__ = "sebaskih@nmbu.no & andrehoi@nmbu.no"
 Test file for the Map class
 """
 
-from biosim.island_class import Map
+import numpy as np
+import pickle
+import pytest
+
+from biosim.island_class import Map, write_binary_map
 
 
 def test_locations():
@@ -70,3 +74,178 @@ def test_neighbouring_cells():
             assert type(m.right).__name__ == 'OutOfBounds'
 
         counter += 1
+
+
+def test_code_map():
+    """
+    Tests that the map is stored as a grid of biome codes, and that the
+    letters can be recovered from it.
+    """
+    m = Map('OOOO\nODJO\nOMSO\nOOOO\n')
+    assert m.code_map.dtype == np.uint8
+    assert m.shape == (4, 4)
+    assert ''.join(m.biome_map[1]) == 'ODJO'
+    assert ''.join(m.biome_map[2]) == 'OMSO'
+
+
+def test_biome_map_is_cached():
+    """
+    Tests that the letters of the biomes are only created once, and cannot
+    be changed.
+    """
+    m = Map('OOOO\nODJO\nOOOO')
+    assert m.biome_map is m.biome_map
+    with pytest.raises(ValueError):
+        m.biome_map[1, 1] = 'J'
+
+
+@pytest.mark.parametrize('island_map', ['OOO\nOJ\nOOO', 'OOO\nOXO\nOOO',
+                                        'OOO\nOJO\nOOJ', 'OOO\nOJO\nOØO'])
+def test_invalid_maps(island_map):
+    """
+    Tests that maps with uneven lines, unknown letters or land on the edge
+    raise a ValueError.
+    """
+    with pytest.raises(ValueError):
+        Map(island_map)
+
+
+def test_cells_created_lazily():
+    """
+    Tests that the class instances of the cells are only created when
+    array_map is used, and only once.
+    """
+    m = Map('OOO\nOJO\nOOO')
+    assert m._array_map is None
+    cell = m.array_map[1, 1]
+    assert m.array_map[1, 1] is cell
+
+
+def test_from_file(tmp_path):
+    """ Tests that a map can be read from a text file. """
+    filename = tmp_path / 'island.txt'
+    filename.write_text('OOO\nOSO\nOOO\n')
+    m = Map.from_file(str(filename))
+    assert type(m.array_map[1, 1]).__name__ == 'Savannah'
+
+
+def test_binary_map(tmp_path):
+    """
+    Tests that a map written to a binary map file is opened read-only with
+    the same biomes, and that it is pickled by its path.
+    """
+    filename = str(tmp_path / 'island.map')
+    write_binary_map(filename, 'OOOO\nODJO\nOMSO\nOOOO')
+
+    m = Map.from_binary(filename)
+    assert isinstance(m.code_map, np.memmap)
+    assert ''.join(m.biome_map[2]) == 'OMSO'
+    assert type(m.array_map[1, 2]).__name__ == 'Jungle'
+    with pytest.raises(ValueError):
+        m.code_map[1, 1] = 0
+
+    copy = pickle.loads(pickle.dumps(m))
+    assert isinstance(copy.code_map, np.memmap)
+    assert np.array_equal(copy.code_map, m.code_map)
+
+
+def test_binary_map_must_have_header(tmp_path):
+    """ Tests that files without the binary map header are rejected. """
+    filename = tmp_path / 'island.txt'
+    filename.write_text('OOO\nOSO\nOOO\n')
+    with pytest.raises(ValueError):
+        Map.from_binary(str(filename))
+
+
+def test_sparse_map_creates_used_cells():
+    """
+    Tests that a sparse map only stores the cells that are used, and that
+    prune removes the cells that are unchanged.
+    """
+    m = Map('OOOOO\nOJJSO\nOSJJO\nOOOOO', sparse=True)
+    with pytest.raises(ValueError):
+        m.array_map
+
+    m.cell(1, 2).present_herbivores.append('animal')
+    m.cell(2, 2)
+    m.cell(1, 3).available_food -= 10
+    assert sorted(index for index, _ in m.cells()) == [7, 8, 12]
+
+    m.prune()
+    assert [index for index, _ in m.cells()] == [7, 8]
+    assert type(m.cell(2, 2)).__name__ == 'Jungle'
+
+
+def test_sparse_map_prunes_regrown_savannah():
+    """
+    Tests that a grazed savannah cell is pruned once its food has regrown,
+    although the food only approaches f_max.
+    """
+    m = Map('OOOO\nOSJO\nOOOO', sparse=True)
+    savannah = m.cell(1, 1)
+    savannah.available_food = 0
+    for _ in range(200):
+        savannah.regrow()
+    assert savannah.available_food != savannah.param_dict['f_max']
+
+    m.prune()
+    assert list(m.cells()) == []
+
+
+def test_sparse_iterator_neighbours():
+    """
+    Tests that the map iterator of a sparse map visits the cells in use
+    and creates the neighbouring cells when they are used.
+    """
+    m = Map('OOOO\nODJO\nOMSO\nOOOO', sparse=True)
+    m.cell(1, 1)
+
+    visited = []
+    for cell in m.map_iterator():
+        visited.append((m.y, m.x))
+        assert type(m.right).__name__ == 'Jungle'
+        assert type(m.bottom).__name__ == 'Mountain'
+    assert visited == [(1, 1)]
+    assert sorted(index for index, _ in m.cells()) == [5, 6, 9]
+
+
+def test_sparse_neighbours_not_entered():
+    """
+    Tests that the neighbours of a sparse map that the animals cannot
+    enter are not stored, and that the others are.
+    """
+    m = Map('OOOOO\nOJMJO\nODJSO\nOOOOO', sparse=True)
+    m.cell(1, 1)
+
+    for cell in m.map_iterator():
+        top, bottom, left, right = m.neighbours(['Desert', 'Savannah',
+                                                 'Jungle'])
+        assert type(top).__name__ == 'Ocean'
+        assert type(bottom).__name__ == 'Desert'
+        assert type(right).__name__ == 'Mountain'
+    assert sorted(index for index, _ in m.cells()) == [6, 11]
+
+    next(m.map_iterator())
+    assert type(m.neighbours(['Mountain'])[3]).__name__ == 'Mountain'
+    assert sorted(index for index, _ in m.cells()) == [6, 7, 11]
+
+
+def test_left_overs_array():
+    """
+    Tests that the left overs of the cells are kept in the left_overs
+    array of the map, also in a sparse map where slots are reused.
+    """
+    m = Map('OOOO\nODJO\nOOOO')
+    m.cell(1, 2).left_overs = 12
+    assert m.left_overs.reshape(m.shape)[1, 2] == 12
+    m.left_overs.fill(0)
+    assert m.cell(1, 2).left_overs == 0
+
+    sparse = Map('OOOO\nODJO\nOOOO', sparse=True)
+    sparse.cell(1, 1).left_overs = 5
+    sparse.cell(1, 2).left_overs = 7
+    sparse.cell(1, 1).left_overs = 0
+    sparse.prune()
+    assert sparse.cell(1, 2).left_overs == 7
+    assert sparse.cell(1, 1).left_overs == 0
+    assert len(sparse._free_slots) == 0
@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+
+__author__ = "Sebastian Kihle & Andreas Hoeimyr"
+__email__ = "sebaskih@nmbu.no & andrehoi@nmbu.no"
+
+"""
+Test file for the helpers for animals laid out cell by cell
+"""
+
+from biosim.layout import segment_offsets
+
+
+def test_segment_offsets():
+    """ Tests that the offsets mark the start and end of each segment. """
+    assert list(segment_offsets([2, 0, 3])) == [0, 2, 2, 5]
+    assert list(segment_offsets([])) == [0]
+
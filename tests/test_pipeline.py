@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+
+__author__ = "Sebastian Kihle & Andreas Hoeimyr"
+__email__ = "sebaskih@nmbu.no & andrehoi@nmbu.no"
+
+"""
+Test file for the pipeline of a simulated year
+"""
+
+import pytest
+
+from biosim.animals import Herbivore
+from biosim.island_class import Map
+from biosim.pipeline import Pipeline, Stage
+
+
+def cell_stage(name, draws_random=False, defer_fitness=False):
+    """ Cell stage that does nothing. """
+    return Stage(name, lambda cell, tracer: None, 'cell', draws_random,
+                 defer_fitness)
+
+
+def map_stage(name):
+    """ Map stage that does nothing. """
+    return Stage(name, lambda tracer: None, 'map')
+
+
+def test_schedule_fuses_cell_stages():
+    """
+    Tests that consecutive cell stages are fused into one pass, except
+    when more than one of them draws random numbers.
+    """
+    stages = [map_stage('feeding'), cell_stage('breeding', True),
+              map_stage('migration'), cell_stage('ageing'),
+              cell_stage('weight_loss'), cell_stage('death', True),
+              cell_stage('disease', True)]
+    passes = Pipeline.schedule(stages)
+
+    assert [[stage.name for stage in stages] for stages in passes] == [
+        ['feeding'], ['breeding'], ['migration'],
+        ['ageing', 'weight_loss', 'death'], ['disease']]
+
+
+def test_invalid_stages():
+    """ Tests that stages must have a known scope. """
+    with pytest.raises(ValueError):
+        Stage('feeding', print, 'island')
+    with pytest.raises(ValueError):
+        Stage('migration', print, 'map', defer_fitness=True)
+
+
+def test_fused_pass_order_and_fitness():
+    """
+    Tests that the fused stages are run for one cell after the other, and
+    that deferred fitness is recalculated before a later stage uses it.
+    """
+    island = Map('OOOO\nOJJO\nOOOO')
+    herbivore = Herbivore(5, 20)
+    island.cell(1, 1).present_herbivores.append(herbivore)
+    calls = []
+
+    def grow(cell, tracer):
+        calls.append(('grow', island.y, island.x))
+        for animal in cell.present_herbivores:
+            animal.weight += 10
+
+    def check(cell, tracer):
+        calls.append(('check', island.y, island.x))
+        for animal in cell.present_herbivores:
+            assert animal.phi == Herbivore(5, 30).phi
+
+    pipeline = Pipeline([Stage('grow', grow, 'cell', defer_fitness=True),
+                         Stage('check', check, 'cell')], island)
+    pipeline.run()
+
+    assert len(calls) == 2 * 12
+    assert calls[10:14] == [('grow', 1, 1), ('check', 1, 1), ('grow', 1, 2),
+                            ('check', 1, 2)]
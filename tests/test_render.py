@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+
+__author__ = "Sebastian Kihle & Andreas Hoeimyr"
+__email__ = "sebaskih@nmbu.no & andrehoi@nmbu.no"
+
+"""
+Test file for the offline renderer
+"""
+
+import os
+import pytest
+
+from biosim.__main__ import main
+from biosim.render import render_history
+from biosim.simulation import BioSim
+from biosim.statistics import HeatmapRecorder
+
+
+@pytest.fixture
+def recording(tmp_path):
+    """ Records five years of a simple island and returns the filename. """
+    island_map = 'OOOO\nOJSO\nOOOO'
+    filename = os.path.join(str(tmp_path), 'cube.dat')
+    sim = BioSim(island_map=island_map, seed=1, ini_pop=[
+        {"loc": (1, 1),
+         "pop": [{"species": "Herbivore", "age": 5, "weight": 20.0}
+                 for _ in range(10)]}])
+    recorder = HeatmapRecorder(filename, island_map=island_map)
+    sim.simulate(5, vis_years=100, sinks=[recorder])
+    recorder.close()
+    return filename
+
+
+def test_render_command(recording, tmp_path):
+    """ Tests that biosim render saves one frame per recorded year. """
+    img_base = os.path.join(str(tmp_path), 'frame')
+    main(['render', recording, img_base, '--processes', '2', '--no-movie'])
+
+    for img_no in range(5):
+        assert os.path.isfile('{}_{:05d}.png'.format(img_base, img_no))
+    assert not os.path.isfile('{}_{:05d}.png'.format(img_base, 5))
+
+
+def test_render_img_years(recording, tmp_path):
+    """ Tests that only every img_years year is rendered. """
+    img_base = os.path.join(str(tmp_path), 'frame')
+    assert render_history(recording, img_base, img_years=2, processes=1,
+                          movie=False) == 3
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+
+__author__ = "Sebastian Kihle & Andreas Hoeimyr"
+__email__ = "sebaskih@nmbu.no & andrehoi@nmbu.no"
+
+"""
+Test file for the read-only state of the island
+"""
+
+import numpy as np
+import pytest
+
+from biosim.simulation import BioSim
+
+
+@pytest.fixture
+def sim():
+    """ Returns a small island with animals in two cells. """
+    return BioSim(
+        island_map="OOOO\nOJSO\nOOOO",
+        ini_pop=[
+            {"loc": (1, 1),
+             "pop": [{"species": "Herbivore", "age": 1, "weight": 10.},
+                     {"species": "Herbivore", "age": 4, "weight": 30.},
+                     {"species": "Carnivore", "age": 2, "weight": 20.}]},
+            {"loc": (1, 2),
+             "pop": [{"species": "Herbivore", "age": 3, "weight": 15.}]},
+        ],
+        seed=1,
+    )
+
+
+def test_count_grids_are_views(sim):
+    """
+    Tests that the count grid of each species is a read-only view of the
+    counts of all species.
+    """
+    state = sim.state()
+    grid = state.count_grid('Herbivore')
+
+    assert state.counts.shape == (3, 3, 4)
+    assert np.shares_memory(grid, state.counts)
+    assert grid[1, 1] == 2 and grid[1, 2] == 1
+    assert state.count_grid('Carnivore')[1, 1] == 1
+    assert state.totals == sim.num_animals_per_species
+    with pytest.raises(ValueError):
+        grid[0, 0] = 1
+    with pytest.raises(ValueError):
+        state.count_grid('Mammoth')
+
+
+def test_animal_attributes(sim):
+    """
+    Tests that the attributes of every animal are gathered cell by cell
+    into read-only arrays.
+    """
+    state = sim.state(attributes=True)
+    herbivores = state.animals('Herbivore')
+
+    assert list(herbivores['row']) == [1, 1, 1]
+    assert list(herbivores['col']) == [1, 1, 2]
+    assert list(herbivores['age']) == [1, 4, 3]
+    assert list(herbivores['weight']) == [10., 30., 15.]
+    cell = sim.map.cell(1, 1)
+    assert herbivores['fitness'][0] == cell.present_herbivores[0].phi
+    assert len(state.animals('Vulture')['age']) == 0
+    assert state.cell_sum('Herbivore', 'weight')[1, 1] == 40.
+    with pytest.raises(ValueError):
+        herbivores['age'][0] = 2
+
+
+def test_state_is_a_snapshot(sim):
+    """
+    Tests that a state does not change when the simulation goes on, and
+    that the attributes must be asked for.
+    """
+    state = sim.state()
+    counts = state.counts.copy()
+    sim.simulate(3, vis_years=100)
+
+    assert state.year == 0
+    assert sim.state().year == 3
+    assert np.array_equal(state.counts, counts)
+    with pytest.raises(ValueError):
+        state.animals('Herbivore')
+
+
+def test_totals_without_state(sim, monkeypatch):
+    """
+    Tests that the number of animals is counted without creating the
+    count grids of an IslandState.
+    """
+    def no_state(*args, **kwargs):
+        raise AssertionError('IslandState created')
+
+    monkeypatch.setattr('biosim.simulation.IslandState', no_state)
+    assert sim.num_animals_per_species == {'Herbivore': 3, 'Carnivore': 1,
+                                           'Vulture': 0}
+    assert sim.num_animals == 4
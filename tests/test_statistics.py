@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+
+__author__ = "Sebastian Kihle & Andreas Hoeimyr"
+__email__ = "sebaskih@nmbu.no & andrehoi@nmbu.no"
+
+"""
+Test file for the statistics sinks
+"""
+
+import os
+import numpy as np
+import pytest
+
+from biosim.island_class import Map, write_binary_map
+from biosim.simulation import BioSim
+from biosim.statistics import StatisticsWriter, read_statistics, \
+    HeatmapRecorder, open_heatmap_history, read_heatmap_header, SPECIES
+
+
+@pytest.fixture
+def herb_sim():
+    """ Simple island with herbivores in the jungle. """
+    return BioSim(island_map='OOOO\nOJSO\nOOOO', seed=1, ini_pop=[
+        {"loc": (1, 1),
+         "pop": [{"species": "Herbivore", "age": 5, "weight": 20.0}
+                 for _ in range(10)]}])
+
+
+def test_writes_chunks(herb_sim, tmp_path):
+    """ Tests that the history is written in chunks of flush_years. """
+    base = os.path.join(str(tmp_path), 'stats')
+    writer = StatisticsWriter(base, flush_years=4)
+    herb_sim.simulate(10, vis_years=100, sinks=[writer])
+
+    assert os.path.isfile(base + '_00000.npz')
+    assert os.path.isfile(base + '_00001.npz')
+    assert os.path.isfile(base + '_00002.npz')
+    assert not os.path.isfile(base + '_00003.npz')
+
+
+def test_read_statistics(herb_sim, tmp_path):
+    """
+    Tests that the stored history matches the state of the simulation and
+    continues over several calls to simulate.
+    """
+    base = os.path.join(str(tmp_path), 'stats')
+    writer = StatisticsWriter(base, flush_years=3)
+    herb_sim.simulate(5, vis_years=100, sinks=[writer])
+    herb_sim.simulate(2, vis_years=100, sinks=[writer])
+    writer.close()
+
+    stats = read_statistics(base)
+    assert list(stats['year']) == list(range(7))
+    assert stats['counts'].shape == (7, 3, 3, 4)
+    assert np.array_equal(stats['totals'],
+                          stats['counts'].sum(axis=(2, 3)))
+    assert stats['totals'][-1, 0] == herb_sim.num_animals_per_species[
+        'Herbivore']
+
+
+def test_flush_years_must_be_positive(tmp_path):
+    """ Tests that the buffer must hold at least one year. """
+    with pytest.raises(ValueError):
+        StatisticsWriter(os.path.join(str(tmp_path), 'stats'), flush_years=0)
+
+
+def test_heatmap_recorder(herb_sim, tmp_path):
+    """
+    Tests that the cube grows past its first chunk and can be opened
+    read-only with the same counts as the simulation.
+    """
+    filename = os.path.join(str(tmp_path), 'cube.dat')
+    recorder = HeatmapRecorder(filename, chunk_years=3)
+    herb_sim.simulate(7, vis_years=100, sinks=[recorder])
+
+    cube = open_heatmap_history(filename)
+    assert cube.shape == (7, 3, 4, 3)
+    assert cube[-1, 1, 1, 0] == len(
+        herb_sim.map.array_map[1, 1].present_herbivores)
+    assert cube[:, 0, :, :].sum() == 0
+
+    recorder.close()
+    assert os.path.getsize(filename) == cube.nbytes
+
+
+def test_heatmap_recorder_stores_map_letters(tmp_path):
+    """
+    Tests that an island given as a Map, also opened from a binary map
+    file, is stored in the json file as the letters of its biomes, and
+    that other types are rejected.
+    """
+    island = 'OOOO\nOJSO\nOOOO'
+    map_file = os.path.join(str(tmp_path), 'island.map')
+    write_binary_map(map_file, island)
+    for island_map in (Map(island), Map.from_binary(map_file)):
+        filename = os.path.join(str(tmp_path), 'cube.dat')
+        recorder = HeatmapRecorder(filename, island_map=island_map)
+        recorder.record(0, {species: np.zeros((3, 4), dtype=int)
+                            for species in SPECIES})
+        recorder.close()
+        assert read_heatmap_header(filename)['island_map'] == island
+
+    with pytest.raises(TypeError):
+        HeatmapRecorder(os.path.join(str(tmp_path), 'cube.dat'),
+                        island_map=5)
+
+
+def test_heatmap_history_is_read_only(herb_sim, tmp_path):
+    """ Tests that the opened cube cannot be modified. """
+    filename = os.path.join(str(tmp_path), 'cube.dat')
+    herb_sim.simulate(2, vis_years=100, sinks=[HeatmapRecorder(filename)])
+
+    cube = open_heatmap_history(filename)
+    with pytest.raises(ValueError):
+        cube[0, 1, 1, 0] = 5
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+
+__author__ = "Sebastian Kihle & Andreas Hoeimyr"
+__email__ = "sebaskih@nmbu.no & andrehoi@nmbu.no"
+
+"""
+Test file for the conditions that stop a simulation early
+"""
+
+import pytest
+
+from biosim.simulation import BioSim
+from biosim.stopping import AllExtinct, SpeciesExtinct, SteadyState
+
+
+def totals(herbivores, carnivores=0, vultures=0):
+    """ Returns the number of animals of each species as a dictionary. """
+    return {'Herbivore': herbivores, 'Carnivore': carnivores,
+            'Vulture': vultures}
+
+
+def test_extinction_conditions():
+    """ Tests that extinction is found from the totals. """
+    assert AllExtinct().check(totals(0)) == 'all species extinct'
+    assert AllExtinct().check(totals(0, 1)) is None
+    assert SpeciesExtinct('Carnivore').check(totals(5)) == \
+        'Carnivore extinct'
+    assert SpeciesExtinct('Herbivore').check(totals(5)) is None
+    with pytest.raises(ValueError):
+        SpeciesExtinct('Mammoth')
+
+
+def test_steady_state():
+    """
+    Tests that a steady state is found when the totals have stayed within
+    the band for the whole window, and not before.
+    """
+    condition = SteadyState(window=3, tolerance=0.1, species=['Herbivore'])
+    assert condition.check(totals(100)) is None
+    assert condition.check(totals(150)) is None
+    assert condition.check(totals(104)) is None
+    assert condition.check(totals(100)) is None
+    assert condition.check(totals(98)) == 'steady state for 3 years'
+
+    condition.reset()
+    assert condition.check(totals(98)) is None
+
+
+def test_steady_state_skips_extinct_species():
+    """
+    Tests that extinction is not reported as a steady state, and that
+    extinct species do not stop the other species from being steady.
+    """
+    condition = SteadyState(window=2, tolerance=0.1)
+    assert condition.check(totals(0)) is None
+    assert condition.check(totals(0)) is None
+
+    condition = SteadyState(window=2, tolerance=0.1)
+    assert condition.check(totals(100, 0, 10)) is None
+    assert condition.check(totals(101, 0, 10)) == 'steady state for 2 years'
+
+
+@pytest.mark.parametrize('args', [{'window': 1}, {'tolerance': -1},
+                                  {'species': ['Mammoth']}])
+def test_invalid_steady_state(args):
+    """ Tests that invalid windows, tolerances and species are rejected. """
+    with pytest.raises(ValueError):
+        SteadyState(**args)
+
+
+def test_simulate_stops_early():
+    """
+    Tests that simulate stops after the first year where a condition is
+    met, and reports the reason and the year.
+    """
+    sim = BioSim(island_map='OOOO\nOJSO\nOOOO', seed=1, ini_pop=[
+        {'loc': (1, 1),
+         'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}
+                 for _ in range(10)]}])
+    sim.simulate(2, vis_years=100)
+
+    condition = SpeciesExtinct('Carnivore')
+    status = sim.simulate(50, vis_years=100,
+                          stop_conditions=[AllExtinct(), condition])
+    assert not status.completed
+    assert status.reason == 'Carnivore extinct'
+    assert status.condition is condition
+    assert status.year == sim.year == 3
+    assert status.sim_years == 1
+    assert status.remaining_years == 49
+
+
+def test_simulate_completes():
+    """ Tests that simulate reports when all years were simulated. """
+    sim = BioSim(island_map='OOOO\nOJSO\nOOOO', seed=1, ini_pop=[
+        {'loc': (1, 1),
+         'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}
+                 for _ in range(10)]}])
+    status = sim.simulate(4, vis_years=1,
+                          stop_conditions=[SpeciesExtinct('Herbivore')])
+
+    assert status.completed
+    assert status.year == 4
+    assert status.sim_years == 4
+
+
+def test_stop_conditions_use_counts_of_the_year(monkeypatch):
+    """
+    Tests that the stop conditions get the number of animals at the end of
+    each year without a separate count of the animals.
+    """
+    sim = BioSim(island_map='OOOO\nOJSO\nOOOO', seed=1, ini_pop=[
+        {'loc': (1, 1),
+         'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}
+                 for _ in range(10)]}])
+    species_totals = sim._species_totals
+    calls = []
+    monkeypatch.setattr(sim, '_species_totals',
+                        lambda: calls.append(1) or species_totals())
+    seen = []
+
+    class Recorder:
+        """ Records the totals it is given and never stops. """
+
+        def reset(self):
+            pass
+
+        def check(self, totals):
+            seen.append(totals)
+            assert totals == species_totals()
+
+    status = sim.simulate(5, vis_years=100, stop_conditions=[Recorder()])
+
+    assert status.completed
+    assert len(seen) == 5
+    assert calls == []
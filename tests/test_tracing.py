@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+
+__author__ = "Sebastian Kihle & Andreas Hoeimyr"
+__email__ = "sebaskih@nmbu.no & andrehoi@nmbu.no"
+
+"""
+Test file for the tracer of the simulation
+"""
+
+import json
+import numpy as np
+import pytest
+
+from biosim.simulation import BioSim
+from biosim.tracing import (Tracer, read_trace, BIRTHS, DEATHS, KILLS,
+                            MOVES)
+
+
+def populated_sim():
+    """ Returns a small island with herbivores and carnivores. """
+    return BioSim(
+        island_map="OOOOO\nOJJJO\nOJSJO\nOOOOO",
+        ini_pop=[
+            {
+                "loc": (2, 2),
+                "pop": [{"species": "Herbivore", "age": 5, "weight": 20}
+                        for _ in range(40)] +
+                       [{"species": "Carnivore", "age": 5, "weight": 40}
+                        for _ in range(10)],
+            }
+        ],
+        seed=1,
+    )
+
+
+def test_invalid_tracer():
+    """ Tests that unknown categories and empty buffers are rejected. """
+    with pytest.raises(ValueError):
+        Tracer(['births', 'weddings'])
+    with pytest.raises(ValueError):
+        Tracer(capacity=0)
+
+
+def test_ring_buffer_keeps_latest_events():
+    """
+    Tests that the oldest events are overwritten when the buffer is full,
+    and that events with no animals or of other categories are ignored.
+    """
+    tracer = Tracer(['deaths'], capacity=3)
+    for year in range(5):
+        tracer.year = year
+        tracer.record(DEATHS, 0, 1, 1, year + 1)
+        tracer.record(DEATHS, 1, 1, 1, 0)
+        tracer.record(BIRTHS, 0, 1, 1, 1)
+
+    assert tracer.recorded == 5
+    assert tracer.dropped == 2
+    assert list(tracer.trace()['year']) == [2, 3, 4]
+    assert list(tracer.trace()['count']) == [3, 4, 5]
+
+
+def test_trace_matches_population():
+    """
+    Tests that the traced births and deaths account for the change in the
+    number of animals, and that the moves lead to neighbouring cells.
+    """
+    sim = populated_sim()
+    tracer = Tracer()
+    sim.simulate(num_years=5, vis_years=100, tracer=tracer)
+
+    events = tracer.trace()
+    assert tracer.dropped == 0
+    assert set(events['year']) <= set(range(5))
+
+    change = events['count'][events['category'] == BIRTHS].sum() - \
+        events['count'][events['category'] == DEATHS].sum() - \
+        events['count'][events['category'] == KILLS].sum()
+    assert sim.num_animals == 50 + change
+
+    moves = events[events['category'] == MOVES]
+    assert len(moves) > 0
+    assert np.all(np.abs(moves['to_row'] - moves['row']) +
+                  np.abs(moves['to_col'] - moves['col']) == 1)
+    assert np.all(events['to_row'][events['category'] != MOVES] == -1)
+
+
+def test_tracing_does_not_change_simulation():
+    """
+    Tests that the simulation gives the same result with and without a
+    tracer.
+    """
+    sim = populated_sim()
+    sim.simulate(num_years=5, vis_years=100)
+    untraced = sim.animal_distribution
+
+    sim = populated_sim()
+    sim.simulate(num_years=5, vis_years=100, tracer=Tracer())
+    assert sim.animal_distribution.equals(untraced)
+
+
+def test_select_and_write(tmpdir):
+    """
+    Tests that events can be selected by cell and year, and written to
+    binary and JSONL files.
+    """
+    sim = populated_sim()
+    tracer = Tracer(['births', 'deaths'])
+    sim.simulate(num_years=3, vis_years=100, tracer=tracer)
+
+    events = tracer.select(year=1, row=2, col=2)
+    assert np.all(events['year'] == 1)
+    assert np.all((events['row'] == 2) & (events['col'] == 2))
+    assert len(tracer.select(category=MOVES)) == 0
+
+    binary = str(tmpdir.join('trace.npy'))
+    tracer.write_binary(binary)
+    assert np.array_equal(read_trace(binary), tracer.trace())
+
+    text = str(tmpdir.join('trace.jsonl'))
+    tracer.write_jsonl(text)
+    with open(text) as file:
+        records = [json.loads(line) for line in file]
+    assert len(records) == tracer.recorded
+    assert {record['category'] for record in records} <= {'births',
+                                                          'deaths'}
+
+
+@pytest.mark.parametrize('cycle', ['feeding_cycle', 'breeding_cycle',
+                                   'migration_cycle', 'ageing_cycle',
+                                   'weight_loss_cycle', 'death_cycle'])
+def test_cycles_accept_old_print_flag(cycle):
+    """
+    Tests that the print flag the cycles used to take still runs the
+    cycle with a DeprecationWarning, and that a tracer of the wrong type is
+    rejected.
+    """
+    sim = populated_sim()
+    with pytest.warns(DeprecationWarning):
+        getattr(sim, cycle)(True)
+    with pytest.raises(TypeError):
+        getattr(sim, cycle)(tracer=True)
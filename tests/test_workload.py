@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+
+__author__ = "Sebastian Kihle & Andreas Hoeimyr"
+__email__ = "sebaskih@nmbu.no & andrehoi@nmbu.no"
+
+"""
+Test file for the generator of islands and populations
+"""
+
+import numpy as np
+import pytest
+
+from biosim.island_class import Map, parse_island_map
+from biosim.simulation import BioSim
+from biosim.workload import (generate_island, generate_population,
+                             population_records)
+
+
+def test_generated_island():
+    """
+    Tests that the generated island is surrounded by ocean, has the
+    requested shares of each biome and is a valid map.
+    """
+    island = generate_island(42, 52, {'J': 0.5, 'S': 0.25, 'M': 0.25},
+                             seed=1)
+    code_map = parse_island_map(island)
+    assert code_map.shape == (42, 52)
+    Map(island)
+
+    letters = np.array([list(line) for line in island.splitlines()])
+    inner = letters[1:-1, 1:-1]
+    assert (inner == 'J').mean() == pytest.approx(0.5, abs=0.01)
+    assert (inner == 'M').mean() == pytest.approx(0.25, abs=0.01)
+    assert set(inner.ravel()) == {'J', 'S', 'M'}
+
+
+def test_generated_island_is_reproducible():
+    """ Tests that the same seed gives the same island. """
+    assert generate_island(20, 20, seed=3) == generate_island(20, 20, seed=3)
+    assert generate_island(20, 20, seed=3) != generate_island(20, 20, seed=4)
+
+
+@pytest.mark.parametrize('args', [(2, 10, None), (10, 10, {'X': 1}),
+                                  (10, 10, {'J': -1}), (10, 10, {'J': 0})])
+def test_invalid_island(args):
+    """ Tests that invalid sizes and biome shares are rejected. """
+    with pytest.raises(ValueError):
+        generate_island(*args)
+
+
+def test_generated_population():
+    """
+    Tests that the animals are placed in cells they can live in, with
+    positive weights, and that the same seed gives the same population.
+    """
+    island = generate_island(30, 30, seed=1)
+    counts = {'Herbivore': 1000, 'Carnivore': 100, 'Vulture': 50}
+    columns = generate_population(island, counts, age={'Carnivore': 2},
+                                  seed=2)
+
+    for species, count in counts.items():
+        assert (columns['species'] == species).sum() == count
+    letters = np.array([list(line) for line in island.splitlines()])
+    placed = letters[columns['row'], columns['col']]
+    assert not np.any(placed == 'O')
+    assert not np.any(placed[columns['species'] != 'Vulture'] == 'M')
+    assert np.all(columns['weight'] >= 1)
+    assert columns['age'][columns['species'] == 'Carnivore'].mean() < \
+        columns['age'][columns['species'] == 'Herbivore'].mean()
+
+    again = generate_population(island, counts, age={'Carnivore': 2},
+                                seed=2)
+    for name in columns:
+        assert np.array_equal(columns[name], again[name])
+
+
+def test_invalid_population():
+    """ Tests that unknown species and impossible placements raise. """
+    with pytest.raises(ValueError):
+        generate_population('OOO\nOJO\nOOO', {'Mammoth': 1})
+    with pytest.raises(ValueError):
+        generate_population('OOO\nOMO\nOOO', {'Herbivore': 1})
+
+
+def test_population_records():
+    """
+    Tests that the generated animals can be added to a simulation.
+    """
+    island = generate_island(10, 10, seed=1)
+    columns = generate_population(island, {'Herbivore': 200,
+                                           'Carnivore': 20}, seed=2)
+    sim = BioSim(island_map=island, ini_pop=population_records(columns),
+                 seed=1)
+    assert sim.num_animals_per_species['Herbivore'] == 200
+    assert sim.num_animals_per_species['Carnivore'] == 20